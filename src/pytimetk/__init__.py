@@ -5,6 +5,7 @@ from .plot.plot_timeseries import *
 from .plot.theme import *
 
 from .core.summarize_by_time import *
+from .core.time_rollup import *
 from .core.timeseries_signature import *
 from .core.holiday_signature import *
 from .core.make_future_timeseries import *
@@ -18,9 +19,14 @@ from .core.fourier import *
 from .core.ts_features import *
 from .core.ts_summary import *
 from .core.anomaly import *
+from .core.anomaly_online import *
 from .core.frequency import *
 
+# Sketch aggregations for summarize_by_time (tk.agg.approx_quantile(), ...)
+from .core import agg
+
 from .datasets.get_datasets import *
+from .datasets.make_synthetic_panel import *
 
 from .utils.datetime_helpers import *
 from .utils.pandas_helpers import *
@@ -30,7 +36,7 @@ from .utils.checks import *
 
 # *** Needed for quartodoc build important functions ***
 from .plot.plot_timeseries import (
-    plot_timeseries
+    plot_timeseries, plot_timeseries_batch
 )
 from .plot.theme import (
     theme_timetk, palette_timetk
@@ -80,6 +86,9 @@ from .core.frequency import (
 from .datasets.get_datasets import (
     load_dataset, get_available_datasets
 )
+from .datasets.make_synthetic_panel import (
+    make_synthetic_panel
+)
 from .utils.datetime_helpers import (
     week_of_month, floor_date, ceil_date, is_holiday,
 )
@@ -90,7 +99,58 @@ from .utils.pandas_helpers import (
     flatten_multiindex_column_names, glimpse
 )
 
+# *** Lazy attributes: the plotting and statistics libraries are slow to import ***
+# They are imported on first use. The names they add to the `pytimetk` namespace 
+# (e.g. `tk.ggplot`, `tk.seasonal_decompose`) are resolved on first access.
+
+from importlib import import_module as _import_module
+
+_LAZY_MODULES = {
+    'px':  'plotly.express',
+    'go':  'plotly.graph_objects',
+    'tsf': 'tsfeatures',
+}
+
+_LAZY_ATTRIBUTES = {
+    'make_subplots':      'plotly.subplots',
+    'date_breaks':        'mizani.breaks',
+    'date_format':        'mizani.formatters',
+    'lowess':             'statsmodels.nonparametric.smoothers_lowess',
+    'STL':                'statsmodels.tsa.seasonal',
+    'seasonal_decompose': 'statsmodels.tsa.seasonal',
+    'freq_to_period':     'statsmodels.tsa.tsatools',
+    **{
+        name: 'tsfeatures' for name in [
+            'acf_features', 'arch_stat', 'crossing_points', 'entropy', 'flat_spots', 'heterogeneity', 
+            'holt_parameters', 'lumpiness', 'nonlinearity', 'pacf_features', 'stl_features', 'stability', 
+            'hw_parameters', 'unitroot_kpss', 'unitroot_pp', 'series_length', 'hurst',
+        ]
+    },
+}
+
+# plotnine functions (ggplot, aes, geom_line, ...): the families by prefix and the other names, 
+# so that other names are not looked up in plotnine (a slow import)
+_PLOTNINE_PREFIXES = (
+    'geom_', 'stat_', 'scale_', 'theme', 'element_', 'position_', 'coord_', 'facet_', 
+    'guide', 'label', 'annotat', 'after_',
+)
+_PLOTNINE_NAMES = {
+    'ggplot', 'aes', 'qplot', 'stage', 'arrow', 'labs', 'xlab', 'ylab', 'ggtitle', 'lims', 'xlim', 'ylim', 
+    'expand_limits', 'as_labeller', 'ggsave', 'save_as_pdf_pages', 'watermark',
+}
 
+def __getattr__(name):
+    if name in _LAZY_MODULES:
+        value = _import_module(_LAZY_MODULES[name])
+    elif name in _LAZY_ATTRIBUTES:
+        value = getattr(_import_module(_LAZY_ATTRIBUTES[name]), name)
+    elif (name in _PLOTNINE_NAMES or name.startswith(_PLOTNINE_PREFIXES)) and name in _import_module('plotnine').__all__:
+        value = getattr(_import_module('plotnine'), name)
+    else:
+        raise AttributeError(f"module 'pytimetk' has no attribute '{name}'")
+    
+    globals()[name] = value
+    return value
 
 from importlib.metadata import version
 __version__ = version('pytimetk')
@@ -1,4 +1,5 @@
 from .summarize_by_time import *
+from .time_rollup import *
 from .timeseries_signature import *
 from .holiday_signature import *
 from .make_future_timeseries import *
@@ -12,4 +13,5 @@ from .expanding import *
 from .ts_features import *
 from .ts_summary import *
 from .anomaly import *
+from .anomaly_online import *
 from .frequency import *
\ No newline at end of file
@@ -0,0 +1,305 @@
+import pandas as pd
+import numpy as np
+
+
+def approx_quantile(q: float = 0.5, accuracy: float = 0.01, max_bins: int = 2048):
+    '''
+    Approximate quantile aggregation, backed by a mergeable sketch.
+
+    The values of each time period are summarized by a sketch (DDSketch: a histogram with logarithmic buckets) instead of being sorted. Sketches have bounded memory and can be merged, so `summarize_by_time` computes them once and reuses them for multiple frequencies (`freq` list), grouping sets and `TimeRollup` appends.
+
+    Parameters
+    ----------
+    q : float, optional
+        The `q` parameter is the quantile to estimate, between 0 and 1. The default is 0.5 (the median).
+    accuracy : float, optional
+        The `accuracy` parameter is the relative accuracy of the estimate: the estimate is within `accuracy * |quantile|` of a value whose rank is the requested rank. The default is 0.01 (1%).
+    max_bins : int, optional
+        The `max_bins` parameter is the maximum number of buckets per sketch. When it is exceeded, the lowest buckets are collapsed (losing accuracy for the lowest quantiles only). The default is 2048, which covers values from 1e-9 to 1e9 at 1% accuracy.
+
+    Returns
+    -------
+    ApproxQuantile
+        An aggregation that can be used in `agg_func` of `summarize_by_time` (and in any pandas aggregation, as a function).
+
+    Examples
+    --------
+    ```{python}
+    import pytimetk as tk
+
+    df = tk.load_dataset('bike_sales_sample', parse_dates = ['order_date'])
+
+    (
+        df
+            .groupby('category_1')
+            .summarize_by_time(
+                date_column  = 'order_date',
+                value_column = 'total_price',
+                freq         = ['MS', 'QS'],
+                agg_func     = ['mean', tk.agg.approx_quantile(0.5), tk.agg.approx_nunique()],
+            )
+    )
+    ```
+    '''
+    if not 0 <= q <= 1:
+        raise ValueError("`q` must be between 0 and 1.")
+
+    if not 0 < accuracy < 1:
+        raise ValueError("`accuracy` must be between 0 and 1.")
+
+    return ApproxQuantile(q, accuracy, max_bins)
+
+def approx_nunique(precision: int = 12):
+    '''
+    Approximate number of unique values aggregation, backed by a mergeable sketch.
+
+    The values of each time period are summarized by a HyperLogLog sketch instead of a hash set. Sketches have bounded memory (at most `2 ** precision` registers) and can be merged, so `summarize_by_time` computes them once and reuses them for multiple frequencies (`freq` list), grouping sets and `TimeRollup` appends.
+
+    Parameters
+    ----------
+    precision : int, optional
+        The `precision` parameter is the number of bits of the register index, between 4 and 16. The relative standard error is about `1.04 / sqrt(2 ** precision)`. The default is 12 (1.6%).
+
+    Returns
+    -------
+    ApproxNunique
+        An aggregation that can be used in `agg_func` of `summarize_by_time` (and in any pandas aggregation, as a function).
+
+    Examples
+    --------
+    ```{python}
+    import pytimetk as tk
+
+    df = tk.load_dataset('bike_sales_sample', parse_dates = ['order_date'])
+
+    df.summarize_by_time('order_date', 'customer_id', freq = 'MS', agg_func = ['nunique', tk.agg.approx_nunique()])
+    ```
+    '''
+    if not 4 <= precision <= 16:
+        raise ValueError("`precision` must be between 4 and 16.")
+
+    return ApproxNunique(precision)
+
+class _SketchState:
+    '''The state of a sketch: two arrays sorted by key (keys, and counts or ranks).'''
+
+    __slots__ = ('keys', 'weights')
+
+    def __init__(self, keys, weights):
+        self.keys = keys
+        self.weights = weights
+
+    def __repr__(self):
+        return f'<sketch of {len(self.keys)} keys>'
+
+class _Sketch:
+    '''Base of the mergeable sketch aggregations. The `_bins` methods build, merge and estimate the sketches of many time bins at once.'''
+
+    __name__ = 'sketch'
+
+    # Maximum number of keys of a state (None: bounded by the sketch itself)
+    max_bins = None
+
+    # Estimate of no values
+    empty = np.nan
+
+    def __call__(self, x):
+        return self.estimate(self.sketch(np.asarray(x)))
+
+    def __repr__(self):
+        return self.__name__
+
+    def sketch(self, values):
+        '''The state of `values`.'''
+        return self.sketch_bins(values, np.zeros(len(values), dtype=int), 1)[0]
+
+    def merge(self, states):
+        '''The state of the union of the values of `states` (missing states are skipped).'''
+        states = list(states)
+        return self.merge_bins(states, np.zeros(len(states), dtype=int), 1)[0]
+
+    def estimate(self, state):
+        '''The estimate of a state (missing states are empty).'''
+        return self.estimate_bins([state])[0]
+
+    def sketch_bins(self, values, codes, n_codes):
+        '''The states of the values of each of `n_codes` bins (`codes` gives the bin of each value, -1 for none).'''
+        values = np.asarray(values)
+
+        valid = ~pd.isna(values) & (codes >= 0)
+        keys, weights = self._keys(values[valid])
+
+        return self._states(codes[valid], keys, weights, n_codes)
+
+    def sketch_estimate_bins(self, values, codes, n_codes):
+        '''The estimates of the values of each of `n_codes` bins, without building the states.'''
+        values = np.asarray(values)
+
+        valid = ~pd.isna(values) & (codes >= 0)
+        keys, weights = self._keys(values[valid])
+        keys, weights, bounds = self._reduce_bins(codes[valid], keys, weights, n_codes)
+
+        return self._estimates(np.diff(bounds), keys, weights)
+
+    def merge_bins(self, states, codes, n_codes):
+        '''The merged states of each of `n_codes` bins (`codes` gives the bin of each state, -1 for none).'''
+        states, codes = np.asarray(states, dtype=object), np.asarray(codes)
+
+        valid = ~pd.isna(states) & (codes >= 0)
+        states, codes = states[valid], codes[valid]
+
+        lengths = np.array([len(state.keys) for state in states], dtype=int)
+
+        return self._states(
+            np.repeat(codes, lengths),
+            np.concatenate([state.keys for state in states] + [np.array([], dtype=np.int64)]),
+            np.concatenate([state.weights for state in states] + [np.array([], dtype=np.int64)]),
+            n_codes,
+        )
+
+    def estimate_bins(self, states):
+        '''The estimates of `states` (numpy array).'''
+        states = np.asarray(states, dtype=object)
+
+        valid = ~pd.isna(states)
+
+        lengths = np.zeros(len(states), dtype=int)
+        lengths[valid] = [len(state.keys) for state in states[valid]]
+
+        keys = np.concatenate([state.keys for state in states[valid]] + [np.array([], dtype=np.int64)])
+        weights = np.concatenate([state.weights for state in states[valid]] + [np.array([], dtype=np.int64)])
+
+        return self._estimates(lengths, keys, weights)
+
+    def _reduce_bins(self, codes, keys, weights, n_codes):
+        '''Sorts and reduces (code, key, weight) to one entry per (code, key). Returns the keys, weights and the bounds of each code.'''
+        order = np.lexsort((weights, keys, codes))
+        codes, keys, weights = codes[order], keys[order], weights[order]
+
+        if len(codes):
+            new = np.r_[True, (codes[1:] != codes[:-1]) | (keys[1:] != keys[:-1])]
+            codes, keys, weights = self._reduce(new, codes, keys, weights)
+
+        return keys, weights, np.searchsorted(codes, np.arange(n_codes + 1))
+
+    def _states(self, codes, keys, weights, n_codes):
+        '''Sorts and reduces (code, key, weight) into one state per code.'''
+        keys, weights, bounds = self._reduce_bins(codes, keys, weights, n_codes)
+
+        states = np.empty(n_codes, dtype=object)
+        for code, (start, stop) in enumerate(zip(bounds[:-1].tolist(), bounds[1:].tolist())):
+            states[code] = _SketchState(keys[start:stop], weights[start:stop])
+
+        if self.max_bins is not None:
+            for code in np.flatnonzero(np.diff(bounds) > self.max_bins):
+                states[code] = self._collapse(states[code])
+
+        return states
+
+class ApproxQuantile(_Sketch):
+    '''Approximate quantile aggregation (DDSketch). See `approx_quantile`.'''
+
+    # Keys of negative values are negative, keys of positive values are positive, 0 is 0
+    _OFFSET = 2 ** 31
+
+    def __init__(self, q, accuracy, max_bins):
+        self.q = q
+        self.accuracy = accuracy
+        self.max_bins = max_bins
+        self.gamma = (1 + accuracy) / (1 - accuracy)
+        self.__name__ = f'approx_quantile_{q:g}'
+
+    def _keys(self, values):
+        values = values.astype(float)
+
+        # The log of the nonzero values only (0 has its own key)
+        nonzero = values != 0
+        index = np.zeros(len(values))
+        index[nonzero] = np.ceil(np.log(np.abs(values[nonzero])) / np.log(self.gamma))
+
+        keys = np.where(nonzero, np.sign(values) * (index + self._OFFSET), 0).astype(np.int64)
+
+        return keys, np.ones(len(keys), dtype=np.int64)
+
+    def _reduce(self, new, codes, keys, counts):
+        '''Sums the counts of equal (code, key).'''
+        starts = np.flatnonzero(new)
+        return codes[starts], keys[starts], np.add.reduceat(counts, starts)
+
+    def _collapse(self, state):
+        '''Collapses the lowest buckets of a state into one, down to `max_bins` buckets.'''
+        cut = len(state.keys) - self.max_bins
+
+        return _SketchState(state.keys[cut:], np.r_[state.weights[:cut + 1].sum(), state.weights[cut + 1:]])
+
+    def _estimates(self, lengths, keys, counts):
+        ends = np.cumsum(lengths)
+        starts = ends - lengths
+
+        cumulative = np.cumsum(counts)
+        before = np.r_[0, cumulative][starts]
+        totals = np.r_[0, cumulative][ends] - before
+
+        # The key of the first bucket past the rank of the quantile, in each state
+        rank = before + self.q * (totals - 1)
+        position = np.searchsorted(cumulative, rank, side='right').clip(max=max(len(keys) - 1, 0))
+
+        key = keys[position] if len(keys) else np.zeros(len(lengths), dtype=np.int64)
+        value = 2 * self.gamma ** (np.abs(key) - self._OFFSET).astype(float) / (self.gamma + 1)
+
+        return np.where(lengths == 0, np.nan, np.where(key == 0, 0.0, np.sign(key) * value))
+
+class ApproxNunique(_Sketch):
+    '''Approximate number of unique values aggregation (HyperLogLog). See `approx_nunique`.'''
+
+    __name__ = 'approx_nunique'
+
+    empty = 0
+
+    def __init__(self, precision):
+        self.precision = precision
+        self.m = 2 ** precision
+
+    def _keys(self, values):
+        hashes = pd.util.hash_array(values)
+
+        # Register index: the first bits, rank: the position of the first 1 in the other bits
+        index = (hashes >> np.uint64(64 - self.precision)).astype(np.int64)
+        rank = _leading_zeros(hashes << np.uint64(self.precision)).clip(max=64 - self.precision) + 1
+
+        return index, rank.astype(np.int64)
+
+    def _reduce(self, new, codes, keys, ranks):
+        '''Keeps the maximum rank of equal (code, key) (ranks are sorted).'''
+        ends = np.r_[np.flatnonzero(new)[1:], len(new)] - 1
+        return codes[ends], keys[ends], ranks[ends]
+
+    def _estimates(self, lengths, keys, ranks):
+        # Sum of 2 ** -register over the registers: the empty registers count 1
+        inverse = np.add.reduceat(np.r_[2.0 ** -ranks.astype(float), 0.0], (np.cumsum(lengths) - lengths).clip(max=len(ranks)))
+        inverse = np.where(lengths > 0, inverse, 0) + (self.m - lengths)
+
+        alpha = 0.7213 / (1 + 1.079 / self.m)
+        estimate = alpha * self.m ** 2 / inverse
+
+        # Small range correction (linear counting)
+        zeros = self.m - lengths
+        small = (estimate <= 2.5 * self.m) & (zeros > 0)
+        estimate[small] = self.m * np.log(self.m / zeros[small])
+
+        return np.round(estimate).astype(np.int64)
+
+def _leading_zeros(x):
+    '''Number of leading zero bits of each uint64 of `x`.'''
+    x = x.copy()
+    zeros = np.zeros(len(x), dtype=np.int64)
+
+    for shift in [32, 16, 8, 4, 2, 1]:
+        small = (x >> np.uint64(64 - shift)) == 0
+        zeros[small] += shift
+        x[small] <<= np.uint64(shift)
+
+    # x == 0 has 64 leading zeros
+    zeros[x == 0] = 64
+
+    return zeros
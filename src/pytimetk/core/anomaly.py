@@ -2,12 +2,17 @@ import pandas as pd
 import pandas_flavor as pf
 import numpy as np
 
-from typing import Union
+from typing import Union, Optional, List
+
+from functools import partial
+from multiprocessing import cpu_count
+from concurrent.futures import ProcessPoolExecutor
 
 from pytimetk.utils.checks import check_dataframe_or_groupby, check_date_column, check_value_column
 
-from statsmodels.tsa.seasonal import STL
-from statsmodels.tsa.seasonal import seasonal_decompose
+from numpy.lib.stride_tricks import sliding_window_view
+
+__all__ = ['anomalize', 'anomalize_decompose', 'anomalize_score']
 
 @pf.register_dataframe_method
 def anomalize(
@@ -21,9 +26,43 @@ def anomalize(
     iqr_alpha: float = 0.05,
     max_anomalies: float = 0.2,
     bind_data = False,
+    threads: Optional[int] = 1,
     
 ) -> pd.DataFrame:
     """
+    Detects anomalies in a time series (or in each group of a grouped time series) by decomposing it, flagging remainder outliers with the IQR method, and cleaning them.
+    
+    Parameters
+    ----------
+    data : pd.DataFrame or pd.core.groupby.generic.DataFrameGroupBy
+        The `data` parameter is the input data. If a grouped DataFrame is provided, each group is decomposed, scored and cleaned independently.
+    date_column : str
+        The `date_column` parameter is the name of the datetime column.
+    value_column : str
+        The `value_column` parameter is the name of the numeric column to anomalize.
+    period : int, optional
+        The `period` parameter is the seasonal period. If `None`, it is inferred from the dates of each series.
+    method : str, optional
+        The `method` parameter is the decomposition method: `'twitter'` (seasonal decomposition with a median trend) or `'stl'` (seasonal decomposition with a moving average trend).
+    decomp : str, optional
+        The `decomp` parameter is the decomposition model, `'additive'` or `'multiplicative'`.
+    clean : str, optional
+        The `clean` parameter is the interpolation method used to replace the anomalies in `observed_clean`.
+    iqr_alpha : float, optional
+        The `iqr_alpha` parameter controls the width of the IQR limits. Smaller values give wider limits.
+    max_anomalies : float, optional
+        The `max_anomalies` parameter is the maximum proportion of anomalies.
+    bind_data : bool, optional
+        The `bind_data` parameter determines whether to bind the results to the original data.
+    threads : int, optional
+        The `threads` parameter is the number of processes used for grouped data. Groups are sent to the processes in chunks. 
+        - If is 1 (default), the groups are processed one after another.
+        - If is `None` or -1, the function will use all available processors on the system.
+    
+    Returns
+    -------
+    pd.DataFrame
+        A DataFrame in the original row order with the decomposition (`observed`, `seasonal`, `seasadj`, `trend`, `remainder`), the anomaly flags and scores, the recomposed limits and the cleaned series. If grouped data is provided, the DataFrame will contain the grouping columns as well.
     
     Examples
     --------
@@ -69,65 +108,514 @@ def anomalize(
         .plot_timeseries("date", "val", color_column = "variable", smooth = False)
     
     ```
+    
+    ``` {python}
+    # Grouped anomalize, one decomposition per group
+    df = tk.load_dataset('m4_daily', parse_dates = ['date'])
+    
+    anomalize_df = (
+        df
+            .groupby('id')
+            .anomalize("date", "value", period = 7, threads = 2)
+    )
+    
+    anomalize_df.query("anomaly=='Yes'")
+    ```
     """
     
     check_dataframe_or_groupby(data)
     check_date_column(data, date_column)
     check_value_column(data, value_column)
     
+    df, group_names, order, offsets = _anomaly_sort(data, date_column)
+    
     # STEP 1: Decompose the time series
-    if method == 'twitter':
-        
-        result = _twitter_decompose(
-            data = data, 
-            date_column=date_column, 
-            value_column=value_column, 
-            period=period,
-            median_span=None,
-            model=decomp
+    decomposition = _anomaly_decompose(
+        df, date_column, value_column, order, offsets, 
+        period  = period, 
+        method  = method, 
+        decomp  = decomp, 
+        threads = threads
+    )
+    
+    # STEPS 2-4: Identify the outliers, recompose and clean
+    q1, q3 = _anomaly_quartiles(decomposition['remainder'], offsets)
+    
+    scores = _anomaly_score(
+        decomposition, offsets, q1, q3, 
+        iqr_alpha     = iqr_alpha, 
+        max_anomalies = max_anomalies, 
+        clean         = clean
+    )
+    
+    result = _anomaly_assemble(df, group_names, date_column, order, {**decomposition, **scores})
+    
+    # STEP 5: Bind the data
+    if bind_data:
+        result = pd.concat([df.loc[result.index], result.drop([*(group_names or []), date_column], axis=1)], axis=1)
+    
+    return result
+
+# Monkey patch the method to pandas groupby objects
+pd.core.groupby.generic.DataFrameGroupBy.anomalize = anomalize
+
+@pf.register_dataframe_method
+def anomalize_decompose(
+    data: Union[pd.DataFrame, pd.core.groupby.generic.DataFrameGroupBy],
+    date_column: str,
+    value_column: str,
+    period: int = None,
+    method: str = 'twitter',
+    decomp: str = 'additive',
+    threads: Optional[int] = 1,
+) -> pd.DataFrame:
+    """
+    Runs the decomposition step of `anomalize` only. 
+    
+    The decomposition is the expensive part of `anomalize`. Its result can be cached (e.g. saved to disk) and passed to `anomalize_score` any number of times, for example to tune `iqr_alpha`.
+    
+    Parameters
+    ----------
+    data : pd.DataFrame or pd.core.groupby.generic.DataFrameGroupBy
+        The `data` parameter is the input data. If a grouped DataFrame is provided, each group is decomposed independently.
+    date_column : str
+        The `date_column` parameter is the name of the datetime column.
+    value_column : str
+        The `value_column` parameter is the name of the numeric column to decompose.
+    period : int, optional
+        The `period` parameter is the seasonal period. If `None`, it is inferred from the dates of each series.
+    method : str, optional
+        The `method` parameter is the decomposition method: `'twitter'` or `'stl'`. See `anomalize`.
+    decomp : str, optional
+        The `decomp` parameter is the decomposition model, `'additive'` or `'multiplicative'`.
+    threads : int, optional
+        The `threads` parameter is the number of processes used for grouped data. See `anomalize`.
+    
+    Returns
+    -------
+    pd.DataFrame
+        A DataFrame in the original row order with the grouping columns (if any), the date column and the `observed`, `seasonal`, `seasadj`, `trend` and `remainder` columns.
+    
+    Examples
+    --------
+    ``` {python}
+    import pytimetk as tk
+    
+    df = tk.load_dataset('m4_daily', parse_dates = ['date'])
+    
+    # Decompose once
+    decomposition_df = df.groupby('id').anomalize_decompose("date", "value", period = 7)
+    
+    # Score many times
+    sweep_df = (
+        decomposition_df
+            .groupby('id')
+            .anomalize_score("date", iqr_alpha = [0.01, 0.025, 0.05, 0.1])
+    )
+    
+    sweep_df.groupby(['id', 'iqr_alpha'])['anomaly'].apply(lambda x: (x == 'Yes').sum())
+    ```
+    """
+    
+    check_dataframe_or_groupby(data)
+    check_date_column(data, date_column)
+    check_value_column(data, value_column)
+    
+    df, group_names, order, offsets = _anomaly_sort(data, date_column)
+    
+    decomposition = _anomaly_decompose(
+        df, date_column, value_column, order, offsets, 
+        period  = period, 
+        method  = method, 
+        decomp  = decomp, 
+        threads = threads
+    )
+    
+    return _anomaly_assemble(df, group_names, date_column, order, decomposition)
+
+# Monkey patch the method to pandas groupby objects
+pd.core.groupby.generic.DataFrameGroupBy.anomalize_decompose = anomalize_decompose
+
+@pf.register_dataframe_method
+def anomalize_score(
+    data: Union[pd.DataFrame, pd.core.groupby.generic.DataFrameGroupBy],
+    date_column: str,
+    iqr_alpha: Union[float, List[float]] = 0.05,
+    max_anomalies: float = 0.2,
+    clean: str = 'linear',
+) -> pd.DataFrame:
+    """
+    Runs the outlier scoring, recomposition and cleaning steps of `anomalize` on the output of `anomalize_decompose`.
+    
+    The IQR quartiles of each series are computed once, so scoring several `iqr_alpha` values costs one quartile pass plus one vectorized comparison per value.
+    
+    Parameters
+    ----------
+    data : pd.DataFrame or pd.core.groupby.generic.DataFrameGroupBy
+        The `data` parameter is the output of `anomalize_decompose`. If it was grouped, group it by the same columns.
+    date_column : str
+        The `date_column` parameter is the name of the datetime column.
+    iqr_alpha : float or list, optional
+        The `iqr_alpha` parameter controls the width of the IQR limits. If a list (or array) of values is provided, the results for all values are stacked and an `iqr_alpha` column is added.
+    max_anomalies : float, optional
+        The `max_anomalies` parameter is the maximum proportion of anomalies.
+    clean : str, optional
+        The `clean` parameter is the interpolation method used to replace the anomalies in `observed_clean`.
+    
+    Returns
+    -------
+    pd.DataFrame
+        The same columns as `anomalize` (plus `iqr_alpha` when a list of values is provided).
+    
+    Examples
+    --------
+    ``` {python}
+    import pytimetk as tk
+    
+    df = tk.load_dataset('m4_daily', parse_dates = ['date'])
+    
+    decomposition_df = df.groupby('id').anomalize_decompose("date", "value", period = 7)
+    
+    decomposition_df.groupby('id').anomalize_score("date", iqr_alpha = 0.05)
+    ```
+    """
+    
+    check_dataframe_or_groupby(data)
+    check_date_column(data, date_column)
+    check_value_column(data, _DECOMPOSITION_COLUMNS)
+    
+    df, group_names, order, offsets = _anomaly_sort(data, date_column)
+    
+    decomposition = {column: df[column].to_numpy(dtype=float)[order] for column in _DECOMPOSITION_COLUMNS}
+    
+    q1, q3 = _anomaly_quartiles(decomposition['remainder'], offsets)
+    
+    results = []
+    for alpha in np.atleast_1d(iqr_alpha):
+        scores = _anomaly_score(
+            decomposition, offsets, q1, q3, 
+            iqr_alpha     = alpha, 
+            max_anomalies = max_anomalies, 
+            clean         = clean
         )
+        
+        result = _anomaly_assemble(df, group_names, date_column, order, {**decomposition, **scores})
+        
+        if np.ndim(iqr_alpha) > 0:
+            result.insert(len(group_names or []), 'iqr_alpha', alpha)
+        
+        results.append(result)
+    
+    if np.ndim(iqr_alpha) == 0:
+        return results[0]
+    
+    return pd.concat(results)
+
+# Monkey patch the method to pandas groupby objects
+pd.core.groupby.generic.DataFrameGroupBy.anomalize_score = anomalize_score
+
+# UTILITIES
+# ------------------------------------------------------------------------------
+
+_DECOMPOSITION_COLUMNS = ['observed', 'seasonal', 'seasadj', 'trend', 'remainder']
+
+def _anomaly_sort(data, date_column):
+    '''Factorizes the groups once and sorts the rows by group, then date. 
+    
+    Returns the DataFrame, the group names (None if ungrouped), the sorted row positions (rows of dropped groups, with code -1, are left out) and the group offsets into the sorted rows.
+    '''
+    group_names = None
+    if isinstance(data, pd.DataFrame):
+        df = data
+        codes = np.zeros(len(df), dtype=int)
     else:
-        result = _seasonal_decompose(
-            data = data, 
-            date_column=date_column, 
-            value_column=value_column, 
-            period = period,
-            model=decomp,
-            filt=None,
-            two_sided=True, 
-            extrapolate_trend = 'freq'
-        )
+        group_names = data.grouper.names
+        df = data.obj
+        codes = data.ngroup().to_numpy()
     
-    # STEP 2: Identify the outliers
+    keep = np.flatnonzero(codes >= 0)
+    order = keep[np.lexsort((df[date_column].to_numpy(dtype='datetime64[ns]')[keep], codes[keep]))]
+    offsets = np.concatenate([[0], np.cumsum(np.bincount(codes[order]))])
+    
+    return df, group_names, order, offsets
+
+def _anomaly_decompose(df, date_column, value_column, order, offsets, period, method, decomp, threads):
+    '''Decomposes each group, batched when possible, optionally in a process pool. Returns a dict of the decomposition columns as arrays in sorted row order.'''
+    
+    if threads is None: threads = cpu_count()
+    if threads == -1: threads = cpu_count()
+    
+    dates = df[date_column].iloc[order]
+    values = df[value_column].to_numpy(dtype=float)[order]
+    
+    batch_period = _batch_period(dates, values, offsets, period, decomp)
+    
+    if batch_period is not None:
+        # Equal length groups: decompose blocks of groups at once as (series x time) matrices
+        decompose_group = partial(_decompose_batch, period = batch_period, decomp = decomp)
+        
+        x = values.reshape(len(offsets) - 1, -1)
+        block_size = int(np.ceil(len(x) / (threads * 4))) if threads != 1 else len(x)
+        groups = [(x[i:i + block_size],) for i in range(0, len(x), block_size)]
+    else:
+        decompose_group = partial(_decompose_group, period = period, decomp = decomp)
+        
+        groups = [
+            (dates.iloc[start:stop], values[start:stop]) 
+            for start, stop in zip(offsets[:-1], offsets[1:])
+        ]
+    
+    if threads != 1 and len(groups) > 1:
+        chunk_size = int(np.ceil(len(groups) / (threads * 4)))
+        chunks = [groups[i:i + chunk_size] for i in range(0, len(groups), chunk_size)]
+        
+        with ProcessPoolExecutor(threads) as executor:
+            results = [
+                result 
+                for chunk_results in executor.map(partial(_decompose_chunk, decompose_group=decompose_group), chunks) 
+                for result in chunk_results
+            ]
+    else:
+        results = [decompose_group(*group) for group in groups]
+    
+    decomposition = {
+        column: np.concatenate([result[column] for result in results]) 
+        for column in ['observed', 'seasonal', 'seasadj', 'trend']
+    }
+    
+    # The twitter median trend of all groups at once
+    if method == 'twitter':
+        decomposition['trend'] = _median_trend(decomposition['seasadj'], offsets, median_span = 4)
+    
+    decomposition['remainder'] = decomposition['seasadj'] - decomposition['trend']
+    
+    return decomposition
+
+def _anomaly_quartiles(remainder, offsets):
+    '''Returns the 25% and 75% quantiles of the remainder of each group, repeated for each row of the group.'''
+    lengths = np.diff(offsets)
     
-    outlier_df = _iqr(
-        data = result, 
-        target = 'remainder', 
-        alpha = iqr_alpha, 
-        max_anoms = max_anomalies
+    quartiles = _group_quantiles(remainder, offsets, [0.25, 0.75])
+    
+    return np.repeat(quartiles[:, 0], lengths), np.repeat(quartiles[:, 1], lengths)
+
+def _group_quantiles(values, offsets, q):
+    '''Quantiles (same as `np.quantile`, linear interpolation) of the contiguous segments `values[offsets[i]:offsets[i + 1]]`, with one sort for all segments. Returns a (segments x quantiles) array.'''
+    lengths = np.diff(offsets)
+    segments = np.repeat(np.arange(len(lengths)), lengths)
+    
+    sorted_values = values[np.lexsort((values, segments))]
+    
+    # Virtual index of each quantile in each segment
+    virtual = np.asarray(q)[None, :] * (lengths[:, None] - 1)
+    below = np.floor(virtual)
+    gamma = virtual - below
+    
+    lo = sorted_values[offsets[:-1, None] + below.astype(int)]
+    hi = sorted_values[offsets[:-1, None] + np.minimum(below.astype(int) + 1, lengths[:, None] - 1)]
+    
+    # Same interpolation as numpy
+    diff = hi - lo
+    return np.where(gamma >= 0.5, hi - diff * (1 - gamma), lo + diff * gamma)
+
+def _median_trend(seasadj, offsets, median_span=4):
+    '''Twitter median trend of each group: the median of `median_span` consecutive segments of the group (the first `nobs % median_span` segments are one longer). All segments of all groups are computed at once.'''
+    lengths = np.diff(offsets)
+    nobs = np.repeat(lengths, lengths)
+    position = np.arange(len(seasadj)) - np.repeat(offsets[:-1], lengths)
+    
+    quotient, remainder = np.divmod(nobs, median_span)
+    long_rows = remainder * (quotient + 1)
+    
+    segment = np.where(
+        position < long_rows, 
+        position // (quotient + 1), 
+        remainder + (position - long_rows) // np.maximum(quotient, 1)
     )
+    segment = segment + median_span * np.repeat(np.arange(len(lengths)), lengths)
     
-    # STEP 3: Recompose the time series
+    # Segments are contiguous (rows are sorted by group, then date). Series shorter than `median_span` have empty segments.
+    segment_lengths = np.bincount(segment)
+    nonempty = segment_lengths > 0
     
-    result['anomaly'] = outlier_df['outlier_reported']
-    result['anomaly_score'] = outlier_df['score']
-    result['anomaly_direction'] = outlier_df['direction']
+    medians = np.full(len(segment_lengths), np.nan)
+    medians[nonempty] = _group_quantiles(
+        seasadj, np.concatenate([[0], np.cumsum(segment_lengths[nonempty])]), [0.5]
+    )[:, 0]
     
-    result['recomposed_l1'] = result['seasonal'] + result['trend'] + outlier_df['remainder_l1']
+    return medians[segment]
+
+def _anomaly_score(decomposition, offsets, q1, q3, iqr_alpha, max_anomalies, clean):
+    '''Flags the remainder outliers (same limits as `_iqr`), recomposes the limits and cleans the anomalies. Returns a dict of the anomaly columns as arrays in sorted row order.'''
+    remainder = decomposition['remainder']
     
-    result['recomposed_l2'] = result['seasonal'] + result['trend'] + outlier_df['remainder_l2']
+    # STEP 2: Identify the outliers
+    limits = _iqr_limits(q1, q3, iqr_alpha)
     
-    # STEP 4: Clean the Anomalies
-    result['observed_clean'] = result['observed'] \
-        .where(result['anomaly']=='No', np.nan) \
-        .interpolate(method=clean, limit_direction='both')
+    centerline = sum(limits) / 2
     
-    # STEP 5: Bind the data
-    if bind_data:
-        result = pd.concat([data, result.drop(date_column, axis=1)], axis=1)
+    is_anomaly = (remainder < limits[0]) | (remainder > limits[1])
+    
+    # STEP 3: Recompose the time series
+    scores = {
+        'anomaly':           np.where(is_anomaly, "Yes", "No"),
+        'anomaly_score':     abs(remainder - centerline),
+        'anomaly_direction': np.where(remainder > limits[1], 1, np.where(remainder < limits[0], -1, 0)),
+        'recomposed_l1':     decomposition['seasonal'] + decomposition['trend'] + limits[0],
+        'recomposed_l2':     decomposition['seasonal'] + decomposition['trend'] + limits[1],
+    }
+    
+    # STEP 4: Clean the Anomalies (only groups with anomalies need interpolating)
+    observed_clean = decomposition['observed'].copy()
+    
+    for start, stop in zip(offsets[:-1], offsets[1:]):
+        if is_anomaly[start:stop].any():
+            observed_clean[start:stop] = pd.Series(np.where(is_anomaly[start:stop], np.nan, observed_clean[start:stop])) \
+                .interpolate(method=clean, limit_direction='both') \
+                .to_numpy()
+    
+    scores['observed_clean'] = observed_clean
+    
+    return scores
+
+def _iqr_limits(q1, q3, alpha):
+    '''Returns the lower and upper remainder limits for the quartiles `q1` and `q3` (same limits as `_iqr`).'''
+    iq_range = q3 - q1
+    return [-1*(q1 + (0.15 / alpha) * iq_range), q3 + (0.15 / alpha) * iq_range]
+
+def _anomaly_assemble(df, group_names, date_column, order, columns):
+    '''Builds the result DataFrame from arrays in sorted row order, in the original row order (one inverse permutation).'''
+    restore = np.argsort(order)
+    rows = order[restore]
+    
+    result = pd.DataFrame(
+        {column: values[restore] for column, values in columns.items()}, 
+        index = df.index[rows]
+    )
+    result.insert(0, date_column, df[date_column].iloc[rows])
+    
+    if group_names is not None:
+        for i, col in enumerate(group_names):
+            result.insert(i, col, df[col].iloc[rows])
     
     return result
+
+def _decompose_chunk(chunk, decompose_group):
+    '''Runs `decompose_group` on each group (or block of batched groups) of a chunk. Used by the process pool.'''
+    return [decompose_group(*group) for group in chunk]
+
+def _decompose_group(dates, values, period, decomp):
+    '''Classical decomposition of one series sorted by date. Returns a dict of the `observed`, `seasonal`, `seasadj` and `trend` arrays.'''
+    
+    data = pd.DataFrame({'date': dates.reset_index(drop=True), 'value': values})
+    
+    result = _seasonal_decompose(
+        data = data, 
+        date_column='date', 
+        value_column='value', 
+        period = period,
+        model=decomp,
+        filt=None,
+        two_sided=True, 
+        extrapolate_trend = 'freq'
+    )
+    
+    return {column: result[column].to_numpy() for column in ['observed', 'seasonal', 'seasadj', 'trend']}
+
+def _batch_period(dates, values, offsets, period, decomp):
+    '''Returns the period to use for the batched decomposition, or None if the groups cannot be batched.
+    
+    Groups can be batched when they all have the same length, the values are finite (and positive for a multiplicative model), and each series has at least 2 complete cycles. When `period` is None, the dates must also be regular with the same step in every group, so that one inferred period applies to all groups.
+    '''
+    lengths = np.diff(offsets)
+    n = lengths[0]
+    
+    if (lengths != n).any() or not np.isfinite(values).all():
+        return None
+    
+    if decomp.startswith('m') and (values <= 0).any():
+        return None
     
+    if period is None:
+        steps = np.diff(dates.to_numpy(dtype='datetime64[ns]').view('int64').reshape(len(lengths), n), axis=1)
+        if n < 3 or (steps != steps[0, 0]).any():
+            return None
+        
+        inferred_freq = pd.DatetimeIndex(dates.iloc[:n]).inferred_freq
+        if inferred_freq is None:
+            return None
+        from statsmodels.tsa.tsatools import freq_to_period
+        period = freq_to_period(inferred_freq)
+    
+    if n < 2 * period:
+        return None
+    
+    return period
+
+def _decompose_batch(x, period, decomp):
+    '''Classical decomposition of a (series x time) matrix of equal length series sorted by date, all at once. Same results as `_decompose_group` on each row. Returns a dict of the `observed`, `seasonal`, `seasadj` and `trend` columns as flat (row-major) arrays.'''
+    
+    seasonal, trend = _batch_seasonal_decompose(x, period = period, model = decomp)
+    
+    result = {
+        'observed':  x,
+        'seasonal':  seasonal,
+        'seasadj':   x - seasonal,
+        'trend':     trend,
+    }
+    
+    return {column: values.ravel() for column, values in result.items()}
+
+def _batch_seasonal_decompose(x, period, model='additive'):
+    '''Classical decomposition of each row of a (series x time) matrix, same as `statsmodels` `seasonal_decompose(period=period, two_sided=True, extrapolate_trend='freq')`. Returns the seasonal and trend matrices.'''
+    n_series, nobs = x.shape
+    
+    # Centered moving average
+    if period % 2 == 0:
+        filt = np.array([.5] + [1] * (period - 1) + [.5]) / period
+    else:
+        filt = np.repeat(1. / period, period)
+    
+    half = len(filt) // 2
+    trend = np.full(x.shape, np.nan)
+    trend[:, half:nobs - half] = sliding_window_view(x, len(filt), axis=1) @ filt
+    
+    # Extrapolate the trend ends with a least squares line through the `period` closest points
+    if period > 1:
+        front, back = half, nobs - 1 - half
+        front_last = min(front + period, back)
+        back_first = max(front, back - period)
+        
+        k, n = np.linalg.lstsq(
+            np.c_[np.arange(front, front_last), np.ones(front_last - front)], 
+            trend[:, front:front_last].T, 
+            rcond=-1
+        )[0]
+        trend[:, :front] = np.arange(0, front) * k[:, None] + n[:, None]
+        
+        k, n = np.linalg.lstsq(
+            np.c_[np.arange(back_first, back), np.ones(back - back_first)], 
+            trend[:, back_first:back].T, 
+            rcond=-1
+        )[0]
+        trend[:, back + 1:] = np.arange(back + 1, nobs) * k[:, None] + n[:, None]
+    
+    # Per-phase seasonal means
+    detrended = x / trend if model.startswith('m') else x - trend
+    
+    n_cycles = -(-nobs // period)
+    padded = np.full((n_series, n_cycles * period), np.nan)
+    padded[:, :nobs] = detrended
+    period_averages = np.nanmean(padded.reshape(n_series, n_cycles, period), axis=1)
+    
+    if model.startswith('m'):
+        period_averages /= np.mean(period_averages, axis=1, keepdims=True)
+    else:
+        period_averages -= np.mean(period_averages, axis=1, keepdims=True)
+    
+    seasonal = np.tile(period_averages, n_cycles)[:, :nobs]
+    
+    return seasonal, trend
 
 def _seasonal_decompose(
     data, 
@@ -163,6 +651,9 @@ def _seasonal_decompose(
     series = data.set_index(date_column)[value_column]
      
     
+    # statsmodels is imported on first use (it is slow to import)
+    from statsmodels.tsa.seasonal import seasonal_decompose
+    
     # Need to add freq, trend, and kwargs
     result = seasonal_decompose(
         series, 
@@ -221,6 +712,9 @@ def _stl_decompose(data, date_column, value_column, period = None, seasonal_span
     def make_odd(n):
         return n + 1 if n % 2 == 0 else n   
     
+    # statsmodels is imported on first use (it is slow to import)
+    from statsmodels.tsa.seasonal import STL
+    
     # Need to add freq, trend, and kwargs
     result = STL(
         series, 
@@ -259,6 +753,9 @@ def _twitter_decompose(
     series = data.set_index(date_column)[value_column]
      
     
+    # statsmodels is imported on first use (it is slow to import)
+    from statsmodels.tsa.seasonal import seasonal_decompose
+    
     # Need to add freq, trend, and kwargs
     result = seasonal_decompose(
         series, 
@@ -277,15 +774,10 @@ def _twitter_decompose(
     if median_span is None:
         median_span = 4
     
-    def repeat_sequence(seq, length_out):
-        quotient, remainder = divmod(length_out, len(seq))
-        return seq * quotient + seq[:remainder]
-    
-    df = pd.DataFrame(seasadj)
-    
-    df['median_index'] = sorted(repeat_sequence(list(range(median_span)), len(seasadj)))
-    
-    trend = df.groupby('median_index')['seasadj'].transform('median')
+    trend = pd.Series(
+        _median_trend(seasadj.to_numpy(), np.array([0, len(seasadj)]), median_span = median_span), 
+        index = seasadj.index
+    )
     
     resid = seasadj - trend
     
@@ -327,32 +819,22 @@ def _iqr(data, target, alpha=0.05, max_anoms=0.2):
     ```
     """
     
-    data = data.copy()
+    x = data[target].to_numpy(dtype=float)
     
     # Compute the interquartile range
-    q1, q3 = np.percentile(data[target], [25, 75])
-    iq_range = q3 - q1
-    limits = [-1*(q1 + (0.15 / alpha) * iq_range), q3 + (0.15 / alpha) * iq_range]
-
-    # Identify the outliers
-    outlier_idx = (data[target] < limits[0]) | (data[target] > limits[1])
-    outlier_vals = data.loc[outlier_idx, target]
+    q1, q3 = np.percentile(x, [25, 75])
+    limits = _iqr_limits(q1, q3, alpha)
 
     # Calculate the anomaly_score from the centerline
     centerline = sum(limits) / 2
-    data['score'] = abs(data[target] - centerline)
-
-    # Yes/No flag for outlier
-    data['outlier_reported'] = np.where(data[target] > limits[1], "Yes", np.where(data[target] < limits[0], "Yes", "No"))
-
-    # Direction of the outlier
-    data['direction'] = np.where(data[target] > limits[1], 1, np.where(data[target] < limits[0], -1, 0))
-    
-    # Remainder Limits
-    data['remainder_l1'] = limits[0]
-    data['remainder_l2'] = limits[1]
-    
-    return data[['outlier_reported', 'direction', 'score', 'remainder_l1', 'remainder_l2']]
-    
-
 
+    return pd.DataFrame({
+        # Yes/No flag for outlier
+        'outlier_reported': np.where((x > limits[1]) | (x < limits[0]), "Yes", "No"),
+        # Direction of the outlier
+        'direction':        np.where(x > limits[1], 1, np.where(x < limits[0], -1, 0)),
+        'score':            np.abs(x - centerline),
+        # Remainder Limits
+        'remainder_l1':     limits[0],
+        'remainder_l2':     limits[1],
+    }, index = data.index)
@@ -0,0 +1,343 @@
+import pandas as pd
+import numpy as np
+import warnings
+
+from typing import Union
+
+from pytimetk.utils.checks import check_dataframe_or_groupby, check_date_column, check_value_column
+
+from pytimetk.core.anomaly import _anomaly_sort, _anomaly_decompose, _iqr_limits
+
+__all__ = ['AnomalyDetector']
+
+
+class AnomalyDetector:
+    """
+    Online (streaming) anomaly detection for one or many time series.
+
+    `AnomalyDetector` scores each new point as soon as it arrives, without re-running `anomalize` on the trailing history. The detector is warm-started with `fit()` on the history (using the same decomposition as `anomalize`) and then keeps, for every series, a seasonal profile, a trend level and a rolling window of remainders. `update()` decomposes each new point against that state and flags it with the same IQR limits as `anomalize`. The state of all series is held in arrays, and each point costs O(1) amortized time.
+
+    Parameters
+    ----------
+    date_column : str
+        The `date_column` parameter is the name of the datetime column.
+    value_column : str
+        The `value_column` parameter is the name of the numeric column to monitor.
+    period : int
+        The `period` parameter is the seasonal period (number of points per cycle). Use 1 for non-seasonal series.
+    method : str, optional
+        The `method` parameter is the decomposition method used by `fit()`: `'twitter'` or `'stl'`. See `anomalize`.
+    decomp : str, optional
+        The `decomp` parameter is the decomposition model, `'additive'` or `'multiplicative'`.
+    iqr_alpha : float, optional
+        The `iqr_alpha` parameter controls the width of the IQR limits. Smaller values give wider limits.
+    window : int, optional
+        The `window` parameter is the number of most recent remainders per series used for the IQR quartiles. If `None`, `max(10 * period, 100)` is used.
+    refresh : int, optional
+        The `refresh` parameter is the number of new points per series between recomputations of its quartiles. If `None`, `max(1, window // 10)` is used.
+    trend_smoothing : float, optional
+        The `trend_smoothing` parameter is the exponential smoothing factor (between 0 and 1) of the trend level. If `None`, `2 / (2 * period + 1)` is used.
+    seasonal_smoothing : float, optional
+        The `seasonal_smoothing` parameter is the exponential smoothing factor (between 0 and 1) of the seasonal profile. Each seasonal position is updated once per cycle.
+
+    Notes
+    -----
+    - Points are assumed to arrive at the regular frequency of the series: each point moves the seasonal position of its series by one.
+    - The trend level and the seasonal profile are updated with the remainder clipped to the IQR band of the series, so a spike barely moves them while a level shift is followed gradually. All remainders enter the quartile window (as in `anomalize`).
+    - Series that were not seen by `fit()` are added on the fly, and are flagged once `min(window, max(2 * period, 10))` points have been seen.
+
+    Examples
+    --------
+    ``` {python}
+    import pytimetk as tk
+
+    df = tk.load_dataset('m4_daily', parse_dates = ['date'])
+
+    history_df = df.groupby('id').apply(lambda x: x.iloc[:-30]).reset_index(drop = True)
+    new_df     = df.groupby('id').apply(lambda x: x.iloc[-30:]).reset_index(drop = True)
+
+    detector = tk.AnomalyDetector("date", "value", period = 7)
+
+    detector.fit(history_df.groupby('id'))
+
+    # Score the new points (e.g. as they arrive)
+    detector.update(new_df)
+    ```
+    """
+
+    def __init__(
+        self,
+        date_column: str,
+        value_column: str,
+        period: int,
+        method: str = 'twitter',
+        decomp: str = 'additive',
+        iqr_alpha: float = 0.05,
+        window: int = None,
+        refresh: int = None,
+        trend_smoothing: float = None,
+        seasonal_smoothing: float = 0.1,
+    ):
+
+        if not isinstance(period, int) or period < 1:
+            raise ValueError("`period` must be a positive integer.")
+
+        if window is None: window = max(10 * period, 100)
+        if refresh is None: refresh = max(1, window // 10)
+        if trend_smoothing is None: trend_smoothing = 2 / (2 * period + 1)
+
+        self.date_column = date_column
+        self.value_column = value_column
+        self.period = period
+        self.method = method
+        self.decomp = decomp
+        self.iqr_alpha = iqr_alpha
+        self.window = window
+        self.refresh = refresh
+        self.trend_smoothing = trend_smoothing
+        self.seasonal_smoothing = seasonal_smoothing
+        self.min_periods = min(window, max(2 * period, 10))
+
+        self.group_names = None
+        self._keys = None
+        self._allocate(0, reset=True)
+
+    def fit(self, data: Union[pd.DataFrame, pd.core.groupby.generic.DataFrameGroupBy]):
+        """
+        Warm-starts the detector on the history of each series.
+
+        Each series is decomposed as in `anomalize` (it needs at least 2 complete cycles). The seasonal component and the level (median seasonally adjusted value) of one cycle start the state of the series, which is then updated with the last `window` points of the history. Calling `fit()` again resets the detector.
+
+        Parameters
+        ----------
+        data : pd.DataFrame or pd.core.groupby.generic.DataFrameGroupBy
+            The `data` parameter is the history. If a grouped DataFrame is provided, one state is kept per group, and the grouping columns must be present in the data passed to `update()`.
+
+        Returns
+        -------
+        AnomalyDetector
+            The fitted detector.
+        """
+
+        check_dataframe_or_groupby(data)
+        check_date_column(data, self.date_column)
+        check_value_column(data, self.value_column)
+
+        df, group_names, order, offsets = _anomaly_sort(data, self.date_column)
+
+        decomposition = _anomaly_decompose(
+            df, self.date_column, self.value_column, order, offsets,
+            period  = self.period,
+            method  = self.method,
+            decomp  = self.decomp,
+            threads = 1
+        )
+
+        n_series = len(offsets) - 1
+
+        self.group_names = group_names
+        self._keys = self._series_keys(df.iloc[order[offsets[:-1]]])
+        self._allocate(n_series, reset=True)
+
+        # The state starts one cycle before the last `window` points (at most) of each series
+        lengths = np.diff(offsets)
+        warmup = np.minimum(self.window, lengths - self.period)
+        starts = offsets[1:] - warmup
+
+        for i, start in enumerate(starts):
+            # The seasonal component repeats every period: the cycle ending at `start` (in the series even if `window < period`)
+            self._profile[i] = decomposition['seasonal'][start - self.period:start]
+            self._level[i] = np.median(decomposition['seasadj'][start - self.period:start])
+
+        # Replay the last points through the online updates, to fill the remainder windows
+        for r in range(warmup.max() if n_series else 0):
+            series = np.flatnonzero(warmup > r)
+            self._step(series, decomposition['observed'][starts[series] + r])
+
+        self._refresh_quartiles(np.arange(n_series))
+
+        return self
+
+    def update(self, data: Union[pd.DataFrame, pd.core.groupby.generic.DataFrameGroupBy]) -> pd.DataFrame:
+        """
+        Scores new points and updates the state of their series.
+
+        Parameters
+        ----------
+        data : pd.DataFrame or pd.core.groupby.generic.DataFrameGroupBy
+            The `data` parameter contains the new points: the grouping columns used in `fit()` (if any), the date column and the value column. Several points per series are processed in date order.
+
+        Returns
+        -------
+        pd.DataFrame
+            A DataFrame in the original row order with the same columns as `anomalize` (`observed`, `seasonal`, `seasadj`, `trend`, `remainder`, `anomaly`, `anomaly_score`, `anomaly_direction`, `recomposed_l1`, `recomposed_l2` and `observed_clean`).
+        """
+
+        if isinstance(data, pd.core.groupby.generic.DataFrameGroupBy):
+            data = data.obj
+
+        check_dataframe_or_groupby(data)
+        check_date_column(data, self.date_column)
+        check_value_column(data, self.value_column)
+
+        # Map each row to its series, adding the series that are new
+        series = self._series_index(data)
+
+        values = data[self.value_column].to_numpy(dtype=float)
+        dates = data[self.date_column].to_numpy(dtype='datetime64[ns]')
+
+        # Points of the same series are processed in rounds, in date order
+        order = np.lexsort((dates, series))
+        sorted_series = series[order]
+        starts = np.flatnonzero(np.r_[True, sorted_series[1:] != sorted_series[:-1]])
+        rank = np.arange(len(order)) - np.repeat(starts, np.diff(np.r_[starts, len(order)]))
+
+        columns = {
+            column: np.empty(len(data))
+            for column in ['observed', 'seasonal', 'seasadj', 'trend', 'remainder', 'anomaly_score', 'anomaly_direction', 'recomposed_l1', 'recomposed_l2', 'observed_clean']
+        }
+        columns['anomaly'] = np.empty(len(data), dtype=object)
+
+        for r in range(rank.max() + 1 if len(rank) else 0):
+            rows = order[rank == r]
+            for column, result in self._step(series[rows], values[rows]).items():
+                columns[column][rows] = result
+
+        result = pd.DataFrame({self.date_column: data[self.date_column]})
+
+        for column in ['observed', 'seasonal', 'seasadj', 'trend', 'remainder', 'anomaly', 'anomaly_score', 'anomaly_direction', 'recomposed_l1', 'recomposed_l2', 'observed_clean']:
+            result[column] = columns[column]
+
+        result['anomaly_direction'] = result['anomaly_direction'].astype(int)
+
+        if self.group_names is not None:
+            for i, col in enumerate(self.group_names):
+                result.insert(i, col, data[col])
+
+        return result
+
+    def _allocate(self, n_series, reset=False):
+        '''Allocates (or grows) the state arrays to `n_series` series. New series start empty.'''
+        neutral = 1.0 if self.decomp.startswith('m') else 0.0
+
+        n_old = 0 if reset else len(self._level)
+        n_new = n_series - n_old
+
+        state = {
+            '_profile':  np.full((n_new, self.period), neutral),
+            '_level':    np.full(n_new, np.nan),
+            '_phase':    np.zeros(n_new, dtype=int),
+            '_buffer':   np.full((n_new, self.window), np.nan),
+            '_position': np.zeros(n_new, dtype=int),
+            '_count':    np.zeros(n_new, dtype=int),
+            '_since':    np.zeros(n_new, dtype=int),
+            '_q1':       np.full(n_new, np.nan),
+            '_q3':       np.full(n_new, np.nan),
+        }
+
+        for name, new in state.items():
+            setattr(self, name, np.concatenate([getattr(self, name), new]) if n_old else new)
+
+    def _series_keys(self, df):
+        '''Returns the series keys of the rows of `df` as a MultiIndex (a single key when ungrouped).'''
+        if self.group_names is None:
+            return pd.MultiIndex.from_arrays([np.zeros(len(df), dtype=int)])
+        return pd.MultiIndex.from_frame(df[self.group_names])
+
+    def _series_index(self, df):
+        '''Returns the state index of the series of each row of `df`, adding new series to the state.'''
+        if self.group_names is not None:
+            missing = [col for col in self.group_names if col not in df.columns]
+            if missing:
+                raise ValueError(f"`data` is missing the grouping columns {missing} used in `fit()`.")
+
+        keys = self._series_keys(df)
+
+        if self._keys is None:
+            self._keys = keys[:0]
+
+        series = self._keys.get_indexer(keys)
+
+        if (series < 0).any():
+            new_keys = keys[series < 0].unique()
+            self._keys = self._keys.append(new_keys)
+            self._allocate(len(self._keys))
+            series = self._keys.get_indexer(keys)
+
+        return series
+
+    def _step(self, series, x):
+        '''Scores one new point for each of `series` (unique) and updates their state.'''
+        multiplicative = self.decomp.startswith('m')
+
+        phase = self._phase[series]
+        seasonal = self._profile[series, phase]
+
+        # Same composition as `anomalize`: the model only changes the seasonal estimate
+        seasadj = x - seasonal
+
+        # A new series starts its trend at its first point
+        trend = self._level[series]
+        trend = np.where(np.isnan(trend), seasadj, trend)
+
+        remainder = seasadj - trend
+
+        # Identify the outliers
+        limits = _iqr_limits(self._q1[series], self._q3[series], self.iqr_alpha)
+        centerline = sum(limits) / 2
+
+        is_anomaly = (remainder < limits[0]) | (remainder > limits[1])
+
+        result = {
+            'observed':          x,
+            'seasonal':          seasonal,
+            'seasadj':           seasadj,
+            'trend':             trend,
+            'remainder':         remainder,
+            'anomaly':           np.where(is_anomaly, "Yes", "No"),
+            'anomaly_score':     abs(remainder - centerline),
+            'anomaly_direction': np.where(remainder > limits[1], 1, np.where(remainder < limits[0], -1, 0)),
+            'recomposed_l1':     seasonal + trend + limits[0],
+            'recomposed_l2':     seasonal + trend + limits[1],
+            'observed_clean':    np.where(is_anomaly, seasonal + trend, x),
+        }
+
+        # Update the trend level and the seasonal profile (robust: the remainder is clipped to the IQR band)
+        q1, q3 = self._q1[series], self._q3[series]
+        band = (0.15 / self.iqr_alpha) * (q3 - q1)
+
+        clipped = np.where(np.isnan(band), remainder, np.clip(remainder, q1 - band, q3 + band))
+        clipped = np.where(np.isfinite(x), clipped, 0)
+
+        level = trend + self.trend_smoothing * clipped
+        detrended = seasonal + trend + clipped
+        detrended = detrended / level if multiplicative else detrended - level
+
+        self._level[series] = level
+        self._profile[series, phase] = np.where(np.isfinite(x), seasonal + self.seasonal_smoothing * (detrended - seasonal), seasonal)
+        self._phase[series] = (phase + 1) % self.period
+
+        # Push the remainders into the rolling windows
+        self._buffer[series, self._position[series]] = remainder
+        self._position[series] = (self._position[series] + 1) % self.window
+        self._count[series] += 1
+        self._since[series] += 1
+
+        self._refresh_quartiles(series[self._since[series] >= self.refresh])
+
+        return result
+
+    def _refresh_quartiles(self, series):
+        '''Recomputes the remainder quartiles of `series` from their rolling windows.'''
+        if len(series) == 0:
+            return
+
+        with warnings.catch_warnings():
+            warnings.simplefilter('ignore', category=RuntimeWarning)
+            q1, q3 = np.nanpercentile(self._buffer[series], [25, 75], axis=1)
+
+        ready = self._count[series] >= self.min_periods
+
+        self._q1[series] = np.where(ready, q1, np.nan)
+        self._q3[series] = np.where(ready, q3, np.nan)
+        self._since[series] = 0
@@ -1,24 +1,40 @@
 import pandas as pd
 import pandas_flavor as pf
+import numpy as np
 
 from typing import Union, Optional, Callable, Tuple
 import re 
 from itertools import cycle
+from functools import partial
+from multiprocessing import cpu_count, get_context
+from concurrent.futures import ProcessPoolExecutor
+
+from pandas.tseries.frequencies import to_offset
+from pandas.tseries.offsets import (
+    Tick, Day, Hour, Minute, Second, Week, 
+    MonthBegin, MonthEnd, QuarterBegin, QuarterEnd, YearBegin, YearEnd
+)
 
 from pytimetk.utils.pandas_helpers import flatten_multiindex_column_names
 from pytimetk.utils.checks import check_dataframe_or_groupby, check_date_column, check_value_column
 
+from pytimetk.core.agg import _Sketch
+
+__all__ = ['summarize_by_time', 'apply_by_time']
+
 
 @pf.register_dataframe_method
 def summarize_by_time(
     data: Union[pd.DataFrame, pd.core.groupby.generic.DataFrameGroupBy],
     date_column: str,
     value_column: Union[str, list],
-    freq: str = "D",
+    freq: Union[str, list] = "D",
     agg_func: Union[str, list, Tuple[str, Callable]] = 'sum',
-    wide_format: bool = False,
+    wide_format: Union[bool, str] = False,
     fillna: int = 0,
     *args,
+    grouping_sets: Optional[list] = None,
+    rollup: bool = False,
     **kwargs
 ) -> pd.DataFrame:
     '''
@@ -49,6 +65,8 @@ def summarize_by_time(
         - Y: year end frequency
         - YS: year start frequency
         
+        A list of frequencies (e.g. `["D", "W", "MS", "QS"]`) returns all the resolutions in one long DataFrame with a `freq` column. When the aggregations are decomposable ("sum", "count", "min", "max", "mean", "var", "std"), the data is aggregated once at the finest resolution and the coarser resolutions are derived from it.
+        
     agg_func : list, optional
         The `agg_func` parameter is used to specify one or more aggregating functions to apply to the value column(s) during the summarization process. It can be a single function or a list of functions. The default value is `"sum"`, which represents the sum function. Some common aggregating functions include:
         
@@ -71,15 +89,24 @@ def summarize_by_time(
         - ("iqr", lambda x: x.quantile(0.75) - x.quantile(0.25)): Interquartile range of values
         - ("range", lambda x: x.max() - x.min()): Range of values
         
-    wide_format : bool, optional
-        A boolean parameter that determines whether the output should be in "wide" or "long" format. If set to `True`, the output will be in wide format, where each group is represented by a separate column. If set to False, the output will be in long format, where each group is represented by a separate row. The default value is `False`.
+        Approximate aggregations backed by mergeable sketches (bounded memory per time bin, reused across frequencies, grouping sets and `TimeRollup` appends) are available in `tk.agg`:
+        
+        - tk.agg.approx_quantile(0.5, accuracy = 0.01): Approximate quantile of values
+        - tk.agg.approx_nunique(): Approximate number of unique values
+        
+    wide_format : bool or str, optional
+        A boolean parameter that determines whether the output should be in "wide" or "long" format. If set to `True`, the output will be in wide format, where each group is represented by a separate column. If set to False, the output will be in long format, where each group is represented by a separate row. If set to "sparse", the output is in wide format with pandas `SparseDtype` columns (the missing values are the sparse `fillna` value), built directly from the long format without creating the dense wide DataFrame. Use it for many sparse groups (e.g. thousands of products sold on a few dates). The default value is `False`.
     fillna : int, optional
         The `fillna` parameter is used to specify the value to fill missing data with. By default, it is set to 0. If you want to keep missing values as NaN, you can use `np.nan` as the value for `fillna`.
+    grouping_sets : list, optional
+        The `grouping_sets` parameter summarizes a GroupBy object at several levels of its grouping columns in one call, like SQL `GROUPING SETS`. It is a list of lists of grouping columns, e.g. `[[], ['category_1'], ['category_1', 'category_2']]` (`[]` is the grand total). The results are stacked in long format with a `grouping_set` column (the grouping columns of the level joined by ", ", or "all" for the grand total), and the grouping columns that are not part of a level are missing (NaN). When the aggregations are decomposable ("sum", "count", "min", "max", "mean", "var", "std"), the data is aggregated once at the finest level and the other levels are derived from it.
+    rollup : bool, optional
+        The `rollup` parameter is a shortcut for the hierarchical grouping sets of the grouping columns, like SQL `ROLLUP`: with `groupby(['category_1', 'category_2'])`, the levels are `['category_1', 'category_2']`, `['category_1']` and `[]`. The default is `False`.
     
     Returns
     -------
     pd.DataFrame
-        A Pandas DataFrame that is summarized by time.
+        A Pandas DataFrame that is summarized by time. If `freq` is a list, the first column (`freq`) identifies the frequency of each row. With `grouping_sets` or `rollup`, the `grouping_set` column identifies the level of each row.
         
     Examples
     --------
@@ -149,6 +176,35 @@ def summarize_by_time(
             )
     )
     ```
+    
+    ```{python}
+    # Summarize by time at several levels of the groups in one pass
+    (
+        df 
+            .groupby(['category_1', 'category_2']) 
+            .summarize_by_time(
+                date_column  = 'order_date', 
+                value_column = 'total_price', 
+                freq         = 'MS',
+                agg_func     = 'sum',
+                rollup       = True,
+            )
+    )
+    ```
+    
+    ```{python}
+    # Summarize by time at several frequencies in one pass
+    (
+        df 
+            .groupby('category_1') 
+            .summarize_by_time(
+                date_column  = 'order_date', 
+                value_column = 'total_price', 
+                freq         = ['W', 'MS', 'QS'],
+                agg_func     = ['sum', 'mean'],
+            )
+    )
+    ```
     '''
     
     # Run common checks
@@ -160,24 +216,52 @@ def summarize_by_time(
     if not isinstance(value_column, list):
         value_column = [value_column]
     
+    # Several levels of the groups (grouping sets)
+    if grouping_sets is not None or rollup:
+        return _summarize_by_time_sets(data, date_column, value_column, freq, agg_func, fillna, grouping_sets, rollup, *args, **kwargs)
+    
+    # Multiple frequencies
+    if isinstance(freq, list):
+        return _summarize_by_time_freqs(data, date_column, value_column, freq, agg_func, wide_format, fillna, *args, **kwargs)
+    
+    # Sketch aggregations: the sketches of all the time bins are built with one sort
+    funcs = agg_func if isinstance(agg_func, list) else [agg_func]
+    if not args and not kwargs and _is_decomposable_agg(funcs) and any(isinstance(func, _Sketch) for func in funcs):
+        group_names = data.grouper.names if isinstance(data, pd.core.groupby.generic.DataFrameGroupBy) else []
+        df = data.obj if group_names else data
+        
+        moments, moments_agg = _summarize_moments(df, group_names, date_column, value_column, funcs, freq, estimate=True)
+        
+        return _summarize_from_moments(moments, moments_agg, group_names, date_column, None, df[value_column].dtypes, agg_func, wide_format, fillna)
+    
     # Set the index of data to the date_column
     if isinstance(data, pd.DataFrame):
         data = data.set_index(date_column)
     
+    # Create a dictionary mapping each value column to the aggregating function(s)
+    agg_dict = {col: agg_func for col in value_column}
+    
     group_names = None
+    time_bins = None
     if isinstance(data, pd.core.groupby.generic.DataFrameGroupBy):
         group_names = data.grouper.names
-        data = data.obj.set_index(date_column).groupby(group_names)
+        
+        # Fast path: integer time bins and one groupby instead of groupby-resample
+        if not args and not kwargs and _is_builtin_agg(agg_func):
+            time_bins = _time_bins(data.obj[date_column], freq)
+        
+        if time_bins is None:
+            data = data.obj.set_index(date_column).groupby(group_names)
     
     # Group data by the groups columns if groups is not None
     # if groups is not None:
     #     data = data.groupby(groups)
     
-    # Resample data based on the specified freq and kind
-    data = data.resample(rule=freq, kind="timestamp")
-    
-    # Create a dictionary mapping each value column to the aggregating function(s)
-    agg_dict = {col: agg_func for col in value_column}
+    if time_bins is not None:
+        data = _summarize_time_bins(data, date_column, agg_dict, *time_bins)
+    else:
+        # Resample data based on the specified freq and kind
+        data = data.resample(rule=freq, kind="timestamp")
     
     # **** FIX BUG WITH GROUPBY RESAMPLED OBJECTS (PART 1) ****
     
@@ -193,15 +277,20 @@ def summarize_by_time(
 
     
     # Apply the aggregation using the dict method of the resampled data
-    data = data.agg(func=agg_dict, *args, **kwargs)    
-    
+    if time_bins is None:
+        data = data.agg(func=agg_dict, *args, **kwargs)    
     
-    # Unstack the grouped columns if wide_format is True and groups is not None
-    if wide_format and group_names is not None:
-        data = data.unstack(group_names)
     
-    # Fill missing values with the specified fillna value
-    data = data.fillna(fillna)
+    if wide_format == 'sparse' and group_names is not None:
+        # Sparse columns are filled when they are built
+        data = _unstack_sparse(data, group_names, fillna)
+    else:
+        # Unstack the grouped columns if wide_format is True and groups is not None
+        if wide_format and group_names is not None:
+            data = data.unstack(group_names)
+        
+        # Fill missing values with the specified fillna value
+        data = data.fillna(fillna)
     
     # Flatten the multiindex column names if flatten_column_names is True
     data = flatten_multiindex_column_names(data)
@@ -228,6 +317,434 @@ def summarize_by_time(
 # Monkey patch the method to pandas groupby objects
 pd.core.groupby.generic.DataFrameGroupBy.summarize_by_time = summarize_by_time
 
+# UTILITIES
+# ------------------------------------------------------------------------------
+
+# Value of the builtin aggregations for an empty time bin (others are NaN)
+_EMPTY_BIN_VALUES = {'sum': 0, 'count': 0, 'nunique': 0, 'size': 0, 'prod': 1}
+
+_BUILTIN_AGGS = {'sum', 'mean', 'median', 'min', 'max', 'std', 'var', 'first', 'last', 'count', 'nunique', 'size', 'prod'}
+
+def _is_builtin_agg(agg_func):
+    '''True if `agg_func` is one or a list of builtin (cythonized) aggregation names.'''
+    funcs = agg_func if isinstance(agg_func, list) else [agg_func]
+    return len(funcs) > 0 and all(isinstance(func, str) and func in _BUILTIN_AGGS for func in funcs)
+
+# Aggregations that can be computed from the aggregations of finer time bins (as well as the sketches of `pytimetk.agg`)
+_DECOMPOSABLE_AGGS = {'sum', 'count', 'min', 'max', 'mean', 'var', 'std'}
+
+def _aggregate_by_time(df, group_names, date_column, freq, agg_dict):
+    '''Aggregates the columns of `df` by group (if any) and time with builtin aggregations, as `resample(freq).agg(agg_dict)` does.'''
+    if not group_names:
+        return df.set_index(date_column).resample(rule=freq, kind="timestamp").agg(agg_dict)
+    
+    time_bins = _time_bins(df[date_column], freq)
+    if time_bins is not None:
+        return _summarize_time_bins(df.groupby(group_names), date_column, agg_dict, *time_bins)
+    
+    return df.set_index(date_column).groupby(group_names).resample(rule=freq, kind="timestamp").agg(agg_dict)
+
+def _is_fixed_bin_freq(freq):
+    '''True if the time bins of `freq` do not depend on the first date of the data (or of a group): frequencies that divide a day, and anchored frequencies of one period ("W", "MS", ...). The bins of other frequencies ("2D", "5H", "2W", ...) start at the first date.'''
+    try:
+        offset = to_offset(freq)
+    except ValueError:
+        return False
+    
+    if isinstance(offset, Tick):
+        return Day().nanos % offset.nanos == 0
+    
+    return offset.n == 1
+
+def _base_freq(freqs):
+    '''The finest fixed-width frequency whose bins nest in the bins of all `freqs` ("D" unless a sub-daily frequency is requested), or None if a frequency does not nest or its bins are not fixed (see `_is_fixed_bin_freq`).'''
+    base = Day()
+    for freq in freqs:
+        if not _is_fixed_bin_freq(freq):
+            return None
+        
+        offset = to_offset(freq)
+        if isinstance(offset, Tick):
+            unit = type(offset)(1)
+            if unit.nanos < base.nanos:
+                base = unit
+        elif not isinstance(offset, (Week, MonthBegin, MonthEnd, QuarterBegin, QuarterEnd, YearBegin, YearEnd)):
+            return None
+    
+    return base.freqstr
+
+def _summarize_by_time_freqs(data, date_column, value_column, freqs, agg_func, wide_format, fillna, *args, **kwargs):
+    '''Summarizes by time at each of `freqs` and stacks the results with a `freq` column.
+    
+    Decomposable aggregations are computed once at the base resolution (see `_base_freq`) as moments and each frequency with fixed bins is derived from them (see `_summarize_moments`). Otherwise each frequency is summarized from the data.
+    '''
+    funcs = agg_func if isinstance(agg_func, list) else [agg_func]
+    
+    # Frequencies whose bins start at the first date of each group are summarized from the data
+    moment_freqs = [freq for freq in freqs if _is_fixed_bin_freq(freq)]
+    
+    base = _base_freq(moment_freqs) if moment_freqs and not args and not kwargs and _is_decomposable_agg(funcs) else None
+    
+    results = {}
+    if base is not None:
+        group_names = data.grouper.names if isinstance(data, pd.core.groupby.generic.DataFrameGroupBy) else []
+        df = data.obj if group_names else data
+        
+        # One pass over the data
+        moments, moments_agg = _summarize_moments(df, group_names, date_column, value_column, funcs, base)
+        
+        for freq in moment_freqs:
+            results[freq] = _summarize_from_moments(moments, moments_agg, group_names, date_column, freq, df[value_column].dtypes, agg_func, wide_format, fillna)
+    
+    for freq in freqs:
+        if freq not in results:
+            results[freq] = summarize_by_time(data, date_column, value_column, freq, agg_func, wide_format, fillna, *args, **kwargs)
+    
+    return pd.concat([results[freq] for freq in freqs], keys=freqs, names=['freq']).reset_index(level=0).reset_index(drop=True)
+
+def _summarize_by_time_sets(data, date_column, value_column, freq, agg_func, fillna, grouping_sets, rollup, *args, **kwargs):
+    '''Summarizes by time at each level (grouping set) of the grouping columns and stacks the results with a `grouping_set` column.
+    
+    Decomposable aggregations are computed once at the finest level (all the grouping columns) as moments and each level is derived from them (see `_summarize_moments`). Otherwise each level is summarized from the data.
+    '''
+    if not isinstance(data, pd.core.groupby.generic.DataFrameGroupBy):
+        raise ValueError("`grouping_sets` and `rollup` require a GroupBy object.")
+    
+    group_names = data.grouper.names
+    df = data.obj
+    
+    if grouping_sets is None:
+        grouping_sets = [group_names[:i] for i in range(len(group_names), -1, -1)]
+    
+    grouping_sets = [[names] if isinstance(names, str) else list(names) for names in grouping_sets]
+    
+    for names in grouping_sets:
+        if any(name not in group_names for name in names):
+            raise ValueError(f"The grouping set {names} must contain only grouping columns {group_names}.")
+    
+    funcs = agg_func if isinstance(agg_func, list) else [agg_func]
+    freqs = freq if isinstance(freq, list) else [freq]
+    
+    base = _base_freq(freqs) if not args and not kwargs and _is_decomposable_agg(funcs) else None
+    
+    results = []
+    if base is None:
+        for names in grouping_sets:
+            source = df.groupby(names) if names else df
+            results.append(summarize_by_time(source, date_column, value_column, freq, agg_func, False, fillna, *args, **kwargs))
+    else:
+        # One pass over the data, at the finest level
+        moments, moments_agg = _summarize_moments(df, group_names, date_column, value_column, funcs, base)
+        
+        for names in grouping_sets:
+            result = pd.concat([
+                _summarize_from_moments(moments, moments_agg, names, date_column, f, df[value_column].dtypes, agg_func, False, fillna) 
+                for f in freqs
+            ], keys=freqs, names=['freq']).reset_index(level=0)
+            
+            results.append(result if isinstance(freq, list) else result.drop(columns='freq'))
+    
+    for names, result in zip(grouping_sets, results):
+        result['grouping_set'] = ', '.join(names) if names else 'all'
+    
+    # The grouping columns that are not part of a level are missing
+    result = pd.concat(results, ignore_index=True)
+    
+    id_columns = [*(['freq'] if isinstance(freq, list) else []), 'grouping_set', *group_names, date_column]
+    
+    return result.reindex(columns=[*id_columns, *[col for col in result.columns if col not in id_columns]])
+
+def _is_decomposable_agg(funcs):
+    '''True if all `funcs` are aggregation names or sketches that can be computed from the aggregations of finer bins.'''
+    return all(isinstance(func, _Sketch) or (isinstance(func, str) and func in _DECOMPOSABLE_AGGS) for func in funcs)
+
+def _summarize_moments(df, group_names, date_column, value_column, funcs, freq, estimate=False):
+    '''Aggregates each value column by group and time bin into the moments needed by `funcs`: count, sum, min, max, the sum of squared deviations from the mean of the bin (m2) and the sketch states (or their estimates if `estimate`, when the moments are not merged).
+    
+    Returns the moments (group columns, date column and one column per moment) and the aggregation that combines the moments of several bins.
+    '''
+    base_funcs = ['sum', 'count'] + [func for func in ['min', 'max'] if func in funcs]
+    if 'var' in funcs or 'std' in funcs:
+        base_funcs.append('var')
+    
+    partials = _aggregate_by_time(df, group_names, date_column, freq, {col: base_funcs for col in value_column})
+    
+    moments = pd.DataFrame(index=partials.index)
+    moments_agg = {}
+    for i, col in enumerate(value_column):
+        n, total = partials[(col, 'count')], partials[(col, 'sum')]
+        
+        moments[f'{i}_n'] = n
+        moments[f'{i}_total'] = total
+        moments_agg.update({f'{i}_n': 'sum', f'{i}_total': 'sum'})
+        
+        for func in ['min', 'max']:
+            if func in base_funcs:
+                moments[f'{i}_{func}'] = partials[(col, func)]
+                moments_agg[f'{i}_{func}'] = func
+        
+        if 'var' in base_funcs:
+            moments[f'{i}_m2'] = (partials[(col, 'var')] * (n - 1)).where(n > 1, 0)
+            moments_agg[f'{i}_m2'] = 'sum'
+        
+        for j, func in enumerate(funcs):
+            if isinstance(func, _Sketch):
+                moments[f'{i}_sketch{j}'] = _sketch_states(df, group_names, date_column, col, func, freq, partials.index, estimate=estimate)
+                # Estimates can not be merged
+                if not estimate:
+                    moments_agg[f'{i}_sketch{j}'] = func.merge
+    
+    return moments.reset_index(), moments_agg
+
+def _m2_between(n, total, n_merged, total_merged):
+    '''The sum of squared deviations of the mean of a bin of `n` values from the mean of the merged bin that contains it: `n * (mean - merged mean) ** 2`.
+    
+    Summed over the bins and added to their m2, this is the m2 of the merged bin (the parallel update of Chan et al.), without the cancellation of the sums of squares.
+    '''
+    mean = total.astype(float) / n.where(n > 0)
+    merged_mean = total_merged.astype(float) / n_merged.where(n_merged > 0)
+    
+    return (n * (mean - merged_mean) ** 2).where(n > 0, 0)
+
+def _merge_m2(n_a, total_a, m2_a, n_b, total_b, m2_b):
+    '''The m2 of the union of two bins (the pairwise update of Chan et al.): `m2_a + m2_b + delta ** 2 * n_a * n_b / n`.'''
+    n = n_a + n_b
+    delta = total_b.astype(float) / n_b.where(n_b > 0) - total_a.astype(float) / n_a.where(n_a > 0)
+    
+    return (m2_a + m2_b + (delta ** 2 * n_a * n_b / n.where(n > 0))).where((n_a > 0) & (n_b > 0), m2_a + m2_b)
+
+def _sketch_states(df, group_names, date_column, value_column, sketch, freq, index, merge=False, estimate=False):
+    '''The sketch states of `value_column` (values, or states to merge if `merge`) by group and time bin, aligned to `index` (the bins of `_aggregate_by_time`). Returns the estimates instead of the states if `estimate`.'''
+    # Empty time bins have no state
+    if merge:
+        df = df[df[value_column].notna()]
+    
+    time_bins = _time_bins(df[date_column], freq)
+    
+    if time_bins is None:
+        # One sketch per time bin
+        func = sketch if estimate else sketch.merge if merge else sketch.sketch
+        states = _aggregate_by_time(df[[*group_names, date_column, value_column]], group_names, date_column, freq, {value_column: func})
+        return states[value_column]
+    
+    bins, _, to_timestamps = time_bins
+    
+    dates = pd.Series(to_timestamps(bins), index=df.index, name=date_column)
+    grouper = df.groupby([*[df[col] for col in group_names], dates], observed=True).grouper
+    
+    codes, bin_index = grouper.group_info[0], grouper.result_index
+    
+    if estimate:
+        states = sketch.sketch_estimate_bins(df[value_column].to_numpy(), codes, len(bin_index))
+    elif merge:
+        states = sketch.merge_bins(df[value_column].to_numpy(), codes, len(bin_index))
+    else:
+        states = sketch.sketch_bins(df[value_column].to_numpy(), codes, len(bin_index))
+    
+    return pd.Series(states, index=bin_index).reindex(index, fill_value=sketch.empty if estimate else np.nan)
+
+def _summarize_from_moments(moments, moments_agg, group_names, date_column, freq, dtypes, agg_func, wide_format, fillna):
+    '''Summarizes the moments of `_summarize_moments` by `group_names` (a subset of their groups) and `freq` (bins that nest the bins of the moments, or None for the bins of the moments). Same output as `summarize_by_time`.'''
+    funcs = agg_func if isinstance(agg_func, list) else [agg_func]
+    
+    sketches = {f'{i}_sketch{j}': func for i in range(len(dtypes)) for j, func in enumerate(funcs) if f'{i}_sketch{j}' in moments_agg}
+    
+    if freq is None:
+        summary = moments.set_index([*group_names, date_column])
+    else:
+        # Deviations of the bins from the mean of the new bins, so that the m2 columns add up
+        m2_columns = [col for col in moments_agg if col.endswith('_m2')]
+        if m2_columns:
+            moments = moments.copy()
+            new_bins = moments.groupby([*group_names, pd.Grouper(key=date_column, freq=freq)], observed=True)
+            for col in m2_columns:
+                i = col[:-len('_m2')]
+                n, total = moments[f'{i}_n'], moments[f'{i}_total']
+                moments[col] = moments[col] + _m2_between(n, total, new_bins[f'{i}_n'].transform('sum'), new_bins[f'{i}_total'].transform('sum'))
+        
+        summary = _aggregate_by_time(moments, group_names, date_column, freq, {col: func for col, func in moments_agg.items() if col not in sketches})
+        
+        # The sketches of the bins are merged at once
+        for col, sketch in sketches.items():
+            summary[col] = _sketch_states(moments, group_names, date_column, col, sketch, freq, summary.index, merge=True)
+    
+    columns = {}
+    for i, (col, dtype) in enumerate(dtypes.items()):
+        n, total = summary[f'{i}_n'], summary[f'{i}_total']
+        
+        for j, func in enumerate(funcs):
+            if isinstance(func, _Sketch):
+                if f'{i}_sketch{j}' not in moments_agg:
+                    values = summary[f'{i}_sketch{j}']
+                else:
+                    values = pd.Series(func.estimate_bins(summary[f'{i}_sketch{j}'].to_numpy()), index=summary.index)
+            elif func == 'sum':
+                values = total
+            elif func == 'count':
+                values = n
+            elif func in ('min', 'max'):
+                values = summary[f'{i}_{func}']
+                # Keep integers when no time bin is empty (as `resample` does)
+                if pd.api.types.is_integer_dtype(dtype) and values.notna().all():
+                    values = values.astype(dtype)
+            elif func == 'mean':
+                values = (total / n).where(n > 0)
+            else:
+                values = (summary[f'{i}_m2'] / (n - 1)).where(n > 1)
+                if func == 'std':
+                    values = np.sqrt(values)
+            
+            columns[(col, getattr(func, '__name__', func)) if isinstance(agg_func, list) else col] = values
+    
+    summary = pd.DataFrame(columns, index=summary.index)
+    
+    # Unstack the grouped columns if wide_format is True (sparse columns are filled when they are built)
+    if wide_format == 'sparse' and group_names:
+        summary = _unstack_sparse(summary, group_names, fillna)
+    else:
+        if wide_format and group_names:
+            summary = summary.unstack(group_names)
+        summary = summary.fillna(fillna)
+    
+    summary = flatten_multiindex_column_names(summary)
+    
+    return summary.reset_index()
+
+def _unstack_sparse(data, group_names, fillna):
+    '''Unstacks the groups of a long result (indexed by the groups and the date) into `SparseDtype` columns, as `unstack(group_names).fillna(fillna)` does, without creating the dense wide DataFrame.'''
+    date_codes, dates = pd.factorize(data.index.get_level_values(-1), sort=True)
+    
+    # As `unstack`: all the combinations of the group levels, or only the observed ones for flat columns
+    level_codes, levels = zip(*[pd.factorize(data.index.get_level_values(i), sort=True) for i in range(data.index.nlevels - 1)])
+    group_codes = np.ravel_multi_index(level_codes, [len(level) for level in levels])
+    groups = pd.MultiIndex.from_product(levels)
+    
+    if not isinstance(data.columns, pd.MultiIndex):
+        observed = np.unique(group_codes)
+        group_codes, groups = np.searchsorted(observed, group_codes), groups[observed]
+    
+    # Rows of each group, in date order
+    order = np.lexsort((date_codes, group_codes))
+    date_codes = date_codes[order]
+    bounds = np.searchsorted(group_codes[order], np.arange(len(groups) + 1))
+    
+    columns = {}
+    for column in data.columns:
+        values = data[column].to_numpy()[order]
+        dtype = pd.SparseDtype(np.result_type(values.dtype, type(fillna)), fillna)
+        
+        # Only the values different from the fill value are stored
+        values = np.where(pd.isna(values), fillna, values).astype(dtype.subtype)
+        
+        # One dense column of the dates at a time (never the whole wide DataFrame)
+        for label, start, stop in zip(groups, bounds[:-1], bounds[1:]):
+            dense = np.full(len(dates), fillna, dtype=dtype.subtype)
+            dense[date_codes[start:stop]] = values[start:stop]
+            columns[(*(column if isinstance(column, tuple) else (column,)), *label)] = pd.arrays.SparseArray(dense, dtype=dtype)
+    
+    result = pd.DataFrame(columns, index=pd.Index(dates, name=data.index.names[-1]))
+    result.columns.names = [*data.columns.names, *group_names]
+    
+    return result
+
+def _time_bins(dates, freq):
+    '''Integer time bins of `dates`, with the same labels as `resample(freq)`.
+    
+    Supported frequencies are the fixed-width S/min/H/D, the weekly W (W-SUN) and the calendar MS/QS/YS, with a multiple of 1. Returns a tuple of the bins (int64), the bin step and a function converting bins to timestamps, or None if `freq` or `dates` are not supported.
+    '''
+    if dates.dtype != 'datetime64[ns]' or dates.isna().any():
+        return None
+    
+    try:
+        offset = to_offset(freq)
+    except ValueError:
+        return None
+    
+    if offset.n != 1:
+        return None
+    
+    ns = dates.to_numpy().view('int64')
+    
+    to_timestamps = lambda bins: bins.view('datetime64[ns]')
+    
+    if isinstance(offset, (Day, Hour, Minute, Second)):
+        step = offset.nanos
+        return (ns // step) * step, step, to_timestamps
+    
+    if isinstance(offset, Week) and offset.weekday == 6:
+        # Weeks end on Sunday (label right, the whole Sunday included). 1970-01-01 is a Thursday.
+        day = Day().nanos
+        days = ns // day
+        return (days + (6 - (days + 3) % 7)) * day, 7 * day, to_timestamps
+    
+    steps = {MonthBegin: 1, QuarterBegin: 3, YearBegin: 12}
+    if type(offset) in steps and getattr(offset, 'startingMonth', getattr(offset, 'month', 1)) == 1:
+        # Months since 1970-01, floored to the month, quarter or year
+        step = steps[type(offset)]
+        months = dates.to_numpy().astype('datetime64[M]').view('int64')
+        return months - months % step, step, lambda bins: bins.view('datetime64[M]').astype('datetime64[ns]')
+    
+    return None
+
+def _summarize_time_bins(data, date_column, agg_dict, bins, step, to_timestamps):
+    '''Aggregates a GroupBy object by group and integer time bin with one groupby, then adds the empty bins of each group (as `resample` does).'''
+    group_names = data.grouper.names
+    df = data.obj
+    
+    # `resample` takes the first and last values in date order
+    if any(func in ('first', 'last') for funcs in agg_dict.values() for func in (funcs if isinstance(funcs, list) else [funcs])):
+        order = np.argsort(df[date_column].to_numpy(), kind='stable')
+        df, bins = df.iloc[order], bins[order]
+    
+    # Only the observed groups (unused categories have no rows, as with `resample`)
+    result = df.groupby([*[df[col] for col in group_names], pd.Series(bins, index=df.index, name=date_column)], observed=True).agg(agg_dict)
+    
+    # Each group spans all the bins from its first to its last bin
+    group_index = result.index.droplevel(-1)
+    group_id, groups = pd.factorize(group_index)
+    result_bins = result.index.get_level_values(-1).to_numpy()
+    
+    starts = np.flatnonzero(np.r_[True, group_id[1:] != group_id[:-1]])
+    first = result_bins[starts]
+    last = result_bins[np.r_[starts[1:], len(result_bins)] - 1]
+    
+    lengths = (last - first) // step + 1
+    offsets = np.concatenate([[0], np.cumsum(lengths)])
+    
+    full_group_id = np.repeat(np.arange(len(lengths)), lengths)
+    full_bins = first[full_group_id] + step * (np.arange(offsets[-1]) - offsets[full_group_id])
+    
+    groups = groups[full_group_id]
+    group_levels = [groups.get_level_values(i) for i in range(len(group_names))]
+    
+    index = pd.MultiIndex.from_arrays(
+        [*group_levels, to_timestamps(full_bins)],
+        names = [*group_names, date_column]
+    )
+    
+    if offsets[-1] == len(result):
+        return result.set_axis(index, axis=0)
+    
+    positions = offsets[group_id] + (result_bins - first[group_id]) // step
+    
+    columns = {}
+    for i, column in enumerate(result.columns):
+        func = column[-1] if isinstance(column, tuple) else agg_dict[column]
+        values = result.iloc[:, i].to_numpy()
+        
+        if func in _EMPTY_BIN_VALUES:
+            full = np.full(offsets[-1], _EMPTY_BIN_VALUES[func], dtype=values.dtype)
+        else:
+            full = np.full(offsets[-1], np.nan, dtype=object if values.dtype == object else float)
+        full[positions] = values
+        
+        columns[i] = full
+    
+    result_full = pd.DataFrame(columns, index=index)
+    result_full.columns = result.columns
+    
+    return result_full
+
 
 '''The `apply_by_time` function applies custom aggregation functions to a time series data, either in a
     wide or long format, and returns the result as a pandas DataFrame.
@@ -264,8 +781,9 @@ def apply_by_time(
     data: Union[pd.DataFrame, pd.core.groupby.generic.DataFrameGroupBy],
     date_column: str,
     freq: str = "D",
-    wide_format: bool = False,
+    wide_format: Union[bool, str] = False,
     fillna: int = 0,
+    threads: Optional[int] = 1,
     **named_funcs
 ) -> pd.DataFrame:
     '''Apply for time series.
@@ -291,10 +809,12 @@ def apply_by_time(
         - Y: year end frequency
         - YS: year start frequency
         
-    wide_format : bool, optional
-        The `wide_format` parameter is a boolean flag that determines whether the output should be in wide format or not. If `wide_format` is set to `True`, the output will have a multi-index column structure, where the first level represents the original columns and the second level represents the group names
+    wide_format : bool or str, optional
+        The `wide_format` parameter is a boolean flag that determines whether the output should be in wide format or not. If `wide_format` is set to `True`, the output will have a multi-index column structure, where the first level represents the original columns and the second level represents the group names. If set to "sparse", the wide columns are pandas `SparseDtype` columns built directly from the long format (see `summarize_by_time`).
     fillna : int, optional
         The `fillna` parameter is used to specify the value that will be used to fill missing values in the resulting DataFrame. By default, it is set to 0.
+    threads : int, optional
+        The `threads` parameter is the number of processes used to run the named functions on grouped data. The groups are split into chunks that are processed in parallel. Set to `None` or -1 to use all available cores. The default is 1 (no parallel processing). Processes are forked, so lambdas can be used; on platforms without `fork` the functions run in the main process.
     **named_funcs
         The `**named_funcs` parameter is used to specify one or more custom aggregation functions to apply to the data. It accepts named functions in the format:
         
@@ -304,7 +824,13 @@ def apply_by_time(
         
         Where `name` is the name of the function and `df` is the DataFrame that will be passed to the function. The function must return a single value.
         
+        It also accepts named expressions in the format:
+        
+        ``` python
+        name = ('column1 * column2', 'sum')
+        ```
         
+        Where the first element is a row-level expression (evaluated with `pd.DataFrame.eval`) and the second element is a builtin aggregation name (e.g. "sum", "mean", "max"). Expressions are evaluated once on the whole DataFrame and aggregated with one vectorized groupby, which is much faster than calling a function on every (group, time period) with many groups.
     
     Returns
     -------
@@ -360,6 +886,25 @@ def apply_by_time(
     )
     ```
     
+    ```{python}    
+    # Named expressions: evaluated once on the whole DataFrame (fast with many groups)
+    ( 
+        df[['category_1', 'order_date', 'price', 'quantity']] 
+            .groupby('category_1')
+            .apply_by_time(
+                
+                # Named expressions
+                price_quantity_sum = ('price * quantity', 'sum'),
+                price_quantity_mean = ('price * quantity', 'mean'),
+                
+                # Parameters
+                date_column  = 'order_date', 
+                freq         = "MS",
+                
+            )
+    )
+    ```
+    
     ```{python}    
     # Return complex objects
     ( 
@@ -381,36 +926,57 @@ def apply_by_time(
     # Run common checks
     check_dataframe_or_groupby(data)
     check_date_column(data, date_column)
-
-    # Start by setting the index of data to the date_column
-    if isinstance(data, pd.DataFrame):
-        data = data.set_index(date_column)
-    elif isinstance(data, pd.core.groupby.generic.DataFrameGroupBy):
+    
+    if threads is None: threads = cpu_count()
+    if threads == -1: threads = cpu_count()
+    
+    # Named expressions are evaluated on the whole DataFrame, other named functions are applied
+    expressions = {name: func for name, func in named_funcs.items() if isinstance(func, tuple)}
+    funcs = {name: func for name, func in named_funcs.items() if not isinstance(func, tuple)}
+    
+    for name, expression in expressions.items():
+        if len(expression) != 2 or not isinstance(expression[0], str) or not _is_builtin_agg(expression[1]):
+            raise ValueError(f"The named expression `{name}` must be a tuple of an expression string and a builtin aggregation name, e.g. ('price * quantity', 'sum').")
+    
+    group_names = None
+    if isinstance(data, pd.core.groupby.generic.DataFrameGroupBy):
         group_names = data.grouper.names
-        if date_column not in group_names:
-            data = data.obj.set_index(date_column).groupby(group_names)
-
-    # Resample data based on the specified freq and kind
-    grouped = data.resample(rule=freq, kind="timestamp")
-
-    # Apply custom aggregation functions using apply
-    def custom_agg(group):
-        agg_values = {}
-                
-        # Apply column-specific functions from **named_funcs
-        for name, func in named_funcs.items():
-            agg_values[name] = func(group)
-
-        return pd.Series(agg_values)
+    
+    results = []
+    
+    if expressions:
+        results.append(_apply_expressions_by_time(data, date_column, freq, expressions))
 
-    data = grouped.apply(custom_agg)
+    if funcs:
+        # Start by setting the index of data to the date_column
+        if isinstance(data, pd.DataFrame):
+            data = data.set_index(date_column)
+        elif isinstance(data, pd.core.groupby.generic.DataFrameGroupBy):
+            if threads != 1 and date_column not in group_names:
+                results.append(_apply_by_time_parallel(data, date_column, freq, funcs, threads))
+                data = None
+            elif date_column not in group_names:
+                data = data.obj.set_index(date_column).groupby(group_names)
+        
+        if data is not None:
+            # Resample data based on the specified freq and kind
+            grouped = data.resample(rule=freq, kind="timestamp")
+            
+            # Apply custom aggregation functions using apply
+            results.append(grouped.apply(partial(_apply_named_funcs, named_funcs=funcs)))
+    
+    data = results[0] if len(results) == 1 else pd.concat(results, axis=1)[list(named_funcs)]
 
-    # Unstack the grouped columns if wide_format is True and group_names is not None
-    if wide_format and group_names is not None:
-        data = data.unstack(group_names)
+    if wide_format == 'sparse' and group_names is not None:
+        # Sparse columns are filled when they are built
+        data = _unstack_sparse(data, group_names, fillna)
+    else:
+        # Unstack the grouped columns if wide_format is True and group_names is not None
+        if wide_format and group_names is not None:
+            data = data.unstack(group_names)
 
-    # Fill missing values with the specified fillna value
-    data = data.fillna(fillna)
+        # Fill missing values with the specified fillna value
+        data = data.fillna(fillna)
 
     # Flatten the multiindex column names if needed
     data = flatten_multiindex_column_names(data)
@@ -423,3 +989,78 @@ def apply_by_time(
 
 # Monkey patch the method to pandas groupby objects
 pd.core.groupby.generic.DataFrameGroupBy.apply_by_time = apply_by_time
+
+def _apply_named_funcs(group, named_funcs):
+    '''Applies each named function to the DataFrame of one (group, time period).'''
+    agg_values = {}
+    
+    # Apply column-specific functions from **named_funcs
+    for name, func in named_funcs.items():
+        agg_values[name] = func(group)
+
+    return pd.Series(agg_values)
+
+def _apply_expressions_by_time(data, date_column, freq, expressions):
+    '''Evaluates the named expressions on the whole DataFrame, then aggregates them by time (and group) with builtin aggregations.'''
+    group_names = data.grouper.names if isinstance(data, pd.core.groupby.generic.DataFrameGroupBy) else []
+    df = data.obj if group_names else data
+    
+    values = pd.DataFrame(
+        {
+            **{col: df[col] for col in [*group_names, date_column]},
+            **{name: df.eval(expression) for name, (expression, _) in expressions.items()},
+        }, 
+        index = df.index
+    )
+    
+    agg_dict = {name: agg for name, (_, agg) in expressions.items()}
+    
+    return _aggregate_by_time(values, group_names, date_column, freq, agg_dict)
+
+# Set in the parent process before forking the workers of `_apply_by_time_parallel`
+_APPLY_BY_TIME_STATE = None
+
+def _apply_by_time_parallel(data, date_column, freq, named_funcs, threads):
+    '''Applies the named functions by time to chunks of groups in forked processes. The workers inherit the data and the functions, so lambdas do not need to be pickled.'''
+    global _APPLY_BY_TIME_STATE
+    
+    group_names = data.grouper.names
+    
+    # Rows sorted by group: each chunk is a contiguous range of whole groups
+    codes = data.ngroup().to_numpy()
+    keep = np.flatnonzero(codes >= 0)
+    order = keep[np.argsort(codes[keep], kind='stable')]
+    offsets = np.concatenate([[0], np.cumsum(np.bincount(codes[order]))])
+    
+    frame = data.obj.iloc[order].set_index(date_column)
+    
+    n_groups = len(offsets) - 1
+    chunk_size = max(1, int(np.ceil(n_groups / (threads * 4))))
+    ranges = [(offsets[i], offsets[min(i + chunk_size, n_groups)]) for i in range(0, n_groups, chunk_size)]
+    
+    try:
+        context = get_context('fork')
+    except ValueError:
+        context = None
+    
+    if context is None or len(ranges) < 2:
+        return frame.groupby(group_names).resample(rule=freq, kind="timestamp").apply(partial(_apply_named_funcs, named_funcs=named_funcs))
+    
+    _APPLY_BY_TIME_STATE = (frame, group_names, freq, named_funcs)
+    try:
+        with ProcessPoolExecutor(threads, mp_context=context) as executor:
+            results = list(executor.map(_apply_by_time_chunk, ranges))
+    finally:
+        _APPLY_BY_TIME_STATE = None
+    
+    return pd.concat(results)
+
+def _apply_by_time_chunk(row_range):
+    '''Applies the named functions by time to the rows `row_range` (whole groups) of the forked state.'''
+    frame, group_names, freq, named_funcs = _APPLY_BY_TIME_STATE
+    start, stop = row_range
+    
+    return frame.iloc[start:stop] \
+        .groupby(group_names) \
+        .resample(rule=freq, kind="timestamp") \
+        .apply(partial(_apply_named_funcs, named_funcs=named_funcs))
@@ -0,0 +1,191 @@
+import pandas as pd
+import numpy as np
+
+from typing import Union, Optional
+
+from pytimetk.utils.checks import check_dataframe_or_groupby, check_date_column, check_value_column
+
+from pytimetk.core.summarize_by_time import _summarize_moments, _summarize_from_moments, _is_decomposable_agg, _is_fixed_bin_freq, _merge_m2
+
+__all__ = ['TimeRollup']
+
+
+class TimeRollup:
+    """
+    Incremental (materialized) `summarize_by_time`.
+
+    `TimeRollup` stores partial aggregates per (group, time bin): counts, sums, minimums, maximums, sums of squared deviations for the mean, variance and standard deviation, and the states of the sketches of `pytimetk.agg`. `append()` aggregates only the new rows and merges them into the bins they fall in, so new data does not require re-summarizing the whole history. `to_frame()` materializes the same DataFrame as `summarize_by_time` on all the rows appended so far.
+
+    Parameters
+    ----------
+    date_column : str
+        The `date_column` parameter is the name of the datetime column.
+    value_column : str or list
+        The `value_column` parameter is the name of one or more numeric columns to aggregate.
+    freq : str, optional
+        The `freq` parameter is the frequency of the time bins, as in `summarize_by_time`. The bins must not depend on the first date of the data: frequencies that divide a day (e.g. "12H") or anchored frequencies of one period (e.g. "D", "W", "MS"). The default is "D".
+    agg_func : str or list, optional
+        The `agg_func` parameter is one or a list of decomposable aggregations: "sum", "count", "min", "max", "mean", "var", "std" or a sketch such as `tk.agg.approx_quantile()`. The default is "sum".
+    group_columns : str or list, optional
+        The `group_columns` parameter is the name of one or more grouping columns. The default (`None`) aggregates by time only.
+    fillna : int, optional
+        The `fillna` parameter is the value used for missing data (e.g. the mean of an empty time bin). The default is 0.
+
+    Examples
+    --------
+    ``` {python}
+    import pytimetk as tk
+
+    df = tk.load_dataset('bike_sales_sample', parse_dates = ['order_date'])
+
+    rollup = tk.TimeRollup(
+        date_column   = 'order_date',
+        value_column  = 'total_price',
+        freq          = 'MS',
+        agg_func      = ['sum', 'mean'],
+        group_columns = 'category_1',
+    )
+
+    # Append the data as it arrives
+    rollup.append(df.iloc[:1000])
+    rollup.append(df.iloc[1000:])
+
+    rollup.to_frame()
+    ```
+    """
+
+    def __init__(
+        self,
+        date_column: str,
+        value_column: Union[str, list],
+        freq: str = 'D',
+        agg_func: Union[str, list] = 'sum',
+        group_columns: Optional[Union[str, list]] = None,
+        fillna: int = 0,
+    ):
+
+        funcs = agg_func if isinstance(agg_func, list) else [agg_func]
+        if not _is_decomposable_agg(funcs):
+            raise ValueError("`agg_func` must contain only 'sum', 'count', 'min', 'max', 'mean', 'var', 'std' or sketches of `pytimetk.agg`.")
+
+        # The bins of the appended rows must not depend on their first date
+        if not _is_fixed_bin_freq(freq):
+            raise ValueError(f"`freq` '{freq}' bins the data from its first date, so appended rows would fall in different bins. Use a frequency that divides a day (e.g. '12H') or an anchored frequency of one period (e.g. 'D', 'W', 'MS').")
+
+        self.date_column = date_column
+        self.value_column = value_column if isinstance(value_column, list) else [value_column]
+        self.freq = freq
+        self.agg_func = agg_func
+        self.group_columns = [group_columns] if isinstance(group_columns, str) else list(group_columns or [])
+        self.fillna = fillna
+
+        self._moments = None
+        self._moments_agg = None
+        self._dtypes = None
+
+    def append(self, data: Union[pd.DataFrame, pd.core.groupby.generic.DataFrameGroupBy]):
+        """
+        Aggregates new rows and merges them into the stored time bins.
+
+        Parameters
+        ----------
+        data : pd.DataFrame or pd.core.groupby.generic.DataFrameGroupBy
+            The `data` parameter contains the new rows, with the grouping, date and value columns.
+
+        Returns
+        -------
+        TimeRollup
+            The updated rollup.
+        """
+
+        if isinstance(data, pd.core.groupby.generic.DataFrameGroupBy):
+            data = data.obj
+
+        check_dataframe_or_groupby(data)
+        check_date_column(data, self.date_column)
+        check_value_column(data, self.value_column)
+
+        missing = [col for col in self.group_columns if col not in data.columns]
+        if missing:
+            raise ValueError(f"`data` is missing the grouping columns {missing}.")
+
+        if len(data) == 0:
+            return self
+
+        funcs = self.agg_func if isinstance(self.agg_func, list) else [self.agg_func]
+
+        moments, self._moments_agg = _summarize_moments(
+            data, self.group_columns, self.date_column, self.value_column, funcs, self.freq
+        )
+
+        moments = moments.set_index([*self.group_columns, self.date_column])
+
+        # Only the bins with new rows
+        counts = moments[[col for col in moments.columns if col.endswith('_n')]]
+        moments = moments[(counts > 0).any(axis=1)]
+
+        if self._moments is None:
+            self._moments = moments
+            self._dtypes = data[self.value_column].dtypes
+            return self
+
+        # Merge the bins that already exist, add the others
+        existing = moments.index.isin(self._moments.index)
+
+        if existing.any():
+            added = moments[existing]
+            current = self._moments.loc[added.index, added.columns]
+            new = added.copy()
+
+            for column, func in self._moments_agg.items():
+                if column.endswith('_m2'):
+                    i = column[:-len('_m2')]
+                    new[column] = _merge_m2(
+                        current[f'{i}_n'], current[f'{i}_total'], current[column], 
+                        added[f'{i}_n'], added[f'{i}_total'], added[column],
+                    )
+                elif func == 'min':
+                    new[column] = np.fmin(current[column], added[column])
+                elif func == 'max':
+                    new[column] = np.fmax(current[column], added[column])
+                elif callable(func):
+                    new[column] = [func(states) for states in zip(current[column], added[column])]
+                else:
+                    new[column] = current[column] + added[column]
+
+            self._moments.loc[new.index, new.columns] = new
+
+        if not existing.all():
+            self._moments = pd.concat([self._moments, moments[~existing]])
+
+        return self
+
+    def to_frame(self, wide_format: bool = False) -> pd.DataFrame:
+        """
+        Materializes the summary of all the rows appended so far.
+
+        Parameters
+        ----------
+        wide_format : bool, optional
+            The `wide_format` parameter returns the groups as separate columns, as in `summarize_by_time`. The default is `False`.
+
+        Returns
+        -------
+        pd.DataFrame
+            The same DataFrame as `summarize_by_time` on all the appended rows.
+        """
+
+        if self._moments is None:
+            raise ValueError("No data has been appended to the rollup.")
+
+        return _summarize_from_moments(
+            self._moments.sort_index().reset_index(),
+            self._moments_agg,
+            self.group_columns,
+            self.date_column,
+            self.freq,
+            self._dtypes,
+            self.agg_func,
+            wide_format,
+            self.fillna,
+        )
@@ -1,26 +1,22 @@
 import pandas as pd
+import numpy as np
 import pandas_flavor as pf
+import warnings
+import os
+import time
+import hashlib
+import pickle
+
+from collections import ChainMap
 
 from functools import partial
 
 from multiprocessing import cpu_count
 from concurrent.futures import ThreadPoolExecutor
 
-from typing import Optional, Union
+from typing import Optional, Union, Iterator
 
-try:
-    import tsfeatures as tsf
-    from tsfeatures import (
-        acf_features, arch_stat, crossing_points,
-        entropy, flat_spots, heterogeneity,
-        holt_parameters, lumpiness, nonlinearity,
-        pacf_features, stl_features, stability,
-        hw_parameters, unitroot_kpss, unitroot_pp,
-        series_length, hurst
-    )
-    from tsfeatures.tsfeatures import _get_feats
-except ImportError:
-    pass 
+__all__ = ['ts_features', 'dict_freqs']
 
 dict_freqs = {
     'H': 24, 'D': 1,
@@ -37,7 +33,12 @@ def ts_features(
     freq: Optional[str] = None,
     scale: bool = True,
     threads: Optional[int] = 1,
-) -> pd.DataFrame:
+    engine: str = 'tsfeatures',
+    cache_dir: Optional[str] = None,
+    timeout: Optional[float] = None,
+    stream: bool = False,
+    chunk_size: int = 1000,
+) -> Union[pd.DataFrame, Iterator[pd.DataFrame]]:
     '''Extracts aggregated time series features from a DataFrame or DataFrameGroupBy object using the `tsfeatures` package.
     
     Note: Requires the `tsfeatures` package to be installed.
@@ -86,11 +87,33 @@ def ts_features(
         The `threads` parameter is an optional parameter that specifies the number of threads to use for parallel processing. 
         - If is `None`, tthe function will use all available threads on the system.
         - If is -1, the function will use all available threads on the system.
+    engine : str, optional
+        The `engine` parameter selects how the features are computed. 
+        - If `engine` is set to `'tsfeatures'` (default), each series is passed to the `tsfeatures` feature functions one at a time.
+        - If `engine` is set to `'native'`, the features `acf_features`, `crossing_points`, `flat_spots`, `entropy`, `lumpiness`, `stability` and `series_length` are computed with vectorized NumPy code on a padded matrix of all series at once. Any other features fall back to the `tsfeatures` functions, one series at a time.
+    cache_dir : str, optional
+        The `cache_dir` parameter is an optional path to a directory used to cache the extracted features on disk. 
+        - If `None` (default), nothing is cached.
+        - If a path is given, the features of each series are stored under a hash of the series values and dates, the `features`, `freq` and `scale`. Series whose hash is already in the cache are not recomputed. 
+        - Each series is stored in its own file, and only the files of the series passed are read, so the time to look up the cache does not grow with its size. The cached series are returned first, in chunks of `chunk_size` series.
+        - The remaining series are computed in chunks, and each completed chunk is written to the cache immediately, so a run that is interrupted resumes from the last completed chunk when called again.
+    timeout : float, optional
+        The `timeout` parameter is an optional time budget in seconds for each series. 
+        - If `None` (default), there is no time budget.
+        - If a number is given, a series that exceeds the budget gets `NaN` for every feature, and a `status` column is added to the output with the value `'ok'` or `'timeout'`. The budget is checked after each feature function, so a single long-running feature function is not interrupted. Timed out series are not cached.
+        
+        Series are scheduled longest first, so long series do not start last and hold up the end of the run.
+    stream : bool, optional
+        The `stream` parameter determines whether to return the features all at once or in batches. 
+        - If `stream` is set to `False` (default), a single DataFrame is returned.
+        - If `stream` is set to `True`, a generator is returned that yields one DataFrame of features per chunk of `chunk_size` series as each chunk finishes. Only one chunk of results is held in memory at a time.
+    chunk_size : int, optional
+        The `chunk_size` parameter is the number of series per chunk when `cache_dir` is set (one cache checkpoint per chunk) or `stream` is `True` (one yielded DataFrame per chunk). Default is 1000.
     
     Returns
     -------
-    pd.DataFrame
-        The function `ts_features` returns a pandas DataFrame containing the extracted time series features. If grouped data is provided, the DataFrame will contain the grouping columns as well.
+    pd.DataFrame or Iterator[pd.DataFrame]
+        The function `ts_features` returns a pandas DataFrame containing the extracted time series features. If grouped data is provided, the DataFrame will contain the grouping columns as well. If `stream` is `True`, a generator of DataFrames (one per chunk) is returned instead.
         
     Examples
     --------
@@ -125,11 +148,53 @@ def ts_features(
     ) 
     feature_df
     ```
+    
+    ```{python}
+    # Vectorized NumPy engine (much faster for many series)
+    feature_df = (
+        df
+            .groupby('id')
+            .ts_features(    
+                date_column  = 'date', 
+                value_column = 'value',
+                features     = [acf_features, crossing_points, stability],
+                engine       = 'native'
+            )
+    ) 
+    feature_df
+    ```
+    
+    ```{python}
+    # Stream results in chunks of series, with a time budget per series
+    feature_batches = (
+        df
+            .groupby('id')
+            .ts_features(    
+                date_column  = 'date', 
+                value_column = 'value',
+                features     = [acf_features, hurst],
+                timeout      = 10,
+                stream       = True,
+                chunk_size   = 2
+            )
+    ) 
+    
+    for batch in feature_batches:
+        print(batch)
+    ```
     '''
     
-    # This function requires the holidays package to be installed
+    # This function requires the tsfeatures package to be installed (imported on first use, it is slow to import)
     try:
-        import tsfeatures
+        from tsfeatures import (
+            acf_features, arch_stat, crossing_points,
+            entropy, flat_spots, heterogeneity,
+            holt_parameters, lumpiness, nonlinearity,
+            pacf_features, stl_features, stability,
+            hw_parameters, unitroot_kpss, unitroot_pp,
+            series_length, hurst
+        )
+        from tsfeatures.tsfeatures import _get_feats
     except ImportError:
         raise ImportError("The 'tsfeatures' package is not installed. Please install it by running 'pip install tsfeatures'.")
     
@@ -137,20 +202,33 @@ def ts_features(
     if not isinstance(data, pd.DataFrame):
         if not isinstance(data, pd.core.groupby.generic.DataFrameGroupBy):
             raise TypeError("`data` is not a Pandas DataFrame.")
+    
+    if engine not in ['tsfeatures', 'native']:
+        raise ValueError(f"Invalid engine: {engine}. Please use 'tsfeatures' or 'native'.")
+    
+    if not isinstance(chunk_size, int) or chunk_size < 1:
+        raise ValueError("`chunk_size` must be a positive integer.")
 
+    # Integer group codes from one factorization (no string keys per row)
     group_names = None  
     if isinstance(data, pd.DataFrame):
-        df = data.copy()        
-        df.sort_values(by=[date_column], inplace=True)
-        df['unique_id'] = "X1"
-        df = df[['unique_id', date_column, value_column]]
-        group_names = ['unique_id']
+        df = data
+        codes = np.zeros(len(df), dtype=int)
 
     if isinstance(data, pd.core.groupby.generic.DataFrameGroupBy):
         group_names = data.grouper.names
-        df = data.obj.copy()
-        df.sort_values(by=[*group_names, date_column], inplace=True)
-        df = df[[*group_names, date_column, value_column]]
+        df = data.obj
+        codes = data.ngroup().to_numpy()
+    
+    # Lookup table of the group keys, one row per code
+    if group_names is not None:
+        codes_unique, first_rows = np.unique(codes, return_index=True)
+        first_rows = first_rows[codes_unique >= 0]
+        id_df = df[group_names].iloc[first_rows].reset_index(drop=True)
+    
+    # Sort rows by group code, then date (dropped groups have code -1)
+    keep = np.flatnonzero(codes >= 0)
+    order = keep[np.lexsort((df[date_column].to_numpy(dtype='datetime64[ns]')[keep], codes[keep]))]
     
     if features is None:
         features = [
@@ -174,37 +252,91 @@ def ts_features(
         ]
     
     # Construct the DataFrame for tsfeatures
-    if isinstance(data, pd.DataFrame):
-        construct_df = df[group_names]
-        construct_df['ds'] = df[date_column]
-        construct_df['y'] = df[value_column]  
-    else: # grouped dataframe
-        construct_df = df[group_names]    
-        for col in group_names:
-            construct_df[col] = df[col].astype(str)
-        construct_df['unique_id'] = construct_df[group_names].apply(lambda row: '_'.join(row), axis=1)
-        construct_df.drop(columns=group_names, inplace=True)
-        construct_df['ds'] = df[date_column]
-        construct_df['y'] = df[value_column]
+    construct_df = pd.DataFrame({
+        'unique_id': codes[order],
+        'ds': df[date_column].iloc[order].to_numpy(),
+        'y': df[value_column].to_numpy()[order],
+    })
  
     # Run tsfeatures
     # features_df = tsf.tsfeatures(construct_df, features=features, freq=freq, scale=scale, threads=threads)
     
     # Replicate tsfeatures without threads
     # https://github.com/Nixtla/tsfeatures/blob/fe4f6e63b8883f84922354b7a57056cf534aa4ae/tsfeatures/tsfeatures.py#L967
-    partial_get_feats = partial(
-        _get_feats, 
-        freq=freq, 
-        scale=scale,
-        features=features, 
-        dict_freqs=dict_freqs
+    if timeout is None:
+        partial_get_feats = partial(
+            _get_feats, 
+            freq=freq, 
+            scale=scale,
+            features=features, 
+            dict_freqs=dict_freqs
+        )
+    else:
+        partial_get_feats = partial(
+            _get_feats_with_timeout, 
+            freq=freq, 
+            scale=scale,
+            features=features, 
+            dict_freqs=dict_freqs,
+            timeout=timeout
+        )
+    
+    if threads is None: threads = cpu_count()
+    if threads == -1: threads = cpu_count()
+    
+    if engine == 'native':
+        compute_features = partial(
+            _ts_features_native,
+            features   = features, 
+            freq       = freq, 
+            scale      = scale, 
+            threads    = threads,
+            dict_freqs = dict_freqs,
+            timeout    = timeout
+        )
+    else:
+        compute_features = partial(
+            _ts_features_tsfeatures,
+            partial_get_feats = partial_get_feats,
+            threads           = threads
+        )
+    
+    # Series are only split into chunks when they are checkpointed or streamed
+    if cache_dir is None and not stream:
+        chunk_size = None
+    
+    chunks = _ts_features_chunks(
+        construct_df, 
+        compute_features = compute_features,
+        chunk_size       = chunk_size,
+        cache_dir        = cache_dir,
+        features         = features,
+        freq             = freq,
+        scale            = scale
     )
     
+    finalize = partial(
+        _ts_features_finalize, 
+        id_df       = id_df if group_names is not None else None,
+        dropna      = isinstance(data, pd.DataFrame),
+        status      = timeout is not None
+    )
+    
+    if stream:
+        return (finalize(chunk) for chunk in chunks)
+    
+    return finalize(pd.concat(list(chunks)).sort_index())
+    
+# Monkey patch the method to pandas groupby objects
+pd.core.groupby.generic.DataFrameGroupBy.ts_features = ts_features
+    
+# UTILITIES
+# ------------------------------------------------------------------------------
+
+def _ts_features_tsfeatures(construct_df, partial_get_feats, threads):
+    '''Runs the tsfeatures feature functions one series at a time. Returns a DataFrame indexed by the sorted `unique_id` values.'''
     if threads != 1:
         
-        if threads is None: threads = cpu_count()
-        if threads == -1: threads = cpu_count()
-        
         # with Pool(threads) as pool:
         #     ts_features = pool.starmap(
         #         partial_get_feats, 
@@ -213,36 +345,456 @@ def ts_features(
         
         # Switch to concurrent.futures for better performance
         # multiprocessing.Pool is slower than concurrent.futures.ThreadPoolExecutor
+        # Longest series first, so a long series does not start last and hold up the end of the run
+        groups = sorted(construct_df.groupby('unique_id'), key=lambda args: len(args[1]), reverse=True)
+        
         with ThreadPoolExecutor(threads) as executor:
-            futures = [executor.submit(partial_get_feats, *args) for args in construct_df.groupby('unique_id')]
+            futures = [executor.submit(partial_get_feats, *args) for args in groups]
             
             ts_features = [future.result() for future in futures]
             
     else:
         # Don't parallel process
+        ts_features = [partial_get_feats(name, group) for name, group in construct_df.groupby('unique_id')]
+    
+    return pd.concat(ts_features).sort_index()
 
-        if isinstance(data, pd.DataFrame):
-            ts_features = tsf.tsfeatures(construct_df, features=features)
-            ts_features = ts_features.dropna(axis=1)
-        else: # grouped dataframe                
-            ts_features = []
-            for name, group in construct_df.groupby('unique_id'):
-                result = partial_get_feats(name, group, features = features)
-                ts_features.append(result)
+def _ts_features_chunks(construct_df, compute_features, chunk_size, cache_dir, features, freq, scale):
+    '''Yields the features of the series in `construct_df`, one DataFrame (indexed by `unique_id`) per completed chunk.
+    
+    Series are assigned to chunks of `chunk_size` series, longest first (`chunk_size=None` computes all series in one chunk). With a `cache_dir`, the cached series are yielded first, in chunks of `chunk_size` series read only when they are yielded, and the series of each computed chunk are written to the cache (one file per series cache key) as soon as the chunk completes.
+    '''
+    codes, uniques = pd.factorize(construct_df['unique_id'], sort=True)
+    lengths = np.bincount(codes, minlength=len(uniques))
+    
+    todo = np.arange(len(uniques))
+    
+    if cache_dir is not None:
+        keys = _cache_keys(construct_df, codes, len(uniques), features, freq, scale)
+        
+        # Only the keys of these series are looked up
+        hit = np.array([os.path.exists(_cache_path(cache_dir, key)) for key in keys], dtype=bool)
+        todo = np.flatnonzero(~hit)
+        
+        hits = np.flatnonzero(hit)
+        for start in range(0, len(hits), chunk_size or max(len(hits), 1)):
+            chunk = hits[start:start + (chunk_size or len(hits))]
+            cached_features, found = _cache_read(cache_dir, keys[chunk])
+            
+            # Series removed from the cache since the lookup are computed
+            todo = np.concatenate([todo, chunk[~found]])
+            
+            cached_features.index = uniques[chunk[found]]
+            yield cached_features
+    
+    if len(todo) == 0:
+        return
+    
+    # Assign the series to chunks, longest first (-1 = not computed)
+    todo = todo[np.argsort(-lengths[todo], kind='stable')]
+    series_chunk = np.full(len(uniques), -1)
+    series_chunk[todo] = np.arange(len(todo)) // (chunk_size or len(todo))
+    row_chunk = series_chunk[codes]
+    
+    for _, chunk_df in construct_df[row_chunk >= 0].groupby(row_chunk[row_chunk >= 0]):
+        chunk_features = compute_features(chunk_df)
+        
+        if cache_dir is not None:
+            to_cache = chunk_features
+            if 'status' in to_cache.columns:
+                to_cache = to_cache[to_cache['status'] != 'timeout'].drop(columns='status')
+            to_cache = to_cache.set_axis(keys[uniques.get_indexer(to_cache.index)])
             
-            ts_features = pd.concat(ts_features).rename_axis('unique_id')
-            ts_features = ts_features.reset_index() 
+            if len(to_cache) > 0:
+                _cache_write(to_cache, cache_dir)
+        
+        yield chunk_features
 
-            # Finalize id or grouping columns
-            if group_names is not None:
-                id_df = df[group_names].drop_duplicates().reset_index(drop=True)   
-            ts_features = pd.concat([id_df, ts_features], axis=1)
+def _ts_features_finalize(ts_features, id_df, dropna, status):
+    '''Joins the group keys from the `id_df` lookup table (one row per group code) onto the per-series feature rows. With `status`, the `status` column is placed last (cached series are `'ok'`).'''
+    if 'status' in ts_features.columns:
+        status_column = ts_features.pop('status')
+        if status:
+            ts_features['status'] = status_column.fillna('ok')
+    elif status:
+        ts_features['status'] = 'ok'
+    
+    if dropna:
+        ts_features = ts_features.dropna(axis=1)
+    
+    if id_df is None:
+        return ts_features.reset_index(drop=True)
+    
+    return pd.concat(
+        [
+            id_df.iloc[ts_features.index].reset_index(drop=True), 
+            ts_features.reset_index(drop=True)
+        ], 
+        axis=1
+    )
 
-    # drop unique_id column
-    ts_features.drop(columns=['unique_id'], inplace=True)
+def _resolve_freq(ds, freq, dict_freqs):
+    '''Returns the integer frequency of one series, inferring it from the dates when `freq` is None (as `tsfeatures` does).'''
+    if freq is not None:
+        if isinstance(freq, str):
+            freq = dict_freqs.get(freq, freq)
+        return freq
+    
+    inf_freq = pd.infer_freq(ds)
+    if inf_freq is None:
+        raise Exception(
+            'Failed to infer frequency from the `ds` column, '
+            'please provide the frequency using the `freq` argument.'
+        )
+    
+    freq = dict_freqs.get(inf_freq)
+    if freq is None:
+        raise Exception(
+            'Error trying to convert infered frequency from the `ds` column '
+            'to integer. Please provide a dictionary with that frequency '
+            'as key and the integer frequency as value. '
+            f'Infered frequency: {inf_freq}'
+        )
+    
+    return freq
+
+def _get_feats_with_timeout(index, ts, freq, scale, features, dict_freqs, timeout):
+    '''Same as `tsfeatures.tsfeatures._get_feats`, plus a `status` column. Gives up on the series (all features NaN) once `timeout` seconds have passed, checked after each feature function.'''
+    start = time.perf_counter()
+    
+    freq = _resolve_freq(ts['ds'], freq, dict_freqs)
+    
+    x = ts['y'].values
+    if scale:
+        x = (x - x.mean()) / x.std(ddof=1)
+    
+    dict_feats = []
+    for func in features:
+        dict_feats.append(func(x, freq))
+        if time.perf_counter() - start > timeout:
+            return pd.DataFrame({'status': 'timeout'}, index=[index])
+    
+    feats = pd.DataFrame(dict(ChainMap(*dict_feats)), index=[index])
+    feats['status'] = 'ok'
+    
+    return feats
+
+def _cache_keys(construct_df, codes, n_series, features, freq, scale):
+    '''Returns one content hash per series (in `unique_id` order) of its dates and values, the features, `freq` and `scale`.'''
+    settings = repr((
+        [f"{getattr(func, '__module__', '')}.{getattr(func, '__qualname__', repr(func))}" for func in features],
+        freq, 
+        scale
+    )).encode()
+    
+    order = np.argsort(codes, kind='stable')
+    ds = np.ascontiguousarray(construct_df['ds'].astype('int64').to_numpy()[order])
+    y = np.ascontiguousarray(construct_df['y'].to_numpy(dtype=float)[order])
+    offsets = np.concatenate([[0], np.cumsum(np.bincount(codes, minlength=n_series))])
+    
+    keys = []
+    for start, stop in zip(offsets[:-1], offsets[1:]):
+        h = hashlib.sha1(settings)
+        h.update(ds[start:stop].tobytes())
+        h.update(y[start:stop].tobytes())
+        keys.append(h.hexdigest())
+    
+    return np.array(keys, dtype=object)
+
+def _cache_path(cache_dir, key):
+    '''The cache file of one series cache key (in a subdirectory per first 2 characters of the key, to keep directories small).'''
+    return os.path.join(cache_dir, key[:2], f"ts_features-{key}.pkl")
+
+def _cache_read(cache_dir, keys):
+    '''Reads the features of `keys` from the cache. Returns a DataFrame of the features of the keys found (in order) and a boolean mask of the keys found.'''
+    rows = []
+    found = np.zeros(len(keys), dtype=bool)
+    for i, key in enumerate(keys):
+        try:
+            with open(_cache_path(cache_dir, key), 'rb') as file:
+                rows.append(pickle.load(file))
+            found[i] = True
+        except FileNotFoundError:
+            pass
+    
+    return pd.DataFrame.from_records(rows, index=pd.RangeIndex(len(rows))), found
+
+def _cache_write(chunk_features, cache_dir):
+    '''Writes the features of each series of one chunk to the cache (a dict of the features per key). Each file is written under a temporary name and then renamed, so an interrupted write never leaves a partial file behind.'''
+    for key, row in chunk_features.to_dict('index').items():
+        path = _cache_path(cache_dir, key)
+        os.makedirs(os.path.dirname(path), exist_ok=True)
+        
+        tmp_path = f"{path}.{os.getpid()}.tmp"
+        with open(tmp_path, 'wb') as file:
+            pickle.dump(row, file, protocol=pickle.HIGHEST_PROTOCOL)
+        os.replace(tmp_path, path)
+
+# Upper bound on the number of cells in one padded (series x time) matrix
+_NATIVE_MAX_CELLS = 2 ** 22
+
+def _get_native_features():
+    '''Maps the tsfeatures functions that have a vectorized implementation to that implementation.'''
+    from tsfeatures import acf_features, crossing_points, flat_spots, entropy, lumpiness, stability, series_length
+    
+    return {
+        acf_features:    _native_acf_features,
+        crossing_points: _native_crossing_points,
+        flat_spots:      _native_flat_spots,
+        entropy:         _native_entropy,
+        lumpiness:       _native_lumpiness,
+        stability:       _native_stability,
+        series_length:   _native_series_length,
+    }
+
+def _ts_features_native(construct_df, features, freq, scale, threads, dict_freqs, timeout=None):
+    '''Computes the features for every `unique_id` in `construct_df` (columns `unique_id`, `ds`, `y`).
+    
+    Series are sorted by length and cut into batches whose padded matrix holds at most `_NATIVE_MAX_CELLS` values. Natively supported features are computed on each batch at once; the remaining features are run series by series on the same (scaled) values, within the `timeout` budget. Returns a DataFrame indexed by the sorted `unique_id` values, with columns in the same order as `tsfeatures`.
+    '''
+    native_map = _get_native_features()
+    fallback_features = [func for func in features if func not in native_map]
+    
+    codes, uniques = pd.factorize(construct_df['unique_id'], sort=True)
+    order = np.argsort(codes, kind='stable')
+    values = construct_df['y'].to_numpy(dtype=float)[order]
+    
+    lengths = np.bincount(codes, minlength=len(uniques))
+    offsets = np.concatenate([[0], np.cumsum(lengths)])
+    
+    freqs = _native_resolve_freqs(construct_df['ds'].to_numpy()[order], offsets, freq, dict_freqs)
+    
+    results = []
+    for m in np.unique(freqs):
+        for batch in _native_batches(np.flatnonzero(freqs == m), lengths):
+            x, n = _native_padded_matrix(values, offsets, lengths, batch)
+            if scale:
+                x = _native_scale(x)
+            
+            fallback_records = _native_fallback(x, n, int(m), fallback_features, threads, timeout)
+            timed_out = np.array([records is None for records in fallback_records], dtype=bool)
+            fallback_records = [
+                records if records is not None else [{}] * len(fallback_features) 
+                for records in fallback_records
+            ]
+            
+            # tsfeatures merges the feature dicts with a ChainMap, so the last feature comes first
+            parts = []
+            for func in reversed(features):
+                if func in native_map:
+                    with warnings.catch_warnings(), np.errstate(all='ignore'):
+                        warnings.simplefilter('ignore', category=RuntimeWarning)
+                        part = pd.DataFrame(native_map[func](x, n, int(m)), index=batch)
+                else:
+                    part = pd.DataFrame.from_records(
+                        [records[fallback_features.index(func)] for records in fallback_records], 
+                        index=batch
+                    )
+                parts.append(part)
+            
+            batch_features = pd.concat(parts, axis=1)
+            
+            if timeout is not None:
+                batch_features = batch_features.mask(pd.Series(timed_out, index=batch_features.index), axis=0)
+                batch_features['status'] = np.where(timed_out, 'timeout', 'ok')
+            
+            results.append(batch_features)
+    
+    ts_features = pd.concat(results).sort_index()
+    ts_features.index = uniques[ts_features.index]
     
     return ts_features
+
+def _native_resolve_freqs(ds, offsets, freq, dict_freqs):
+    '''Returns the integer frequency of each series.'''
+    n_series = len(offsets) - 1
     
-# Monkey patch the method to pandas groupby objects
-pd.core.groupby.generic.DataFrameGroupBy.ts_features = ts_features
-    
\ No newline at end of file
+    if freq is not None:
+        return np.full(n_series, int(_resolve_freq(None, freq, dict_freqs)))
+    
+    return np.array([
+        _resolve_freq(pd.DatetimeIndex(ds[offsets[i]:offsets[i + 1]]), None, dict_freqs) 
+        for i in range(n_series)
+    ])
+
+def _native_batches(index, lengths, max_cells=None):
+    '''Yields arrays of series positions, shortest series first, so that each padded batch stays under `max_cells`.'''
+    if max_cells is None:
+        max_cells = _NATIVE_MAX_CELLS
+    
+    index = index[np.argsort(lengths[index], kind='stable')]
+    
+    start = 0
+    while start < len(index):
+        stop = start + 1
+        while stop < len(index) and (stop - start + 1) * lengths[index[stop]] <= max_cells:
+            stop += 1
+        yield index[start:stop]
+        start = stop
+
+def _native_padded_matrix(values, offsets, lengths, batch):
+    '''Builds a NaN padded (series x time) matrix for the series in `batch`.'''
+    n = lengths[batch]
+    x = np.full((len(batch), n.max()), np.nan)
+    
+    rows = np.repeat(np.arange(len(batch)), n)
+    cols = np.arange(n.sum()) - np.repeat(np.cumsum(n) - n, n)
+    x[rows, cols] = values[np.repeat(offsets[batch], n) + cols]
+    
+    return x, n
+
+def _native_mask(x, n):
+    return np.arange(x.shape[1]) < n[:, None]
+
+def _native_scale(x):
+    '''Mean-std scales each row (same as `tsfeatures.utils.scalets`).'''
+    with warnings.catch_warnings(), np.errstate(all='ignore'):
+        warnings.simplefilter('ignore', category=RuntimeWarning)
+        return (x - np.nanmean(x, axis=1, keepdims=True)) / np.nanstd(x, axis=1, ddof=1, keepdims=True)
+
+def _native_fallback(x, n, freq, fallback_features, threads, timeout=None):
+    '''Runs the features without a native implementation one series at a time, longest series first. Returns one list of feature dicts per series, or None for a series that exceeded the `timeout` budget.'''
+    if len(fallback_features) == 0:
+        return [[] for _ in range(len(n))]
+    
+    def get_feats(i):
+        start = time.perf_counter()
+        ts = x[i, :n[i]]
+        dict_feats = []
+        for func in fallback_features:
+            dict_feats.append(func(ts, freq))
+            if timeout is not None and time.perf_counter() - start > timeout:
+                return None
+        return dict_feats
+    
+    if threads != 1:
+        order = np.argsort(-n, kind='stable')
+        records = [None] * len(n)
+        with ThreadPoolExecutor(threads) as executor:
+            for i, dict_feats in zip(order, executor.map(get_feats, order)):
+                records[i] = dict_feats
+        return records
+    
+    return [get_feats(i) for i in range(len(n))]
+
+def _native_acf(x, n, lags):
+    '''Autocorrelation of each row at each of `lags` (same as `statsmodels.tsa.stattools.acf` with `fft=False`). Lags beyond the series length are 0.'''
+    d = x - np.nanmean(x, axis=1, keepdims=True)
+    d = np.where(_native_mask(x, n), d, 0.0)
+    c0 = (d * d).sum(axis=1)
+    
+    acf = {}
+    for k in lags:
+        if k < d.shape[1]:
+            acf[k] = (d[:, :-k] * d[:, k:]).sum(axis=1) / c0
+        else:
+            acf[k] = np.zeros(len(n)) / c0
+    
+    return acf
+
+def _native_acf_features(x, n, freq):
+    lags = range(1, 11)
+    
+    acfx = _native_acf(x, n, lags if freq <= 10 else [*lags, freq])
+    acfdiff1x = _native_acf(np.diff(x, n=1, axis=1), np.maximum(n - 1, 0), lags)
+    acfdiff2x = _native_acf(np.diff(x, n=2, axis=1), np.maximum(n - 2, 0), lags)
+    
+    sum_sq = lambda acf: np.sum([acf[k] ** 2 for k in lags], axis=0)
+    
+    output = {
+        'x_acf1': acfx[1],
+        'x_acf10': np.where(n > 10, sum_sq(acfx), np.nan),
+        'diff1_acf1': np.where(n > 10, acfdiff1x[1], np.nan),
+        'diff1_acf10': np.where(n > 10, sum_sq(acfdiff1x), np.nan),
+        'diff2_acf1': np.where(n > 11, acfdiff2x[1], np.nan),
+        'diff2_acf10': np.where(n > 11, sum_sq(acfdiff2x), np.nan),
+    }
+    
+    if freq > 1:
+        output['seas_acf1'] = np.where(n > freq, acfx[freq], np.nan)
+    
+    return output
+
+def _native_crossing_points(x, n, freq):
+    ab = x <= np.nanmedian(x, axis=1, keepdims=True)
+    cross = (ab[:, :-1] != ab[:, 1:]) & _native_mask(x, n)[:, 1:]
+    
+    return {'crossing_points': cross.sum(axis=1)}
+
+def _native_flat_spots(x, n, freq):
+    '''Longest run of observations falling into the same of 10 equal-width bins (same bins as `pd.cut(x, bins=10, include_lowest=True)`).'''
+    mn = np.nanmin(x, axis=1)
+    mx = np.nanmax(x, axis=1)
+    valid = np.isfinite(mn) & np.isfinite(mx)
+    
+    same = mn == mx
+    mn_adj = np.where(same, mn - np.where(mn != 0, 0.001 * np.abs(mn), 0.001), mn)
+    mx_adj = np.where(same, mx + np.where(mx != 0, 0.001 * np.abs(mx), 0.001), mx)
+    bins = np.linspace(mn_adj, mx_adj, 11, axis=1)
+    
+    # The first bin edge sits below the minimum, so the bin is the number of upper edges below x
+    cutx = np.zeros(x.shape, dtype=np.int8)
+    for edge in range(1, 11):
+        cutx += x > bins[:, [edge]]
+    
+    mask = _native_mask(x, n)
+    cutx = cutx[mask]
+    rows = np.repeat(np.arange(len(n)), n)
+    
+    breaks = np.ones(len(cutx), dtype=bool)
+    breaks[1:] = (cutx[1:] != cutx[:-1]) | (rows[1:] != rows[:-1])
+    run_lengths = np.bincount(np.cumsum(breaks) - 1)
+    
+    flat_spots = np.zeros(len(n), dtype=int)
+    np.maximum.at(flat_spots, rows[breaks], run_lengths)
+    
+    if valid.all():
+        return {'flat_spots': flat_spots}
+    
+    return {'flat_spots': np.where(valid, flat_spots, np.nan)}
+
+def _native_entropy(x, n, freq):
+    '''Normalized spectral entropy of the periodogram (same as `antropy.spectral_entropy(x, 1, normalize=True)`). Rows are grouped by length so each group is one FFT.'''
+    entropy = np.full(len(n), np.nan)
+    
+    for length in np.unique(n):
+        rows = np.flatnonzero(n == length)
+        seg = x[rows, :length]
+        
+        psd = np.abs(np.fft.rfft(seg - seg.mean(axis=1, keepdims=True), axis=1)) ** 2
+        if length % 2:
+            psd[:, 1:] *= 2
+        else:
+            psd[:, 1:-1] *= 2
+        
+        psd_norm = psd / psd.sum(axis=1, keepdims=True)
+        xlogx = np.zeros(psd_norm.shape)
+        xlogx[psd_norm < 0] = np.nan
+        pos = psd_norm > 0
+        xlogx[pos] = psd_norm[pos] * np.log2(psd_norm[pos])
+        
+        entropy[rows] = -xlogx.sum(axis=1) / np.log2(psd_norm.shape[1])
+    
+    return {'entropy': entropy}
+
+def _native_tiled(x, n, freq, stat):
+    '''Variance across the full, non-overlapping tiles of each row of the tile statistic `stat`.'''
+    width = 10 if freq == 1 else freq
+    n_tiles = x.shape[1] // width
+    
+    if n_tiles == 0:
+        return np.zeros(len(n))
+    
+    tiles = stat(x[:, :n_tiles * width].reshape(len(n), n_tiles, width), axis=2)
+    tiles[(np.arange(1, n_tiles + 1) * width) > n[:, None]] = np.nan
+    
+    return np.where(n < 2 * width, 0, np.nanvar(tiles, axis=1, ddof=1))
+
+def _native_lumpiness(x, n, freq):
+    return {'lumpiness': _native_tiled(x, n, freq, partial(np.nanvar, ddof=1))}
+
+def _native_stability(x, n, freq):
+    return {'stability': _native_tiled(x, n, freq, np.nanmean)}
+
+def _native_series_length(x, n, freq):
+    return {'series_length': n.copy()}
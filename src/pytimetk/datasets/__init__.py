@@ -1 +1,2 @@
-from .get_datasets import *
\ No newline at end of file
+from .get_datasets import *
+from .make_synthetic_panel import *
\ No newline at end of file
@@ -1,12 +1,31 @@
 
 import pandas as pd
+import numpy as np
 #from importlib.resources import open_text
 #from importlib.resources import contents
 from importlib.resources import files
+
+import os
+import json
+import shutil
+import tempfile
+import warnings
+from functools import lru_cache
+
+__all__ = ['load_dataset', 'get_available_datasets']
+
+# Datasets bundled with the package (`get_available_datasets` does not list the files)
+_DATASETS = [
+    'bike_sales_sample', 'bike_sharing_daily', 
+    'm4_daily', 'm4_hourly', 'm4_monthly', 'm4_quarterly', 'm4_weekly', 'm4_yearly', 
+    'stocks_daily', 'taylor_30_min', 'walmart_sales_weekly', 'wikipedia_traffic_daily',
+]
     
 def load_dataset(
     name: str = "m4_daily", 
     verbose: bool = False, 
+    cache: bool = True,
+    mmap: bool = False,
     **kwargs
 ) -> pd.DataFrame:
     '''
@@ -36,6 +55,10 @@ def load_dataset(
         The `name` parameter is used to specify the name of the dataset that you want to load. The default value is set to "m4_daily", which is the M4 daily dataset. However, you can choose from a list of available datasets mentioned in the function's docstring.
     verbose : bool, optional
         The `verbose` parameter is a boolean flag that determines whether or not to print the names of the available datasets. If `verbose` is set to `True`, the function will print the names of the available datasets. If `verbose` is set to `False`, the function will not print anything.
+    cache : bool, optional
+        The `cache` parameter determines whether the dataset is read from a binary copy instead of the CSV file. The binary copy (one NumPy `.npy` file per column, with the date columns already parsed) is built on first use in the directory given by the `PYTIMETK_CACHE_DIR` environment variable (default: `~/.cache/pytimetk`), and the loaded datasets are kept in memory (least recently used). The result is the same as reading the CSV file. The binary copy is only used when `**kwargs` is empty or only contains `parse_dates` (a list of column names); otherwise the CSV file is read. The default is True.
+    mmap : bool, optional
+        The `mmap` parameter memory-maps the numeric and date columns of the binary copy instead of reading them: the columns are read-only, and loaded from disk as they are used. Requires `cache = True`. The default is False.
     **kwargs
         The `**kwargs` parameter is used to pass additional arguments to `pandas.read_csv`.
     
@@ -84,6 +107,25 @@ def load_dataset(
     if name not in dataset_list:
         raise ValueError(f"Dataset {name} not found. Please choose from the following: \n{dataset_list}")
     
+    # Load the binary copy
+    if cache and set(kwargs) <= {'parse_dates'}:
+        parse_dates = kwargs.get('parse_dates') or []
+        if isinstance(parse_dates, str):
+            parse_dates = [parse_dates]
+        
+        if isinstance(parse_dates, (list, tuple)) and all(isinstance(column, str) for column in parse_dates):
+            df = _load_binary_dataset(name, tuple(parse_dates), mmap)
+            
+            if df is not None:
+                if not mmap:
+                    return df.copy()
+                
+                # Memory-mapped columns are read-only and can be shared, the others (strings) are copied
+                return pd.DataFrame({
+                    column: values if not values.to_numpy().flags.writeable else values.copy()
+                    for column, values in df.items()
+                }, copy=False)
+    
     # Load the dataset
     package_path = files('pytimetk')
     # Reference to the a file within the package
@@ -116,10 +158,100 @@ def get_available_datasets():
     
     '''
     
-    pathlist   = list(files("pytimetk.datasets").iterdir())
-    file_names = [path.name for path in pathlist]
-    dataset_list = [item for item in file_names if item.endswith(".csv")]
-    dataset_list = [name.rstrip('.csv') for name in dataset_list]
-    dataset_list = sorted(dataset_list)
+    return sorted(_DATASETS)
+
+# UTILITIES
+# ------------------------------------------------------------------------------
+
+@lru_cache(maxsize=32)
+def _load_binary_dataset(name, parse_dates, mmap):
+    '''Loads a dataset from its binary copy (built on first use). Returns None if a column of `parse_dates` is not a date column or the binary copy cannot be built.'''
+    
+    path = _binary_dataset_path(name)
+    if path is None:
+        return None
+    
+    with open(os.path.join(path, 'meta.json'), encoding='utf-8') as f:
+        meta = json.load(f)
+    
+    dates = {column['name'] for column in meta['columns'] if column['dates']}
+    if not set(parse_dates) <= dates:
+        return None
+    
+    mmap_mode = 'r' if mmap else None
+    
+    columns = {}
+    for i, column in enumerate(meta['columns']):
+        if column['name'] in parse_dates:
+            columns[column['name']] = np.load(os.path.join(path, f'{i}_dates.npy'), mmap_mode=mmap_mode)
+        elif column['strings']:
+            # Strings: categories and codes (-1 for missing values)
+            categories = np.load(os.path.join(path, f'{i}_categories.npy')).astype(object)
+            codes = np.load(os.path.join(path, f'{i}.npy'))
+            columns[column['name']] = np.append(categories, np.nan)[codes]
+        else:
+            columns[column['name']] = np.load(os.path.join(path, f'{i}.npy'), mmap_mode=mmap_mode)
+    
+    return pd.DataFrame(columns, copy=False)
+
+def _binary_dataset_path(name):
+    '''The directory of the binary copy of a dataset, built from the CSV file if needed. Returns None if it cannot be written.'''
+    
+    csv_path = f"{files('pytimetk')}/datasets/{name}.csv"
+    stat = os.stat(csv_path)
+    
+    cache_dir = os.environ.get('PYTIMETK_CACHE_DIR', os.path.join(os.path.expanduser('~'), '.cache', 'pytimetk'))
+    
+    # A new copy when the CSV file changes
+    path = os.path.join(cache_dir, 'datasets', f'{name}-{stat.st_size}-{stat.st_mtime_ns}')
+    if os.path.exists(os.path.join(path, 'meta.json')):
+        return path
+    
+    try:
+        os.makedirs(os.path.dirname(path), exist_ok=True)
+        build_path = tempfile.mkdtemp(dir=os.path.dirname(path))
+    except OSError:
+        return None
+    
+    try:
+        df = pd.read_csv(csv_path)
+        
+        columns = []
+        for i, (column, values) in enumerate(df.items()):
+            strings = values.dtype == object
+            dates = False
+            
+            if strings:
+                codes, categories = pd.factorize(values)
+                np.save(os.path.join(build_path, f'{i}.npy'), codes)
+                np.save(os.path.join(build_path, f'{i}_categories.npy'), categories.to_numpy().astype(str))
+                
+                # Date columns: the dates too (as `parse_dates` reads them)
+                try:
+                    with warnings.catch_warnings():
+                        warnings.simplefilter('ignore')
+                        parsed = pd.read_csv(csv_path, usecols=[column], parse_dates=[column])[column]
+                    dates = pd.api.types.is_datetime64_dtype(parsed)
+                except (ValueError, TypeError):
+                    dates = False
+                
+                if dates:
+                    np.save(os.path.join(build_path, f'{i}_dates.npy'), parsed.to_numpy())
+            else:
+                np.save(os.path.join(build_path, f'{i}.npy'), values.to_numpy())
+            
+            columns.append({'name': column, 'strings': bool(strings), 'dates': bool(dates)})
+        
+        with open(os.path.join(build_path, 'meta.json'), 'w', encoding='utf-8') as f:
+            json.dump({'name': name, 'columns': columns}, f)
+        
+        # Atomic: another process may have built the same copy
+        try:
+            os.rename(build_path, path)
+        except OSError:
+            shutil.rmtree(build_path, ignore_errors=True)
+    except OSError:
+        shutil.rmtree(build_path, ignore_errors=True)
+        return None
     
-    return dataset_list
\ No newline at end of file
+    return path if os.path.exists(os.path.join(path, 'meta.json')) else None
\ No newline at end of file
@@ -0,0 +1,175 @@
+import pandas as pd
+import numpy as np
+
+from typing import Union, Optional
+
+__all__ = ['make_synthetic_panel']
+
+
+def make_synthetic_panel(
+    n_series: int = 100,
+    n_periods: int = 365,
+    freq: str = 'D',
+    start: str = '2020-01-01',
+    n_group_levels: int = 2,
+    seasonality: Optional[Union[str, list]] = 'auto',
+    trend: float = 0.5,
+    noise: float = 0.1,
+    irregularity: float = 0.0,
+    missing_rate: float = 0.0,
+    seed: Optional[int] = 123,
+) -> pd.DataFrame:
+    '''
+    Generate a large synthetic panel of time series, for scale testing and benchmarks.
+
+    The `make_synthetic_panel` function generates `n_series` time series of `n_periods` points each, nested in `n_group_levels` levels of groups (e.g. region > store > series). Each series has its own level, trend, seasonal amplitudes and phases, a random walk and noise. Everything is generated with vectorized NumPy, so tens of millions of rows take a few seconds, and the same `seed` always gives the same panel.
+
+    Parameters
+    ----------
+    n_series : int, optional
+        The `n_series` parameter is the number of time series. The default is 100.
+    n_periods : int, optional
+        The `n_periods` parameter is the number of time periods of each time series (before `missing_rate` removes rows). The default is 365.
+    freq : str, optional
+        The `freq` parameter is the pandas frequency of the dates (e.g. "H", "D", "W", "MS"). The default is "D".
+    start : str, optional
+        The `start` parameter is the first date of the time series. The default is "2020-01-01".
+    n_group_levels : int, optional
+        The `n_group_levels` parameter is the number of levels of groups above the series (`level_1` is the coarsest). Each level has about `n_series ** (j / (n_group_levels + 1))` groups, nested in the groups of the level above. The default is 2.
+    seasonality : str or list, optional
+        The `seasonality` parameter is the list of seasonal periods, in number of time periods (e.g. [7, 365.25] for weekly and yearly seasonality of daily data). The default ("auto") uses the usual periods of `freq`: [24, 168] for hourly, [7, 365.25] for daily, [52.18] for weekly, [12] for monthly and [4] for quarterly data. None adds no seasonality.
+    trend : float, optional
+        The `trend` parameter is the standard deviation of the total change of the trend over the `n_periods`, relative to the level of each series. The default is 0.5.
+    noise : float, optional
+        The `noise` parameter is the standard deviation of the noise, relative to the level of each series. Half of it is a random walk (so the series are not stationary) and half is white noise. The default is 0.1.
+    irregularity : float, optional
+        The `irregularity` parameter shifts each date forward by a random fraction (between 0 and `irregularity`) of a time period, to make irregular time series. Must be between 0 and 1, so the dates keep their order. The default is 0 (regular dates).
+    missing_rate : float, optional
+        The `missing_rate` parameter is the fraction of rows removed at random (gaps in the time series). The default is 0.
+    seed : int, optional
+        The `seed` parameter is the seed of the random number generator. The default is 123. None gives a different panel on each call.
+
+    Returns
+    -------
+    pd.DataFrame
+        A DataFrame with the group columns `level_1`, ..., `level_{n_group_levels}`, the series `id`, the `date` and the `value`, sorted by `id` and `date`.
+
+    Examples
+    --------
+    ```{python}
+    import pytimetk as tk
+
+    df = tk.make_synthetic_panel(n_series = 1000, n_periods = 730, freq = 'D', n_group_levels = 2)
+
+    df.glimpse()
+    ```
+
+    ```{python}
+    # Irregular hourly data with gaps
+    df = tk.make_synthetic_panel(
+        n_series     = 10,
+        n_periods    = 24 * 7,
+        freq         = 'H',
+        irregularity = 0.5,
+        missing_rate = 0.1,
+    )
+
+    df.groupby('id').plot_timeseries('date', 'value', facet_ncol = 2, smooth = False)
+    ```
+    '''
+
+    if n_series < 1 or n_periods < 1:
+        raise ValueError("`n_series` and `n_periods` must be at least 1.")
+
+    if not 0 <= irregularity < 1:
+        raise ValueError("`irregularity` must be between 0 and 1.")
+
+    if not 0 <= missing_rate < 1:
+        raise ValueError("`missing_rate` must be between 0 and 1.")
+
+    rng = np.random.default_rng(seed)
+
+    if seasonality == 'auto':
+        seasonality = _seasonal_periods(freq)
+
+    # Parameters of each series
+    level = rng.lognormal(mean=4, sigma=1, size=n_series)
+    slope = rng.normal(scale=trend, size=n_series)
+
+    # Values: series x periods
+    t = np.arange(n_periods) / n_periods
+    values = 1 + slope[:, None] * t[None, :]
+
+    for period in seasonality or []:
+        amplitude = rng.uniform(0, 0.3, size=n_series)
+        phase = rng.uniform(0, 2 * np.pi, size=n_series)
+        values += amplitude[:, None] * np.sin(2 * np.pi * np.arange(n_periods)[None, :] / period + phase[:, None])
+
+    if noise > 0:
+        steps = rng.standard_normal((n_series, n_periods))
+        values += steps.cumsum(axis=1) * (noise / 2 / np.sqrt(n_periods))
+        values += rng.standard_normal((n_series, n_periods)) * (noise / 2)
+
+    values *= level[:, None]
+
+    # Dates: the same for all the series (shifted if irregular)
+    index = pd.date_range(start=start, periods=n_periods, freq=freq)
+    dates = np.tile(index.asi8, n_series)
+
+    if irregularity > 0:
+        step = np.diff(pd.date_range(start=start, periods=n_periods + 1, freq=freq).asi8)
+        dates += (rng.uniform(0, irregularity, size=n_series * n_periods) * np.tile(step, n_series)).astype(np.int64)
+
+    # Series and groups: codes, then labels (shared string objects)
+    series = np.repeat(np.arange(n_series), n_periods)
+
+    keep = slice(None)
+    if missing_rate > 0:
+        keep = rng.random(n_series * n_periods) >= missing_rate
+
+    # Groups of each level: from the finest, each group maps into one group of the level above
+    columns = {}
+    codes, n_codes = np.arange(n_series), n_series
+    for j in range(n_group_levels, 0, -1):
+        n_groups = max(int(round(n_series ** (j / (n_group_levels + 1)))), 1)
+        codes, n_codes = codes * n_groups // n_codes, n_groups
+        columns[f'level_{j}'] = _labels(f'L{j}_', n_groups)[codes][series[keep]]
+
+    columns = dict(reversed(columns.items()))
+
+    columns['id'] = _labels('S', n_series)[series[keep]]
+    columns['date'] = dates[keep].view('datetime64[ns]')
+    if index.tz is not None:
+        columns['date'] = pd.DatetimeIndex(columns['date']).tz_localize('UTC').tz_convert(index.tz)
+    columns['value'] = values.ravel()[keep]
+
+    return pd.DataFrame(columns)
+
+# UTILITIES
+# ------------------------------------------------------------------------------
+
+def _seasonal_periods(freq):
+    '''The usual seasonal periods of a pandas frequency, in number of time periods. Matched on the type of the offset, as the aliases differ between pandas versions (e.g. "H" and "h", "M" and "ME").'''
+    offset = pd.tseries.frequencies.to_offset(freq)
+    
+    offsets = pd.tseries.offsets
+    periods = [
+        (offsets.Hour, [24, 168]),
+        (offsets.Minute, [1440]),
+        (offsets.Second, [86400]),
+        (offsets.Day, [7, 365.25]),
+        (offsets.BusinessDay, [5, 261]),
+        (offsets.Week, [52.18]),
+        ((offsets.MonthEnd, offsets.MonthBegin), [12]),
+        ((offsets.SemiMonthEnd, offsets.SemiMonthBegin), [24]),
+        ((offsets.QuarterEnd, offsets.QuarterBegin), [4]),
+    ]
+    periods = next((p for types, p in periods if isinstance(offset, types)), [])
+    
+    # Multiples of the frequency (e.g. "30min")
+    return [period / offset.n for period in periods if period / offset.n >= 2]
+
+def _labels(prefix, n):
+    '''Labels prefix + zero-padded number, as an object array.'''
+    width = len(str(n - 1))
+    return np.array([f'{prefix}{i:0{width}d}' for i in range(n)], dtype=object)
@@ -2,24 +2,22 @@ import pandas as pd
 import numpy as np
 import pandas_flavor as pf
 
-from plotnine import *
-
-import plotly.express as px
-import plotly.graph_objects as go
-from plotly.subplots import make_subplots
-
-from mizani.breaks import date_breaks
-from mizani.formatters import date_format
-
-from statsmodels.nonparametric.smoothers_lowess import lowess
-
 from pytimetk.plot.theme import theme_timetk, palette_timetk
 from pytimetk.utils.plot_helpers import hex_to_rgba
 
 from typing import Union, Optional
 
+import hashlib
+import os
+import re
+from collections import OrderedDict
+from multiprocessing import cpu_count, get_context
+from concurrent.futures import ThreadPoolExecutor, ProcessPoolExecutor
+
 from pytimetk.utils.checks import check_dataframe_or_groupby, check_date_column, check_value_column
 
+__all__ = ['plot_timeseries', 'plot_timeseries_batch']
+
     
         
     
@@ -65,7 +63,23 @@ def plot_timeseries(
     width: Optional[int] = None,
     height: Optional[int] = None,
 
-    engine: str = 'plotly'
+    engine: str = 'plotly',
+    
+    downsample: Optional[Union[bool, str]] = None,
+    downsample_points: int = 2000,
+    
+    smooth_method: str = 'auto',
+    threads: Optional[int] = 1,
+    
+    webgl: Union[bool, str] = False,
+    consolidate_traces: bool = False,
+    binary_arrays: Union[bool, str] = False,
+    
+    facets_per_page: Optional[int] = None,
+    
+    density: bool = False,
+    density_bins: tuple = (200, 100),
+    density_bands: Optional[list] = None,
 
 ):
     '''Creates time series plots using different plotting engines such as Plotnine, Matplotlib, and Plotly.
@@ -148,6 +162,44 @@ def plot_timeseries(
         - "plotly" (interactive): Use the plotly library to create the plot. This is the default value.
         - "plotnine" (static): Use the plotnine library to create the plot. This is the default value.
         - "matplotlib" (static): Use the matplotlib library to create the plot.
+    downsample : bool or str, optional
+        The `downsample` parameter reduces the number of points of each trace (each group and color group) to about `downsample_points` before the plot is built, which keeps large time series (e.g. a year of 1-minute data) fast to render. The smoother is computed on all the points. It can take the following values:
+        
+        - None or False: No downsampling. This is the default value.
+        - "lttb": Largest-Triangle-Three-Buckets. Keeps the points that best preserve the visual shape of each trace. The minimum and maximum of each trace are always kept.
+        - "minmax": Min-max envelope. Keeps the minimum and maximum of each of `downsample_points / 2` time buckets, so every spike stays visible.
+        - "auto" or True: "minmax" for the traces with more than 10 times `downsample_points` points, "lttb" for the others.
+        
+        Traces with fewer than `downsample_points` points are not changed.
+    downsample_points : int, optional
+        The `downsample_points` parameter is the target number of points per trace when `downsample` is used. The default is 2000.
+    smooth_method : str, optional
+        The `smooth_method` parameter is the algorithm of the smoother. `smooth_frac` is the fraction of the points of each time series used for each smoothed value. It can take the following values:
+        
+        - "auto": "lowess" for the time series with up to 5,000 points, "lowess_fast" for the larger ones. This is the default value.
+        - "lowess": Locally weighted regression (statsmodels `lowess`) fitted at every point. Slow for large time series.
+        - "lowess_fast": LOWESS fitted on the means of at most 5,000 consecutive bins of points, skipping the fits within 1% of the time range of each other (`delta`), and interpolated to every point.
+        - "binned": Means of `2 / smooth_frac` time bins, interpolated with a cubic spline.
+        - "rolling": Centered rolling mean.
+        - "ewm": Exponentially weighted mean, averaged forwards and backwards (no lag).
+        
+        Smoothed values are cached, so plotting the same data again does not recompute them.
+    threads : int, optional
+        The `threads` parameter is the number of threads used to compute the smoothers of the groups (facets) and color groups in parallel. Set to `None` or -1 to use all available threads. The default is 1 (no parallel processing).
+    webgl : bool or str, optional
+        The `webgl` parameter (plotly engine only) draws the lines with WebGL (`Scattergl` traces), which renders hundreds of thousands of points smoothly in the browser. Set to "auto" to use WebGL when the figure has more than 100,000 points. The default is False. Browsers limit the number of WebGL figures in one page.
+    consolidate_traces : bool, optional
+        The `consolidate_traces` parameter (plotly engine only) joins the lines of the same facet that have the same color and style into one trace, separated by missing values. This divides the number of traces (and the size of the figure) when there are many color groups. The legend (and the hover label) shows one entry per trace, named after its first color group and the number of other color groups joined (e.g. "A (+9)"). The default is False.
+    binary_arrays : bool or str, optional
+        The `binary_arrays` parameter (plotly engine only) serializes the x and y values of the traces as typed arrays (base64 binary data) instead of text numbers, which makes the figure JSON (and HTML) of large time series smaller and faster to load. The dates become milliseconds on date axes. The figure is a `BinaryArrayFigure` (a plotly `Figure`); typed arrays are written by `to_json`, `to_html`, `show` and `write_html` and need plotly.js 2.28 or later (plotly 5.19 or later; with an older plotly the values are written as numbers). Set to "float32" to also store the values in single precision (half the size). The default is False.
+    facets_per_page : int, optional
+        The `facets_per_page` parameter splits the groups of a GroupBy object into pages of `facets_per_page` groups and returns one plot per page (a list), with the same arguments. This keeps the plots of thousands of groups readable and fast to build; use `plot_timeseries_batch` to render the pages to image files in parallel. The default is None (one plot of all the groups).
+    density : bool, optional
+        The `density` parameter draws, instead of the lines, a heatmap of the density of the points of each facet (plotly and plotnine engines; matplotlib draws the plotnine plot). The points are binned into a grid of time bins (shared by the facets) and value bins (the range of each facet), and each cell is colored by its share of the points of its time bin, from white to `line_color`. The size of the plot does not depend on the number of points or color groups, which suits thousands of overlapping time series per facet. The smoother, `color_column` and `downsample` are not used. The default is False.
+    density_bins : tuple, optional
+        The `density_bins` parameter is the number of time bins and value bins of the density heatmap. The default is (200, 100).
+    density_bands : list, optional
+        The `density_bands` parameter is a list of quantiles (between 0 and 1, e.g. [0.1, 0.5, 0.9]) of the values of each time bin, drawn as lines (in `smooth_color`, with `smooth_size`) over the density heatmap. The default is None (no bands).
         
     
     Returns
@@ -155,6 +207,7 @@ def plot_timeseries(
         The function `plot_timeseries` returns a plot object, depending on the specified `engine` parameter. 
         - If `engine` is set to 'plotnine' or 'matplotlib', the function returns a plot object that can be further customized or displayed. 
         - If `engine` is set to 'plotly', the function returns a plotly figure object.
+        - If `facets_per_page` is set, the function returns a list of plot objects, one per page.
     
     
     Examples
@@ -286,6 +339,87 @@ def plot_timeseries(
     check_date_column(data, date_column)
     check_value_column(data, value_column)
     
+    # Paged facets: one plot per page of groups
+    if facets_per_page is not None:
+        return [
+            page.plot_timeseries(
+                date_column = date_column,
+                value_column = value_column,
+                
+                color_column = color_column,
+                color_palette = color_palette,
+                
+                facet_ncol = facet_ncol,
+                facet_nrow = facet_nrow,
+                facet_scales = facet_scales,
+                facet_dir = facet_dir,
+                
+                line_color = line_color,
+                line_size = line_size,
+                line_type = line_type,
+                line_alpha = line_alpha,
+                
+                y_intercept = y_intercept,
+                y_intercept_color = y_intercept_color,
+                x_intercept = x_intercept,
+                x_intercept_color = x_intercept_color,
+                
+                smooth = smooth,
+                smooth_color = smooth_color,
+                smooth_frac = smooth_frac,
+                smooth_size = smooth_size,
+                smooth_alpha = smooth_alpha,
+                
+                legend_show = legend_show,
+                
+                title = title,
+                x_lab = x_lab,
+                y_lab = y_lab,
+                color_lab = color_lab,
+                
+                x_axis_date_labels = x_axis_date_labels,
+                base_size = base_size,
+                width = width,
+                height = height,
+                
+                engine = engine,
+                
+                downsample = downsample,
+                downsample_points = downsample_points,
+                
+                smooth_method = smooth_method,
+                threads = threads,
+                
+                webgl = webgl,
+                consolidate_traces = consolidate_traces,
+                binary_arrays = binary_arrays,
+                
+                density = density,
+                density_bins = density_bins,
+                density_bands = density_bands,
+            ) 
+            for page in _facet_pages(data, facets_per_page)
+        ]
+    
+    if downsample is True:
+        downsample = 'auto'
+    if downsample not in [None, False, 'auto', 'lttb', 'minmax']:
+        raise ValueError("Invalid `downsample` parameter. It must be one of None, 'auto', 'lttb' or 'minmax'.")
+    if downsample and downsample_points < 3:
+        raise ValueError("`downsample_points` must be at least 3.")
+    
+    if webgl not in [True, False, 'auto']:
+        raise ValueError("Invalid `webgl` parameter. It must be True, False or 'auto'.")
+    
+    if binary_arrays not in [True, False, 'float32']:
+        raise ValueError("Invalid `binary_arrays` parameter. It must be True, False or 'float32'.")
+    
+    if density_bands is not None and not all(0 <= q <= 1 for q in density_bands):
+        raise ValueError("`density_bands` must be quantiles between 0 and 1.")
+    
+    if smooth and smooth_method != 'auto' and smooth_method not in _SMOOTHERS:
+        raise ValueError(f"Invalid `smooth_method` parameter. It must be one of 'auto', {', '.join(repr(name) for name in _SMOOTHERS)}.")
+    
     # Handle line_size
     if line_size is None:
         if engine == 'plotnine':
@@ -301,23 +435,8 @@ def plot_timeseries(
         group_names = None
         data = data.copy()
         
-        # Handle smoother
-        if smooth:
-            if color_column is None:
-                data['__smooth'] = lowess(data[value_column], data[date_column], frac=smooth_frac, return_sorted=False)
-            else:
-                data['__smooth'] = np.nan
-                
-                for name, group in data.groupby(color_column):
-                    
-                    sorted_group = group.sort_values(by=date_column)
-                    x = np.arange(len(sorted_group))
-                    y = sorted_group[value_column].to_numpy()
-                    
-                    smoothed = lowess(y, x, frac=smooth_frac)
-                    
-                    data.loc[sorted_group.index, '__smooth'] = smoothed[:, 1]
-        
+        # One smoother per color group
+        smooth_columns = [] if color_column is None else color_column if isinstance(color_column, list) else [color_column]
     
     # Handle GroupBy objects
     if isinstance(data, pd.core.groupby.generic.DataFrameGroupBy):
@@ -325,21 +444,56 @@ def plot_timeseries(
         group_names = data.grouper.names
         data = data.obj.copy()
         
-        # Handle smoother
-        if smooth:
+        # One smoother per group
+        smooth_columns = group_names
+    
+    # Density heatmap: all the points of each facet, no smoother or downsampling
+    if density:
+        fig = _plot_timeseries_density(
+            data = data,
+            date_column = date_column,
+            value_column = value_column,
+            group_names = group_names,
+            bins = density_bins,
+            bands = density_bands,
             
-            data['__smooth'] = np.nan
+            facet_ncol = facet_ncol,
+            facet_nrow = facet_nrow,
+            facet_scales = facet_scales,
+            facet_dir = facet_dir,
             
-            for name, group in data.groupby(group_names):
-                
-                sorted_group = group.sort_values(by=date_column)
-                x = np.arange(len(sorted_group))
-                y = sorted_group[value_column].to_numpy()
-                
-                smoothed = lowess(y, x, frac=smooth_frac)  # Adjust frac as needed
-                
-                # Updating the original DataFrame with smoothed values
-                data.loc[sorted_group.index, '__smooth'] = smoothed[:, 1]
+            line_color = line_color,
+            smooth_color = smooth_color,
+            smooth_size = smooth_size,
+            
+            title = title,
+            x_lab = x_lab,
+            y_lab = y_lab,
+            x_axis_date_labels = x_axis_date_labels,
+            base_size = base_size,
+            width = width,
+            height = height,
+            
+            engine = 'plotly' if engine == 'plotly' else 'plotnine',
+        )
+        
+        if engine == 'matplotlib':
+            fig = fig + theme_timetk(height=height or 600, width=width or 800)
+            fig = fig.draw()
+        
+        return fig
+    
+    # Handle smoother
+    if smooth:
+        data['__smooth'] = _smooth_traces(data, date_column, value_column, smooth_columns, smooth_method, smooth_frac, threads)
+    
+    # Downsample each trace (after smoothing, so the smoother uses all the points)
+    if downsample:
+        trace_columns = list(group_names or [])
+        if color_column is not None:
+            trace_columns += color_column if isinstance(color_column, list) else [color_column]
+        
+        data = _downsample_traces(data, date_column, value_column, trace_columns, downsample, downsample_points)
             
     # Handle color palette
     if color_palette is None:
@@ -462,6 +616,10 @@ def plot_timeseries(
             
             width = width,
             height = height,
+            
+            webgl = webgl,
+            consolidate_traces = consolidate_traces,
+            binary_arrays = binary_arrays,
         )
 
     
@@ -471,9 +629,189 @@ def plot_timeseries(
 pd.core.groupby.generic.DataFrameGroupBy.plot_timeseries = plot_timeseries
 
 
-import plotly.graph_objects as go
-from plotly.subplots import make_subplots
-import pandas as pd
+@pf.register_dataframe_method
+def plot_timeseries_batch(
+    data: Union[pd.DataFrame, pd.core.groupby.generic.DataFrameGroupBy],
+    date_column: str,
+    value_column: str,
+    path: str,
+    facets_per_page: int = 1,
+    file_format: str = 'png',
+    dpi: int = 100,
+    engine: str = 'plotnine',
+    threads: Optional[int] = None,
+    **kwargs,
+) -> list:
+    '''Renders the time series plots of many groups to image files, in parallel.
+    
+    The groups are split into pages of `facets_per_page` groups (one group per image by default). Each page is plotted with `plot_timeseries` and saved in the `path` directory. The pages are rendered in a pool of processes.
+    
+    Parameters
+    ----------
+    data : pd.DataFrame or pd.core.groupby.generic.DataFrameGroupBy
+        The input data for the plots. It can be either a Pandas DataFrame (a single image) or a Pandas DataFrameGroupBy object (one image per page of groups).
+    date_column : str
+        The name of the column in the DataFrame that contains the dates for the time series data.
+    value_column : str
+        The name of the column in the DataFrame that contains the values for the time series data.
+    path : str
+        The `path` parameter is the directory where the images are written. It is created if it does not exist.
+    facets_per_page : int, optional
+        The `facets_per_page` parameter is the number of groups (facets) in each image. With the default (1), each group is plotted in its own image, named after the group (e.g. "M750.png"; groups whose names are the same once sanitized for the file system get the number of the group as a suffix, e.g. "x_1-2.png"). Otherwise the images are named "page_001.png", "page_002.png", ...
+    file_format : str, optional
+        The `file_format` parameter is the image format (extension) of the files, for example "png", "jpg", "svg" or "pdf". The default is "png".
+    dpi : int, optional
+        The `dpi` parameter is the resolution of the images (plotnine and matplotlib engines). The default is 100, so `width` and `height` are in pixels.
+    engine : str, optional
+        The `engine` parameter is the plotting library, as in `plot_timeseries`: "plotnine" (the default), "matplotlib" or "plotly" (requires the `kaleido` package to write images).
+    threads : int, optional
+        The `threads` parameter is the number of processes used to render the images. Set to `None` (the default) or -1 to use all available cores, or 1 to render in the main process. Processes are forked, so the arguments do not need to be pickled; on platforms without `fork` the images are rendered in the main process.
+    **kwargs
+        Other arguments of `plot_timeseries` (e.g. `color_column`, `smooth`, `facet_ncol`, `width`, `height`, `title`).
+    
+    Returns
+    -------
+    list
+        The paths of the images, in the order of the pages.
+    
+    Examples
+    --------
+    ```{python}
+    import pytimetk as tk
+    import tempfile
+    
+    df = tk.load_dataset('m4_daily', parse_dates = ['date'])
+    
+    # One image per time series
+    files = (
+        df
+            .groupby('id')
+            .plot_timeseries_batch(
+                'date', 'value', 
+                path = tempfile.mkdtemp(),
+                width = 600,
+                height = 400,
+            )
+    )
+    files
+    ```
+    
+    ```{python}
+    # Pages of 4 facets (2 x 2)
+    files = (
+        df
+            .groupby('id')
+            .plot_timeseries_batch(
+                'date', 'value', 
+                path = tempfile.mkdtemp(),
+                facets_per_page = 4,
+                facet_ncol = 2,
+                smooth = False,
+            )
+    )
+    files
+    ```
+    '''
+    global _BATCH_STATE
+    
+    check_dataframe_or_groupby(data)
+    check_date_column(data, date_column)
+    check_value_column(data, value_column)
+    
+    if threads is None: threads = cpu_count()
+    if threads == -1: threads = cpu_count()
+    
+    os.makedirs(path, exist_ok=True)
+    
+    # Pages: the rows of whole groups and the file name
+    if isinstance(data, pd.DataFrame):
+        frame, group_names = data, None
+        pages = [(np.arange(len(data)), 'plot')]
+    else:
+        frame, group_names = data.obj, data.grouper.names
+        
+        codes = data.ngroup().to_numpy()
+        keep = np.flatnonzero(codes >= 0)
+        order = keep[np.argsort(codes[keep], kind='stable')]
+        offsets = np.concatenate([[0], np.cumsum(np.bincount(codes[order]))])
+        
+        n_groups = len(offsets) - 1
+        n_pages = -(-n_groups // facets_per_page)
+        
+        if facets_per_page == 1:
+            labels = data.size().index.to_frame(index=False).astype(str).agg('_'.join, axis=1)
+            names = _unique_file_names([re.sub(r'[^\w\-.]+', '_', label) for label in labels])
+        else:
+            names = [f'page_{page + 1:0{len(str(n_pages))}d}' for page in range(n_pages)]
+        
+        pages = [
+            (order[offsets[page * facets_per_page]:offsets[min((page + 1) * facets_per_page, n_groups)]], names[page])
+            for page in range(n_pages)
+        ]
+    
+    pages = [(rows, os.path.join(path, f'{name}.{file_format}')) for rows, name in pages]
+    
+    try:
+        context = get_context('fork')
+    except ValueError:
+        context = None
+    
+    _BATCH_STATE = (frame, group_names, date_column, value_column, engine, dpi, kwargs)
+    try:
+        if context is None or threads == 1 or len(pages) < 2:
+            files = [_plot_timeseries_batch_page(page) for page in pages]
+        else:
+            with ProcessPoolExecutor(threads, mp_context=context) as executor:
+                files = list(executor.map(_plot_timeseries_batch_page, pages, chunksize=max(1, len(pages) // (threads * 4))))
+    finally:
+        _BATCH_STATE = None
+    
+    return files
+
+# Monkey patch the method to pandas groupby objects
+pd.core.groupby.generic.DataFrameGroupBy.plot_timeseries_batch = plot_timeseries_batch
+
+def _unique_file_names(names):
+    '''Makes the file names of the groups unique (also on case-insensitive file systems): the names shared by several groups (e.g. "x/1", "x_1" and "x 1" all give "x_1") get the number of the group as a suffix ("x_1-1", "x_1-2", "x_1-3").'''
+    keys = pd.Series(names).str.lower()
+    shared = keys.duplicated(keep=False).to_numpy()
+    
+    unique, taken = [], set(keys[~shared])
+    for i, name in enumerate(names):
+        if shared[i]:
+            name = f'{name}-{i + 1}'
+            while name.lower() in taken:
+                name = f'{name}-{i + 1}'
+        unique.append(name)
+        taken.add(name.lower())
+    
+    return unique
+
+# Set in the parent process before forking the workers of `plot_timeseries_batch`
+_BATCH_STATE = None
+
+def _plot_timeseries_batch_page(page):
+    '''Plots the rows of one page (whole groups) of the forked state and saves the image.'''
+    frame, group_names, date_column, value_column, engine, dpi, kwargs = _BATCH_STATE
+    rows, file = page
+    
+    data = frame.iloc[rows]
+    if group_names is not None:
+        data = data.groupby(group_names)
+    
+    fig = plot_timeseries(data, date_column, value_column, engine=engine, **kwargs)
+    
+    if engine == 'plotnine':
+        fig.save(file, dpi=dpi, verbose=False)
+    elif engine == 'matplotlib':
+        import matplotlib.pyplot as plt
+        fig.savefig(file, dpi=dpi)
+        plt.close(fig)
+    else:
+        fig.write_image(file)
+    
+    return file
+
 
 def _plot_timeseries_plotly(
     data,
@@ -518,9 +856,16 @@ def _plot_timeseries_plotly(
     
     width = None,
     height = None,
+    
+    webgl = False,
+    consolidate_traces = False,
+    binary_arrays = False,
 ):
     """This function is not intended to be called directly. It is used by the `plot_timeseries` function."""
     
+    import plotly.graph_objects as go
+    from plotly.subplots import make_subplots
+    
     data = data.copy()
     
     # Assign colors to groups
@@ -589,6 +934,9 @@ def _plot_timeseries_plotly(
     )
     
     # ADD TRACES -----
+    
+    # (trace, row, col): the traces are added to the figure at once
+    traces = []
 
     if group_names is not None:
         for i, (name, group) in enumerate(grouped):
@@ -625,7 +973,8 @@ def _plot_timeseries_plotly(
                     # print(name)
                     # print(j)
                     
-                    trace = go.Scatter(
+                    trace = dict(
+                        type='scatter',
                         x=color_group[date_column], 
                         y=color_group[value_column], 
                         mode='lines',
@@ -633,20 +982,11 @@ def _plot_timeseries_plotly(
                         name=name, 
                         legendgroup=name,
                     )
-                    fig.add_trace(trace, row=row, col=col)
+                    traces.append((trace, row, col))
                     
                     fig.layout.annotations[i].update(text=grp_nm)
                     
                 
-                # Remove duplicate legends in each legend group
-                seen_legendgroups = set()
-                for trace in fig.data:
-                    legendgroup = trace.legendgroup
-                    if legendgroup in seen_legendgroups:
-                        trace.showlegend = False
-                    else:
-                        seen_legendgroups.add(legendgroup)
-                
             else:
                 
                 group_group = group.merge(group_lookup_df, on=group_names, how="left")
@@ -655,16 +995,16 @@ def _plot_timeseries_plotly(
                 
                 grp_nm = group_group['_group_names'].unique()[0]
                 
-                trace = go.Scatter(x=group_group[date_column], y=group_group[value_column], mode='lines', line=dict(color=hex_to_rgba(line_color, alpha=line_alpha), width=line_size), showlegend=False, name=name[0])
-                fig.add_trace(trace, row=row, col=col)
+                trace = dict(type='scatter', x=group_group[date_column], y=group_group[value_column], mode='lines', line=dict(color=hex_to_rgba(line_color, alpha=line_alpha), width=line_size), showlegend=False, name=name[0])
+                traces.append((trace, row, col))
                 
                 
                 fig.layout.annotations[i].update(text=grp_nm)
             
             
             if smooth:
-                trace = go.Scatter(x=group[date_column], y=group['__smooth'], mode='lines', line=dict(color=hex_to_rgba(smooth_color, alpha=smooth_alpha), width=smooth_size), showlegend=False, name="Smoother")
-                fig.add_trace(trace, row=row, col=col)
+                trace = dict(type='scatter', x=group[date_column], y=group['__smooth'], mode='lines', line=dict(color=hex_to_rgba(smooth_color, alpha=smooth_alpha), width=smooth_size), showlegend=False, name="Smoother")
+                traces.append((trace, row, col))
             
             if y_intercept is not None:
                 if not isinstance(y_intercept, list):
@@ -696,7 +1036,8 @@ def _plot_timeseries_plotly(
                 # print(name)
                 # print(j)
                 
-                trace = go.Scatter(
+                trace = dict(
+                    type='scatter',
                     x=color_group[date_column], 
                     y=color_group[value_column], 
                     mode='lines',
@@ -704,25 +1045,15 @@ def _plot_timeseries_plotly(
                     name=name, 
                     legendgroup=name,
                 )
-                fig.add_trace(trace)
-            
-            # Remove duplicate legends in each legend group
-            seen_legendgroups = set()
-            for trace in fig.data:
-                legendgroup = trace.legendgroup
-                if legendgroup in seen_legendgroups:
-                    trace.showlegend = False
-                else:
-                    seen_legendgroups.add(legendgroup)
-            
+                traces.append((trace, 1, 1))
             
         else:
-            trace = go.Scatter(x=data[date_column], y=data[value_column], mode='lines', line=dict(color=hex_to_rgba(line_color, alpha=line_alpha), width=line_size), showlegend=False, name="Time Series")
-            fig.add_trace(trace)
+            trace = dict(type='scatter', x=data[date_column], y=data[value_column], mode='lines', line=dict(color=hex_to_rgba(line_color, alpha=line_alpha), width=line_size), showlegend=False, name="Time Series")
+            traces.append((trace, 1, 1))
         
         if smooth:
-            trace = go.Scatter(x=data[date_column], y=data['__smooth'], mode='lines', line=dict(color=hex_to_rgba(smooth_color, alpha=smooth_alpha), width=smooth_size), showlegend=False, name="Smoother")
-            fig.add_trace(trace)
+            trace = dict(type='scatter', x=data[date_column], y=data['__smooth'], mode='lines', line=dict(color=hex_to_rgba(smooth_color, alpha=smooth_alpha), width=smooth_size), showlegend=False, name="Smoother")
+            traces.append((trace, 1, 1))
         
         if y_intercept is not None:
             if not isinstance(y_intercept, list):
@@ -736,6 +1067,31 @@ def _plot_timeseries_plotly(
             for x in x_intercept:
                 fig.add_shape(go.layout.Shape(type="line", x0=x, x1=x, y0=data[value_column].min(), y1=data[value_column].max(), line=dict(color=x_intercept_color, width=1)))
 
+    if consolidate_traces:
+        traces = _consolidate_traces(traces)
+    
+    if webgl == 'auto':
+        webgl = sum(len(trace['x']) for trace, _, _ in traces) > _WEBGL_AUTO_POINTS
+    
+    if webgl:
+        for trace, _, _ in traces:
+            trace['type'] = 'scattergl'
+    
+    fig.add_traces(
+        [trace for trace, _, _ in traces], 
+        rows=[row for _, row, _ in traces], 
+        cols=[col for _, _, col in traces],
+    )
+    
+    # Remove duplicate legends in each legend group
+    seen_legendgroups = set()
+    for trace in fig.data:
+        legendgroup = trace.legendgroup
+        if legendgroup in seen_legendgroups:
+            trace.showlegend = False
+        else:
+            seen_legendgroups.add(legendgroup)
+    
     # Finalize the plotly plot
     
     fig.update_layout(
@@ -770,6 +1126,9 @@ def _plot_timeseries_plotly(
     
     if not legend_show:
         fig.update_layout(showlegend=False)
+    
+    if binary_arrays:
+        _encode_binary_arrays(fig, float32 = binary_arrays == 'float32')
 
      
         
@@ -825,6 +1184,11 @@ def _plot_timeseries_plotnine(
 ):
     """This function is not intended to be called directly. It is used by the `plot_timeseries` function."""
     
+    from plotnine import (
+        ggplot, aes, geom_line, geom_hline, geom_vline, scale_color_manual, 
+        labs, scale_x_datetime, facet_wrap, theme
+    )
+    
     # Data Setup
     
     if color_column is not None:
@@ -972,4 +1336,505 @@ def _plot_timeseries_plotnine(
     
     
     
-    
\ No newline at end of file
+    
+
+# UTILITIES
+# ------------------------------------------------------------------------------
+
+# Figures with more points use WebGL with webgl = "auto"
+_WEBGL_AUTO_POINTS = 100_000
+
+def _consolidate_traces(traces):
+    '''Joins the traces of the same subplot with the same style into one trace, with a missing value between the joined traces (so their lines are not connected).'''
+    
+    styles = {}
+    for trace, row, col in traces:
+        style = (row, col, trace['type'], trace['mode'], trace['line']['color'], trace['line']['width'], trace.get('showlegend', True))
+        styles.setdefault(style, []).append(trace)
+    
+    consolidated = []
+    for (row, col, *_), joined in styles.items():
+        
+        if len(joined) == 1:
+            consolidated.append((joined[0], row, col))
+            continue
+        
+        x, y = [], []
+        for trace in joined:
+            trace_x = np.asarray(trace['x'])
+            trace_y = np.asarray(trace['y'], dtype=float)
+            
+            # Separator: the last date again, with a missing value
+            x += [trace_x, trace_x[-1:]]
+            y += [trace_y, np.full(min(len(trace_x), 1), np.nan)]
+        
+        trace = dict(
+            joined[0],
+            x=np.concatenate(x)[:-1],
+            y=np.concatenate(y)[:-1],
+            name=f"{joined[0]['name']} (+{len(joined) - 1})",
+        )
+        consolidated.append((trace, row, col))
+    
+    return consolidated
+
+def _density_grid(data, date_column, value_column, group_names, bins, bands):
+    '''Bins the points of each facet into a 2D histogram of time (shared by the facets) and value (per facet), with vectorized NumPy. 
+    
+    Returns the facet labels, the time bin centers, the value bin centers of each facet (n_facets x n_value_bins), the share of the points of each time bin in each cell (n_facets x n_time_bins x n_value_bins) and the quantiles `bands` of each time bin (n_facets x n_time_bins x len(bands), missing for empty time bins).
+    '''
+    n_time, n_value = bins
+    
+    if group_names is not None:
+        grouped = data.groupby(group_names)
+        codes = grouped.ngroup().to_numpy()
+        labels = [' | '.join(map(str, name)) if isinstance(name, tuple) else str(name) for name in grouped.size().index]
+    else:
+        codes = np.zeros(len(data), dtype=np.int64)
+        labels = ['']
+    
+    dates = pd.DatetimeIndex(data[date_column])
+    y = data[value_column].to_numpy(dtype=float)
+    
+    valid = (codes >= 0) & ~np.isnan(y) & ~dates.isna()
+    codes, t, y = codes[valid], dates.asi8[valid].astype(float), y[valid]
+    n_facets = len(labels)
+    
+    # Time bins: shared by the facets
+    t_min, t_max = (t.min(), t.max()) if len(t) else (0.0, 0.0)
+    t_span = (t_max - t_min) or 1.0
+    time_bins = ((t - t_min) / t_span * n_time).astype(np.int64).clip(0, n_time - 1)
+    
+    # Value bins: the range of each facet
+    ranges = pd.DataFrame({'code': codes, 'y': y}).groupby('code')['y'].agg(['min', 'max']).reindex(range(n_facets))
+    y_min, y_max = ranges['min'].fillna(0).to_numpy(), ranges['max'].fillna(0).to_numpy()
+    y_span = np.where(y_max > y_min, y_max - y_min, 1.0)
+    value_bins = ((y - y_min[codes]) / y_span[codes] * n_value).astype(np.int64).clip(0, n_value - 1)
+    
+    cells = (codes * n_time + time_bins) * n_value + value_bins
+    counts = np.bincount(cells, minlength=n_facets * n_time * n_value).reshape(n_facets, n_time, n_value)
+    
+    with np.errstate(invalid='ignore'):
+        share = counts / counts.sum(axis=2, keepdims=True)
+    
+    time_centers = pd.to_datetime(t_min + (np.arange(n_time) + 0.5) * t_span / n_time)
+    if dates.tz is not None:
+        time_centers = time_centers.tz_localize('UTC').tz_convert(dates.tz)
+    value_centers = y_min[:, None] + (np.arange(n_value)[None, :] + 0.5) * y_span[:, None] / n_value
+    
+    # Quantiles of each (facet, time bin): sorted values, then positions
+    quantiles = np.full((n_facets, n_time, len(bands or [])), np.nan)
+    if bands and len(y):
+        order = np.lexsort((y, time_bins, codes))
+        keys = codes[order] * n_time + time_bins[order]
+        
+        starts = np.flatnonzero(np.r_[True, keys[1:] != keys[:-1]])
+        sizes = np.diff(np.r_[starts, len(keys)])
+        
+        for j, q in enumerate(bands):
+            quantiles.reshape(-1, len(bands))[keys[starts], j] = y[order][starts + np.floor(q * (sizes - 1)).astype(np.int64)]
+    
+    return labels, time_centers, value_centers, share, quantiles
+
+def _plot_timeseries_density(
+    data, date_column, value_column, group_names, bins, bands,
+    facet_ncol, facet_nrow, facet_scales, facet_dir,
+    line_color, smooth_color, smooth_size,
+    title, x_lab, y_lab, x_axis_date_labels, base_size, width, height,
+    engine,
+):
+    '''Density heatmap of the points of each facet (see `density` in `plot_timeseries`).'''
+    
+    labels, time_centers, value_centers, share, quantiles = _density_grid(data, date_column, value_column, group_names, bins, bands)
+    
+    if engine == 'plotly':
+        
+        from plotly.subplots import make_subplots
+        
+        n_facets = len(labels)
+        facet_nrow = -(-n_facets // facet_ncol)
+        
+        fig = make_subplots(
+            rows = facet_nrow, 
+            cols = facet_ncol if group_names is not None else 1, 
+            subplot_titles = labels if group_names is not None else [],
+            shared_xaxes = True if facet_scales == "free_y" else False,
+            shared_yaxes = True if facet_scales == "free_x" else False,
+        )
+        
+        traces, rows, cols = [], [], []
+        for i, label in enumerate(labels):
+            row, col = i // facet_ncol + 1, i % facet_ncol + 1
+            
+            # Empty cells are transparent
+            z = np.where(share[i] > 0, share[i], np.nan).T
+            
+            traces.append(dict(type='heatmap', x=time_centers, y=value_centers[i], z=z, coloraxis='coloraxis', name=label, hovertemplate='%{x}<br>%{y}<br>share: %{z:.3f}<extra></extra>'))
+            rows.append(row)
+            cols.append(col)
+            
+            for j, q in enumerate(bands or []):
+                traces.append(dict(type='scatter', x=time_centers, y=quantiles[i, :, j], mode='lines', line=dict(color=smooth_color, width=smooth_size), name=f'q{q:g}', showlegend=False))
+                rows.append(row)
+                cols.append(col)
+        
+        fig.add_traces(traces, rows=rows, cols=cols)
+        
+        fig.update_layout(
+            title=title,
+            xaxis_title=x_lab,
+            yaxis_title=y_lab,
+            coloraxis=dict(colorscale=[[0, '#FFFFFF'], [1, line_color]], colorbar=dict(title='Share', thickness=10)),
+            template="plotly_white", 
+            font=dict(size=base_size),
+            title_font=dict(size=base_size*1.2),
+            margin=dict(l=10, r=10, t=40, b=40),
+            autosize=True, 
+            width=width,
+            height=height,
+        )
+        fig.update_xaxes(matches=None, showticklabels=True, visible=True, tickformat=x_axis_date_labels, tickfont=dict(size=base_size*0.8))
+        fig.update_yaxes(tickfont=dict(size=base_size*0.8))
+        fig.update_annotations(font_size=base_size*0.8)
+        
+        return fig
+    
+    from plotnine import (
+        ggplot, aes, geom_tile, geom_line, scale_fill_gradient, labs, scale_x_datetime, facet_wrap
+    )
+    
+    # Non-empty cells, with the size of the cells of their facet (x in days, the unit of the datetime scale)
+    facet, time, value = np.nonzero(share > 0)
+    cells = pd.DataFrame({
+        '_group_names': np.asarray(labels, dtype=object)[facet],
+        date_column: time_centers[time],
+        value_column: value_centers[facet, value],
+        '_share': share[facet, time, value],
+        '_width': (time_centers[1] - time_centers[0]) / pd.Timedelta(days=1) if bins[0] > 1 else 1.0,
+        '_height': (value_centers[:, 1] - value_centers[:, 0])[facet] if bins[1] > 1 else 1.0,
+    })
+    
+    g = ggplot(cells, aes(x = date_column, y = value_column)) \
+        + geom_tile(aes(fill = '_share', width = '_width', height = '_height')) \
+        + scale_fill_gradient(low = '#FFFFFF', high = line_color, name = 'Share')
+    
+    if bands:
+        facet, time, band = np.nonzero(~np.isnan(quantiles))
+        lines = pd.DataFrame({
+            '_group_names': np.asarray(labels, dtype=object)[facet],
+            date_column: time_centers[time],
+            value_column: quantiles[facet, time, band],
+            '_band': np.asarray([f'q{q:g}' for q in bands])[band],
+        })
+        g = g + geom_line(aes(group = '_band'), data = lines, color = smooth_color, size = smooth_size)
+    
+    g = g + labs(x = x_lab, y = y_lab, title = title)
+    g = g + scale_x_datetime(date_labels = x_axis_date_labels)
+    
+    if group_names is not None:
+        g = g + facet_wrap("_group_names", ncol = facet_ncol, nrow = facet_nrow, scales = facet_scales, dir = facet_dir, shrink = True)
+    
+    g = g + theme_timetk(base_size=base_size, width = width, height = height)
+    
+    return g
+
+def _facet_pages(data, facets_per_page):
+    '''Splits the groups of `data` into pages of `facets_per_page` groups. Returns a list of GroupBy objects (the data frame itself if it is not grouped).'''
+    if isinstance(data, pd.DataFrame):
+        return [data]
+    
+    group_names = data.grouper.names
+    pages = data.ngroup().to_numpy() // facets_per_page
+    
+    return [data.obj[pages == page].groupby(group_names) for page in range(pages.max() + 1)]
+
+def _encode_binary_arrays(fig, float32=False):
+    '''Makes `fig` a `BinaryArrayFigure` (typed arrays when serialized), with compact numeric x and y arrays: dates become milliseconds on date axes, integers int32 and the values float32 if `float32`.'''
+    from pytimetk.plot.plotly_figure import BinaryArrayFigure
+    
+    dates = False
+    for trace in fig.data:
+        for axis in ['x', 'y']:
+            values = trace[axis]
+            if values is None:
+                continue
+            
+            values = np.asarray(values)
+            
+            if values.dtype.kind in 'MO' and (values.dtype.kind == 'M' or pd.api.types.infer_dtype(values) in ['datetime', 'datetime64']):
+                index = pd.DatetimeIndex(values)
+                if index.tz is not None:
+                    index = index.tz_localize(None)
+                
+                values = np.where(index.isna(), np.nan, index.asi8 / 1e6)
+                dates = True
+            
+            elif values.dtype.kind in 'iu' and len(values) and np.iinfo(np.int32).min <= values.min() and values.max() <= np.iinfo(np.int32).max:
+                values = values.astype(np.int32)
+            
+            elif values.dtype.kind in 'iuf':
+                values = values.astype(np.float32 if float32 and axis == 'y' else np.float64)
+            
+            else:
+                continue
+            
+            # plotly keeps the old array if the values are equal: clear it to change the type
+            trace[axis] = None
+            trace[axis] = values
+    
+    if dates:
+        fig.update_xaxes(type='date')
+    
+    # Same figure, serialized with typed arrays (no copy of the traces)
+    fig.__class__ = BinaryArrayFigure
+
+# Smoothed values of the time series, by method, smooth_frac and hash of the values
+_SMOOTH_CACHE = OrderedDict()
+_SMOOTH_CACHE_SIZE = 256
+
+# Larger time series are smoothed with "lowess_fast" by smooth_method = "auto"
+_SMOOTH_AUTO_POINTS = 5000
+
+def _smooth_traces(data, date_column, value_column, trace_columns, method, frac, threads):
+    '''Smoothed values of each trace (the rows with the same `trace_columns`), aligned with the rows of `data`. Missing values are not smoothed. The traces are smoothed in parallel with `threads` threads.'''
+    
+    if threads is None: threads = cpu_count()
+    if threads == -1: threads = cpu_count()
+    
+    if trace_columns:
+        codes = data.groupby(trace_columns, sort=False, dropna=False).ngroup().to_numpy()
+    else:
+        codes = np.zeros(len(data), dtype=np.int64)
+    
+    dates = pd.DatetimeIndex(data[date_column])
+    y = data[value_column].to_numpy(dtype=float)
+    
+    # Rows with values, sorted by trace, then date
+    rows = np.flatnonzero(~np.isnan(y) & ~dates.isna())
+    rows = rows[np.lexsort((dates.asi8[rows], codes[rows]))]
+    
+    bounds = np.flatnonzero(np.r_[True, codes[rows][1:] != codes[rows][:-1], True]) if len(rows) else np.array([0])
+    traces = [rows[start:stop] for start, stop in zip(bounds[:-1], bounds[1:])]
+    
+    def smooth_trace(trace_rows):
+        # x: the position of each point in its trace (the dates when there is a single trace)
+        if trace_columns:
+            x = np.arange(len(trace_rows), dtype=float)
+        else:
+            x = (dates.asi8[trace_rows] - dates.asi8[trace_rows[0]]).astype(float)
+        
+        trace_method = method
+        if method == 'auto':
+            trace_method = 'lowess' if len(trace_rows) <= _SMOOTH_AUTO_POINTS else 'lowess_fast'
+        
+        return _smooth_cached(trace_method, x, y[trace_rows], frac)
+    
+    if threads != 1 and len(traces) > 1:
+        with ThreadPoolExecutor(threads) as executor:
+            smoothed = list(executor.map(smooth_trace, traces))
+    else:
+        smoothed = [smooth_trace(trace_rows) for trace_rows in traces]
+    
+    result = np.full(len(data), np.nan)
+    if traces:
+        result[np.concatenate(traces)] = np.concatenate(smoothed)
+    
+    return result
+
+def _smooth_cached(method, x, y, frac):
+    '''Smoothed values of one time series (sorted by `x`), memoized by a hash of `x` and `y`.'''
+    
+    hasher = hashlib.blake2b(digest_size=16)
+    hasher.update(x.tobytes())
+    hasher.update(y.tobytes())
+    key = (method, frac, len(x), hasher.digest())
+    
+    if key in _SMOOTH_CACHE:
+        _SMOOTH_CACHE.move_to_end(key)
+        return _SMOOTH_CACHE[key]
+    
+    smoothed = _SMOOTHERS[method](x, y, frac)
+    
+    _SMOOTH_CACHE[key] = smoothed
+    if len(_SMOOTH_CACHE) > _SMOOTH_CACHE_SIZE:
+        _SMOOTH_CACHE.popitem(last=False)
+    
+    return smoothed
+
+def _smooth_lowess(x, y, frac, delta=0.0):
+    '''LOWESS fitted at every point (or within `delta` of each other).'''
+    # statsmodels is imported on first use (it is slow to import)
+    from statsmodels.nonparametric.smoothers_lowess import lowess
+    
+    return lowess(y, x, frac=frac, delta=delta, is_sorted=True, return_sorted=False)
+
+def _smooth_lowess_fast(x, y, frac):
+    '''LOWESS on the means of at most `_SMOOTH_AUTO_POINTS` bins of consecutive points, with `delta` of 1% of the range, interpolated to every point.'''
+    n = len(x)
+    
+    if n > _SMOOTH_AUTO_POINTS:
+        bins = np.arange(n) * _SMOOTH_AUTO_POINTS // n
+        counts = np.bincount(bins)
+        grid_x, grid_y = np.bincount(bins, x) / counts, np.bincount(bins, y) / counts
+    else:
+        grid_x, grid_y = x, y
+    
+    smoothed = _smooth_lowess(grid_x, grid_y, frac, delta=0.01 * (grid_x[-1] - grid_x[0]))
+    
+    return np.interp(x, grid_x, smoothed) if n > _SMOOTH_AUTO_POINTS else smoothed
+
+def _smooth_binned(x, y, frac):
+    '''Means of `2 / frac` equal-width bins of `x`, interpolated with a cubic spline.'''
+    n_bins = max(int(np.ceil(2 / frac)), 2)
+    span = x[-1] - x[0]
+    
+    if span == 0:
+        return np.full(len(x), y.mean())
+    
+    bins = ((x - x[0]) / span * n_bins).astype(int).clip(max=n_bins - 1)
+    counts = np.bincount(bins, minlength=n_bins)
+    nonempty = counts > 0
+    
+    grid_x = np.bincount(bins, x, minlength=n_bins)[nonempty] / counts[nonempty]
+    grid_y = np.bincount(bins, y, minlength=n_bins)[nonempty] / counts[nonempty]
+    
+    # scipy is a dependency of statsmodels
+    from scipy.interpolate import make_interp_spline
+    
+    return make_interp_spline(grid_x, grid_y, k=min(3, len(grid_x) - 1))(x)
+
+def _smooth_rolling(x, y, frac):
+    '''Centered rolling mean over `frac` of the points.'''
+    window = max(int(round(frac * len(y))), 1)
+    
+    return pd.Series(y).rolling(window, center=True, min_periods=1).mean().to_numpy()
+
+def _smooth_ewm(x, y, frac):
+    '''Mean of the forward and backward exponentially weighted means, with a span of `frac` of the points.'''
+    span = max(frac * len(y), 1)
+    
+    forward = pd.Series(y).ewm(span=span).mean().to_numpy()
+    backward = pd.Series(y[::-1]).ewm(span=span).mean().to_numpy()[::-1]
+    
+    return (forward + backward) / 2
+
+_SMOOTHERS = {
+    'lowess':      _smooth_lowess,
+    'lowess_fast': _smooth_lowess_fast,
+    'binned':      _smooth_binned,
+    'rolling':     _smooth_rolling,
+    'ewm':         _smooth_ewm,
+}
+
+def _downsample_traces(data, date_column, value_column, trace_columns, method, n_points):
+    '''Keeps about `n_points` rows of each trace (the rows with the same `trace_columns`), using LTTB or a min-max envelope. All the traces are downsampled at once (vectorized). Rows with missing values are dropped from the downsampled traces.'''
+    
+    if trace_columns:
+        codes = data.groupby(list(dict.fromkeys(trace_columns)), sort=False, dropna=False).ngroup().to_numpy()
+    else:
+        codes = np.zeros(len(data), dtype=np.int64)
+    
+    dates = pd.DatetimeIndex(data[date_column])
+    y = data[value_column].to_numpy(dtype=float)
+    valid = ~np.isnan(y) & ~dates.isna()
+    
+    # Nanoseconds since the first date (small floats keep the bucket averages precise)
+    x = (dates.asi8 - dates.asi8[valid].min(initial=0)).astype(float)
+    
+    # Traces short enough are kept as is
+    lengths = np.bincount(codes[valid], minlength=codes.max() + 1 if len(codes) else 0)
+    large = lengths > n_points
+    keep = ~large[codes]
+    
+    if not large.any():
+        return data
+    
+    # Rows of the large traces, sorted by trace, then date
+    rows = np.flatnonzero(valid & large[codes])
+    rows = rows[np.lexsort((x[rows], codes[rows]))]
+    
+    if method == 'auto':
+        minmax = lengths > 10 * n_points
+        methods = {'minmax': minmax[codes[rows]], 'lttb': ~minmax[codes[rows]]}
+    else:
+        methods = {method: np.ones(len(rows), dtype=bool)}
+    
+    for name, subset in methods.items():
+        subset_rows = rows[subset]
+        if not len(subset_rows):
+            continue
+        
+        subset_codes = codes[subset_rows]
+        starts = np.flatnonzero(np.r_[True, subset_codes[1:] != subset_codes[:-1]])
+        counts = np.diff(np.r_[starts, len(subset_rows)])
+        
+        downsampler = _lttb if name == 'lttb' else _minmax
+        selected = downsampler(x[subset_rows], y[subset_rows], starts, counts, n_points)
+        
+        keep[subset_rows[selected]] = True
+    
+    return data[keep]
+
+def _lttb(x, y, starts, counts, n_points):
+    '''Largest-Triangle-Three-Buckets on traces sorted by x (one trace per `starts`, `counts`). The buckets of all the traces are processed at once, so the loop runs `n_points` times regardless of the number of traces. Returns the selected positions, including the minimum and maximum of each trace.'''
+    
+    n_buckets = n_points - 2
+    n_traces = len(starts)
+    
+    # Interior points in n_buckets buckets: bounds[k, b] is the start of bucket b of trace k
+    bounds = starts[:, None] + 1 + (np.arange(n_buckets + 1)[None, :] * (counts[:, None] - 2)) // n_buckets
+    
+    # Average of each bucket (the last point of the trace after the last bucket)
+    cumulative_x, cumulative_y = np.r_[0, np.cumsum(x)], np.r_[0, np.cumsum(y)]
+    sizes = np.diff(bounds, axis=1)
+    mean_x = (cumulative_x[bounds[:, 1:]] - cumulative_x[bounds[:, :-1]]) / sizes
+    mean_y = (cumulative_y[bounds[:, 1:]] - cumulative_y[bounds[:, :-1]]) / sizes
+    
+    last = starts + counts - 1
+    next_x = np.c_[mean_x[:, 1:], x[last]]
+    next_y = np.c_[mean_y[:, 1:], y[last]]
+    
+    trace = np.arange(n_traces)
+    selected = np.empty((n_traces, n_buckets), dtype=np.int64)
+    previous = starts
+    
+    for b in range(n_buckets):
+        bucket_starts, bucket_sizes = bounds[:, b], sizes[:, b]
+        
+        segments = np.repeat(trace, bucket_sizes)
+        positions = np.arange(len(segments)) + np.repeat(bucket_starts - (np.cumsum(bucket_sizes) - bucket_sizes), bucket_sizes)
+        
+        # Area of the triangle (previous point, point, average of the next bucket)
+        ax, ay = x[previous][segments], y[previous][segments]
+        area = np.abs((ax - next_x[segments, b]) * (y[positions] - ay) - (ax - x[positions]) * (next_y[segments, b] - ay))
+        
+        previous = positions[_segment_argmax(area, segments)]
+        selected[:, b] = previous
+    
+    segments = np.repeat(trace, counts)
+    extremes = [_segment_argmax(y, segments), _segment_argmax(-y, segments)]
+    
+    return np.concatenate([starts, selected.ravel(), last, *extremes])
+
+def _minmax(x, y, starts, counts, n_points):
+    '''Min-max envelope on traces sorted by x (one trace per `starts`, `counts`): the minimum and maximum of each of `n_points // 2` buckets, plus the first and last point of each trace.'''
+    
+    n_buckets = n_points // 2
+    
+    segments = np.repeat(np.arange(len(starts)), counts)
+    local = np.arange(len(x)) - starts[segments]
+    buckets = segments * n_buckets + (local * n_buckets) // counts[segments]
+    
+    return np.concatenate([
+        starts, starts + counts - 1,
+        _segment_argmax(y, buckets), _segment_argmax(-y, buckets),
+    ])
+
+def _segment_argmax(values, segments):
+    '''Position of the (first) maximum of `values` in each segment (`segments` is sorted).'''
+    maxima = np.maximum.reduceat(values, np.flatnonzero(np.r_[True, segments[1:] != segments[:-1]]))
+    
+    hits = np.flatnonzero(values == maxima[segments])
+    first = np.r_[True, segments[hits][1:] != segments[hits][:-1]]
+    
+    return hits[first]
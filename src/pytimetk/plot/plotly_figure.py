@@ -0,0 +1,47 @@
+import numpy as np
+import base64
+
+import plotly.graph_objects as go
+from plotly.offline import get_plotlyjs_version
+
+
+# Typed array types (plotly.js `dtype`) of the numpy types
+_TYPED_ARRAY_DTYPES = {'float64': 'f8', 'float32': 'f4', 'int32': 'i4'}
+
+# Typed arrays are decoded by plotly.js >= 2.28 (bundled with plotly >= 5.19): older versions render blank plots
+_TYPED_ARRAYS = tuple(int(part) for part in get_plotlyjs_version().split('.')[:2]) >= (2, 28)
+
+class BinaryArrayFigure(go.Figure):
+    '''
+    A plotly Figure serialized with typed arrays.
+
+    The traces hold ordinary numpy arrays, so the figure validates and converts (e.g. `go.Figure(fig)`) as any other figure. When it is serialized (`to_dict`, and so `to_json`, `to_html`, `show`, `write_html`), the numeric x and y arrays are written as typed arrays (`{"dtype", "bdata"}`: base64 binary data), which plotly.js >= 2.28 decodes without parsing text numbers. With an older plotly.js (plotly < 5.19), the arrays are written as lists of numbers.
+    '''
+
+    def to_dict(self):
+        fig_dict = super().to_dict()
+
+        if not _TYPED_ARRAYS:
+            return fig_dict
+
+        for trace in fig_dict.get('data', []):
+            for axis in ['x', 'y']:
+                values = trace.get(axis)
+                if isinstance(values, np.ndarray) and values.dtype.name in _TYPED_ARRAY_DTYPES:
+                    trace[axis] = _typed_array(values)
+
+        return fig_dict
+
+    def __reduce__(self):
+        # Copies and pickles keep the numpy arrays
+        props = go.Figure.to_dict(self)
+        props['_grid_str'] = self._grid_str
+        props['_grid_ref'] = self._grid_ref
+        return (self.__class__, (props,))
+
+def _typed_array(values):
+    '''The plotly.js typed array spec of a numpy array (little-endian base64 binary data).'''
+    return {
+        'dtype': _TYPED_ARRAY_DTYPES[values.dtype.name],
+        'bdata': base64.b64encode(values.astype(values.dtype.newbyteorder('<')).tobytes()).decode('ascii'),
+    }
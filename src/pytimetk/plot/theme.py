@@ -1,6 +1,3 @@
-from plotnine import *
-
-
     
 def theme_timetk(base_size: int = 11, base_family: list = ['Arial', 'Helvetica', 'sans-serif'], dpi: int = 100, width: int = 700, height: int = 500):
     '''Returns a `plotnine` theme with timetk styles applied, allowing for customization of the appearance of plots in Python.
@@ -74,6 +71,9 @@ def theme_timetk(base_size: int = 11, base_family: list = ['Arial', 'Helvetica',
     
     '''
     
+    # plotnine is imported on first use (it is slow to import)
+    from plotnine import theme, element_line, element_rect, element_blank, element_text
+    
     # Tidyquant colors
     blue  = "#2c3e50"
     green = "#18BC9C"
@@ -0,0 +1,231 @@
+import pandas as pd
+import numpy as np
+import pytest
+import pytimetk as tk
+
+from statsmodels.tsa.seasonal import seasonal_decompose
+
+@pytest.fixture
+def grouped_data_frame_to_test() -> pd.DataFrame:
+    '''The function loads m4_daily pandas DataFrame, with the rows shuffled,
+    to make the tests with grouped dataframe.
+
+    Returns
+    -------
+    pd.DataFrame
+        A pandas DataFrame.
+    '''
+    data = tk.load_dataset('m4_daily', parse_dates = ['date'])
+
+    return data.sample(frac=1, random_state=123)
+
+def test_anomalize_dataframe(grouped_data_frame_to_test):
+    df = grouped_data_frame_to_test.query("id == 'D10'").drop(columns='id')
+
+    result = tk.anomalize(df, 'date', 'value', period = 7)
+
+    expected_columns = [
+        'date', 'observed', 'seasonal', 'seasadj', 'trend', 'remainder',
+        'anomaly', 'anomaly_score', 'anomaly_direction',
+        'recomposed_l1', 'recomposed_l2', 'observed_clean'
+    ]
+
+    assert result.columns.tolist() == expected_columns
+
+    # Rows are returned in the original order
+    assert result.index.equals(df.index)
+    assert (result['observed'] == df['value']).all()
+
+@pytest.mark.parametrize("method", ['twitter', 'stl'])
+def test_anomalize_groupby_matches_each_group(grouped_data_frame_to_test, method):
+    df = grouped_data_frame_to_test
+
+    result = df.groupby('id').anomalize('date', 'value', period = 7, method = method)
+
+    # Rows are returned in the original order
+    assert result.index.equals(df.index)
+    assert result.columns[0] == 'id'
+
+    # Each group is anomalized independently
+    for id, group in df.groupby('id'):
+        expected = tk.anomalize(group.drop(columns='id'), 'date', 'value', period = 7, method = method)
+
+        pd.testing.assert_frame_equal(
+            result.loc[result['id'] == id].drop(columns='id'),
+            expected
+        )
+
+def test_anomalize_groupby_threads(grouped_data_frame_to_test):
+    df = grouped_data_frame_to_test
+
+    result = df.groupby('id').anomalize('date', 'value', period = 7)
+    result_threads = df.groupby('id').anomalize('date', 'value', period = 7, threads = 2)
+
+    pd.testing.assert_frame_equal(result, result_threads)
+
+def test_anomalize_groupby_bind_data(grouped_data_frame_to_test):
+    df = grouped_data_frame_to_test
+
+    result = df.groupby('id').anomalize('date', 'value', period = 7, bind_data = True)
+
+    assert result.columns[:3].tolist() == ['id', 'date', 'value']
+    assert np.allclose(result['value'], result['observed'])
+
+@pytest.mark.parametrize("method", ['twitter', 'stl'])
+@pytest.mark.parametrize("decomp", ['additive', 'multiplicative'])
+def test_anomalize_groupby_equal_length_batch(method, decomp):
+    # Equal length, regular groups are decomposed as one (series x time) matrix
+    rng = np.random.default_rng(123)
+    n_series, n_obs = 20, 120
+
+    t = np.arange(n_obs)
+    values = 50 + 10 * np.sin(2 * np.pi * t / 7) + 0.1 * t + rng.normal(size=(n_series, n_obs))
+    values[:, 60] += 30
+
+    df = pd.DataFrame({
+        'id': np.repeat(np.arange(n_series), n_obs),
+        'date': np.tile(pd.date_range('2020-01-01', periods=n_obs).values, n_series),
+        'value': values.ravel()
+    }).sample(frac=1, random_state=123)
+
+    result = df.groupby('id').anomalize('date', 'value', method = method, decomp = decomp)
+
+    assert result.index.equals(df.index)
+
+    # Same decomposition as statsmodels on each group
+    for id, group in df.groupby('id'):
+        group = group.sort_values('date')
+
+        expected = seasonal_decompose(
+            group['value'].to_numpy(), period = 7, model = decomp, extrapolate_trend = 'freq'
+        )
+
+        assert np.allclose(result.loc[group.index, 'seasonal'], expected.seasonal)
+        if method == 'stl':
+            assert np.allclose(result.loc[group.index, 'trend'], expected.trend)
+
+def test_anomalize_twitter_median_trend_ragged_groups():
+    rng = np.random.default_rng(123)
+
+    df = pd.concat([
+        pd.DataFrame({
+            'id': i,
+            'date': pd.date_range('2020-01-01', periods=n),
+            'value': rng.normal(size=n).cumsum()
+        })
+        for i, n in enumerate([29, 30, 31, 57, 100])
+    ]).sample(frac=1, random_state=123)
+
+    result = df.groupby('id').anomalize('date', 'value', period = 7)
+
+    # The trend is the median of 4 consecutive segments (the first ones one longer)
+    for id, group in result.groupby('id'):
+        group = group.sort_values('date')
+
+        expected = np.concatenate([
+            np.repeat(np.median(segment), len(segment)) 
+            for segment in np.array_split(group['seasadj'].to_numpy(), 4)
+        ])
+
+        assert np.allclose(group['trend'], expected)
+
+    # The remainder quartiles of each group give the limits
+    for id, group in result.groupby('id'):
+        q1, q3 = np.percentile(group['remainder'], [25, 75])
+
+        assert np.allclose(group['recomposed_l2'] - group['seasonal'] - group['trend'], q3 + 3 * (q3 - q1))
+
+def test_anomalize_decompose_then_score(grouped_data_frame_to_test):
+    df = grouped_data_frame_to_test
+
+    expected = df.groupby('id').anomalize('date', 'value', period = 7, iqr_alpha = 0.1)
+
+    decomposition = df.groupby('id').anomalize_decompose('date', 'value', period = 7)
+
+    assert decomposition.columns.tolist() == [
+        'id', 'date', 'observed', 'seasonal', 'seasadj', 'trend', 'remainder'
+    ]
+
+    result = decomposition.groupby('id').anomalize_score('date', iqr_alpha = 0.1)
+
+    pd.testing.assert_frame_equal(result, expected)
+
+def test_anomalize_score_alpha_sweep(grouped_data_frame_to_test):
+    df = grouped_data_frame_to_test
+
+    decomposition = df.groupby('id').anomalize_decompose('date', 'value', period = 7)
+
+    alphas = [0.01, 0.05, 0.2]
+
+    result = decomposition.groupby('id').anomalize_score('date', iqr_alpha = alphas)
+
+    assert result.columns[:2].tolist() == ['id', 'iqr_alpha']
+    assert len(result) == len(df) * len(alphas)
+
+    # Same as running anomalize once per alpha
+    for alpha in alphas:
+        expected = df.groupby('id').anomalize('date', 'value', period = 7, iqr_alpha = alpha)
+
+        pd.testing.assert_frame_equal(
+            result.loc[result['iqr_alpha'] == alpha].drop(columns='iqr_alpha'),
+            expected
+        )
+
+def test_anomaly_detector_online():
+    rng = np.random.default_rng(123)
+    n_series, n_obs, n_new = 20, 120, 30
+
+    t = np.arange(n_obs + n_new)
+    values = 50 + 10 * np.sin(2 * np.pi * t / 7) + 0.1 * t + rng.normal(size=(n_series, n_obs + n_new))
+    values[:, n_obs + 10] += 30
+
+    df = pd.DataFrame({
+        'id': np.repeat(np.arange(n_series), n_obs + n_new),
+        'date': np.tile(pd.date_range('2020-01-01', periods=n_obs + n_new).values, n_series),
+        'value': values.ravel()
+    })
+
+    history = df[df['date'] < df['date'].iloc[n_obs]]
+    new = df[df['date'] >= df['date'].iloc[n_obs]].sample(frac=1, random_state=123)
+
+    detector = tk.AnomalyDetector('date', 'value', period = 7).fit(history.groupby('id'))
+
+    result = detector.update(new)
+
+    # Same columns as anomalize, in the original row order
+    assert result.columns.tolist() == history.groupby('id').anomalize('date', 'value', period = 7).columns.tolist()
+    assert result.index.equals(new.index)
+
+    # The spikes are flagged
+    spikes = result['date'] == df['date'].iloc[n_obs + 10]
+    assert (result.loc[spikes, 'anomaly'] == 'Yes').all()
+    assert (result.loc[~spikes, 'anomaly'] == 'Yes').mean() < 0.05
+
+    # Scoring the points one date at a time gives the same results
+    detector = tk.AnomalyDetector('date', 'value', period = 7).fit(history.groupby('id'))
+
+    result_stream = pd.concat([
+        detector.update(points) for _, points in new.groupby('date')
+    ])
+
+    pd.testing.assert_frame_equal(result_stream.loc[result.index], result)
+
+def test_anomaly_detector_window_shorter_than_period(grouped_data_frame_to_test):
+    '''Tests that `fit` works when the remainder window is shorter than the seasonal period.'''
+    df = grouped_data_frame_to_test.query("id == 'D10'").drop(columns='id').sort_values('date')
+
+    history, new = df.iloc[:-30], df.iloc[-30:]
+
+    detector = tk.AnomalyDetector('date', 'value', period = 30, window = 10).fit(history)
+
+    # The positions of the seasonal profile not replayed are the last cycle of the history
+    decomposition = tk.anomalize(history, 'date', 'value', period = 30)
+    np.testing.assert_allclose(detector._profile[0, 10:], decomposition['seasonal'].iloc[-30:-10])
+
+    result = detector.update(new)
+
+    assert result.index.equals(new.index)
+    assert result['anomaly'].isin(['Yes', 'No']).all()
+
+if __name__ == "__main__":
+    pytest.main([__file__])
@@ -0,0 +1,73 @@
+import subprocess
+import sys
+
+import pandas as pd
+import pytest
+import pytimetk
+
+
+# Slow to import: loaded on first use only
+HEAVY_MODULES = ['plotnine', 'plotly', 'mizani', 'matplotlib', 'statsmodels', 'tsfeatures']
+
+def test_import_time():
+    '''Benchmarks `import pytimetk` in a fresh interpreter (`python -X importtime`) and tests that the plotting and statistics libraries are not imported.'''
+
+    result = subprocess.run(
+        [sys.executable, '-X', 'importtime', '-c', 'import pytimetk'],
+        capture_output=True, text=True, check=True,
+    )
+
+    # Lines: "import time: self [us] | cumulative | imported package"
+    imports = {}
+    for line in result.stderr.splitlines():
+        if line.startswith('import time:') and '|' in line:
+            _, cumulative, module = line.split('|')
+            if cumulative.strip().isdigit():
+                imports[module.strip()] = int(cumulative)
+
+    loaded = [module for module in imports if module.split('.')[0] in HEAVY_MODULES]
+
+    assert 'pytimetk' in imports
+    assert loaded == [], f"`import pytimetk` ({imports['pytimetk'] / 1e6:.2f}s) imported {sorted(set(m.split('.')[0] for m in loaded))}"
+
+def test_lazy_attributes():
+    '''Tests that the names of the heavy libraries are still available from `pytimetk` and that the pandas methods are registered.'''
+
+    import plotnine
+    import statsmodels.tsa.seasonal
+
+    assert pytimetk.ggplot is plotnine.ggplot
+    assert pytimetk.seasonal_decompose is statsmodels.tsa.seasonal.seasonal_decompose
+
+    for name in ['plot_timeseries', 'summarize_by_time', 'anomalize', 'ts_features']:
+        assert hasattr(pd.DataFrame, name)
+        assert hasattr(pd.core.groupby.generic.DataFrameGroupBy, name)
+
+    with pytest.raises(AttributeError):
+        pytimetk.not_an_attribute
+
+def test_unknown_attributes():
+    '''Tests that unknown names raise AttributeError without importing the plotting libraries, and that all the plotnine names are available.'''
+
+    code = (
+        "import sys, pytimetk; "
+        "assert not hasattr(pytimetk, 'not_an_attribute'); "
+        "assert not hasattr(pytimetk, 'ggplt'); "
+        "print(sorted(m for m in sys.modules if m.split('.')[0] in %r))" % HEAVY_MODULES
+    )
+    result = subprocess.run([sys.executable, '-c', code], capture_output=True, text=True, check=True)
+
+    assert result.stdout.strip() == '[]'
+
+    import plotnine
+
+    assert all(getattr(pytimetk, name) is getattr(plotnine, name) for name in plotnine.__all__)
+
+def test_namespace():
+    '''Tests that the modules imported by the pytimetk modules do not leak into the `pytimetk` namespace.'''
+
+    for name in ['os', 'json', 'time', 'shutil', 'tempfile', 'hashlib', 'pickle', 'warnings', 'Day', 'Week', 'to_offset', 'OrderedDict', 'import_module']:
+        assert name not in vars(pytimetk), f"`pytimetk.{name}` is not part of the API"
+
+    for name in ['plot_timeseries_batch', 'TimeRollup', 'AnomalyDetector', 'make_synthetic_panel', 'agg']:
+        assert name in vars(pytimetk)
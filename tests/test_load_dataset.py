@@ -144,3 +144,40 @@ def test_load_dataset():
         
     
     
+
+def test_load_dataset_binary_cache(tmp_path, monkeypatch):
+    """Test if the binary copies (and memory-mapped reads) of the datasets match the CSV files"""
+    
+    from pytimetk.datasets.get_datasets import _load_binary_dataset
+    
+    monkeypatch.setenv('PYTIMETK_CACHE_DIR', str(tmp_path))
+    _load_binary_dataset.cache_clear()
+    
+    for name in ['m4_daily', 'stocks_daily', 'walmart_sales_weekly']:
+        
+        date_column = 'Date' if name == 'walmart_sales_weekly' else 'date'
+        
+        expected = pytimetk.load_dataset(name, cache = False, parse_dates = [date_column])
+        
+        pd.testing.assert_frame_equal(pytimetk.load_dataset(name, parse_dates = [date_column]), expected)
+        pd.testing.assert_frame_equal(pytimetk.load_dataset(name, parse_dates = [date_column], mmap = True), expected)
+        pd.testing.assert_frame_equal(pytimetk.load_dataset(name), pytimetk.load_dataset(name, cache = False))
+    
+    assert len(list((tmp_path / 'datasets').iterdir())) == 3
+    
+    # The cached frames are not modified by the callers
+    data = pytimetk.load_dataset('m4_daily')
+    data['value'] = 0
+    
+    assert (pytimetk.load_dataset('m4_daily')['value'] != 0).all()
+    
+    # Nor the string columns of the memory-mapped frames (the memory-mapped columns are read-only)
+    data = pytimetk.load_dataset('m4_daily', parse_dates = ['date'], mmap = True)
+    data.loc[0, 'id'] = 'ZZZ'
+    
+    assert pytimetk.load_dataset('m4_daily', parse_dates = ['date'], mmap = True).loc[0, 'id'] == 'D10'
+    
+    with pytest.raises(ValueError, match = 'read-only'):
+        data.loc[0, 'value'] = 0
+    
+    _load_binary_dataset.cache_clear()
@@ -0,0 +1,53 @@
+import numpy as np
+import pandas as pd
+import pytest
+import pytimetk
+
+def test_make_synthetic_panel():
+    '''Tests the shape, columns, determinism and the nesting of the groups of `make_synthetic_panel`.'''
+    
+    data = pytimetk.make_synthetic_panel(n_series = 50, n_periods = 100, freq = 'D', n_group_levels = 2)
+    
+    assert data.shape == (5000, 5)
+    assert data.columns.tolist() == ['level_1', 'level_2', 'id', 'date', 'value']
+    assert data['id'].nunique() == 50
+    assert data['date'].min() == pd.Timestamp('2020-01-01')
+    
+    # Each series is in one group of each level, each group of level 2 in one group of level 1
+    assert (data.groupby('id')[['level_1', 'level_2']].nunique() == 1).all().all()
+    assert (data.groupby('level_2')['level_1'].nunique() == 1).all()
+    assert data['level_1'].nunique() < data['level_2'].nunique() < 50
+    
+    pd.testing.assert_frame_equal(data, pytimetk.make_synthetic_panel(n_series = 50, n_periods = 100, freq = 'D', n_group_levels = 2))
+    
+    assert not data.equals(pytimetk.make_synthetic_panel(n_series = 50, n_periods = 100, freq = 'D', n_group_levels = 2, seed = 1))
+
+@pytest.mark.parametrize("freq", ['H', 'D', 'W', 'MS'])
+def test_make_synthetic_panel_irregular(freq):
+    '''Tests that irregular dates with gaps stay sorted within each series.'''
+    
+    data = pytimetk.make_synthetic_panel(n_series = 20, n_periods = 200, freq = freq, irregularity = 0.5, missing_rate = 0.2)
+    
+    assert 0.7 * 4000 < len(data) < 0.9 * 4000
+    assert data.groupby('id')['date'].apply(lambda x: x.is_monotonic_increasing).all()
+    assert data['value'].notna().all()
+    
+    with pytest.raises(ValueError):
+        pytimetk.make_synthetic_panel(irregularity = 1)
+
+@pytest.mark.parametrize("freq, periods", [
+    (pd.offsets.Hour(), [24, 168]),
+    (pd.offsets.Minute(30), [48]),
+    (pd.offsets.Day(), [7, 365.25]),
+    (pd.offsets.Week(weekday = 6), [52.18]),
+    (pd.offsets.MonthEnd(), [12]),
+    (pd.offsets.QuarterEnd(), [4]),
+    (pd.offsets.YearBegin(), []),
+])
+def test_make_synthetic_panel_seasonal_periods(freq, periods):
+    '''Tests that the automatic seasonal periods depend on the type of the frequency, not on its alias (which differs between pandas versions).'''
+    
+    from pytimetk.datasets.make_synthetic_panel import _seasonal_periods
+    
+    assert _seasonal_periods(freq) == periods
+    assert _seasonal_periods(freq.freqstr) == periods
@@ -63,7 +63,165 @@ def test_groupby_handling():
     fig = group.plot_timeseries(date_column="date", value_column="value", engine="plotly")
     assert isinstance(fig, type(pytimetk.make_subplots())), "Figure type doesn't match expected type"
 
-
+@pytest.mark.parametrize("downsample", ['lttb', 'minmax', 'auto'])
+def test_downsample(downsample):
+    '''Tests that `downsample` reduces each trace to about `downsample_points` points and keeps the extremes.'''
+    
+    n = 20_000
+    large = pd.DataFrame({
+        'date': np.tile(pd.date_range(start='1/1/2020', periods=n, freq='min'), 2),
+        'value': np.random.default_rng(123).normal(size=2 * n).cumsum(),
+        'id': np.repeat(['A', 'B'], n),
+    })
+    large.loc[[100, n + 5000], 'value'] = [1e6, -1e6]
+    
+    fig = large.groupby('id').plot_timeseries('date', 'value', smooth=False, downsample=downsample, downsample_points=500)
+    
+    assert all(len(trace.x) <= 502 for trace in fig.data)
+    assert max(fig.data[0].y) == 1e6
+    assert min(fig.data[1].y) == -1e6
+    
+    # Short traces are not changed
+    fig = data.plot_timeseries('date', 'value', smooth=False, downsample=downsample, downsample_points=500)
+    assert len(fig.data[0].x) == len(data)
+
+@pytest.mark.parametrize("smooth_method", ['auto', 'lowess', 'lowess_fast', 'binned', 'rolling', 'ewm'])
+def test_smooth_method(smooth_method):
+    '''Tests that each `smooth_method` smooths each group, with the same result in parallel and from the cache.'''
+    
+    n = 10_000
+    large = pd.DataFrame({
+        'date': np.tile(pd.date_range(start='1/1/2020', periods=n, freq='min'), 2),
+        'value': np.sin(np.arange(2 * n) / 500) + np.random.default_rng(123).normal(scale=0.1, size=2 * n),
+        'id': np.repeat(['A', 'B'], n),
+    })
+    
+    fig = large.groupby('id').plot_timeseries('date', 'value', smooth_method=smooth_method, smooth_frac=0.05)
+    smoothed = np.concatenate([trace.y for trace in fig.data if trace.name == 'Smoother'])
+    
+    assert np.abs(smoothed - np.sin(np.arange(2 * n) / 500)).max() < 0.5
+    
+    fig_threads = large.groupby('id').plot_timeseries('date', 'value', smooth_method=smooth_method, smooth_frac=0.05, threads=2)
+    np.testing.assert_array_equal(
+        np.concatenate([trace.y for trace in fig_threads.data if trace.name == 'Smoother']), smoothed
+    )
+def test_webgl_consolidate_traces():
+    '''Tests that `consolidate_traces` joins the color groups with the same color into one trace per facet, separated by missing values, and that `webgl` uses `Scattergl` traces.'''
+    
+    n, k = 50, 40
+    many = pd.DataFrame({
+        'date': np.tile(pd.date_range(start='1/1/2020', periods=n, freq='D'), k),
+        'value': np.random.default_rng(123).normal(size=n * k),
+        'id': np.repeat([f'id_{i:02d}' for i in range(k)], n),
+        'facet': np.repeat(['A', 'B'], n * k // 2),
+    })
+    
+    fig = many.groupby('facet').plot_timeseries('date', 'value', color_column='id', smooth=False, engine='plotly')
+    consolidated = many.groupby('facet').plot_timeseries('date', 'value', color_column='id', smooth=False, consolidate_traces=True, webgl=True)
+    
+    assert len(fig.data) == k
+    assert len(consolidated.data) == len({(trace.xaxis, trace.line.color) for trace in fig.data})
+    assert {trace.type for trace in consolidated.data} == {'scattergl'}
+    
+    # Same points, plus one separator between joined color groups
+    y = np.concatenate([trace.y for trace in consolidated.data])
+    assert np.isnan(y).sum() == k - len(consolidated.data)
+    np.testing.assert_array_equal(np.sort(y[~np.isnan(y)]), np.sort(many['value']))
+@pytest.mark.parametrize("binary_arrays", [True, 'float32'])
+def test_binary_arrays(binary_arrays):
+    '''Tests that `binary_arrays` serializes the dates and values of the traces as typed arrays with the same values, and that the figure is still a valid plotly figure.'''
+    
+    import base64
+    import plotly.graph_objects as go
+    
+    fig = data.plot_timeseries('date', 'value', smooth=False, binary_arrays=binary_arrays)
+    
+    trace = fig.to_dict()['data'][0]
+    
+    x, y = trace['x'], trace['y']
+    assert (x['dtype'], y['dtype']) == ('f8', 'f8' if binary_arrays is True else 'f4')
+    assert fig.layout.xaxis.type == 'date'
+    
+    x = pd.to_datetime(np.frombuffer(base64.b64decode(x['bdata']), dtype='<f8'), unit='ms')
+    y = np.frombuffer(base64.b64decode(y['bdata']), dtype='<' + y['dtype'])
+    
+    pd.testing.assert_index_equal(x, pd.DatetimeIndex(data['date']), check_names=False, exact=False)
+    np.testing.assert_allclose(y, data['value'], rtol=1e-6)
+    
+    # The figure serializes, and converts to a plain figure
+    assert '"bdata"' in fig.to_json()
+    
+    np.testing.assert_allclose(go.Figure(fig).data[0].y, data['value'], rtol=1e-6)
+
+def test_binary_arrays_old_plotlyjs(monkeypatch):
+    '''Tests that the values are serialized as numbers when the bundled plotly.js does not decode typed arrays.'''
+    
+    from pytimetk.plot import plotly_figure
+    
+    monkeypatch.setattr(plotly_figure, '_TYPED_ARRAYS', False)
+    
+    fig = data.plot_timeseries('date', 'value', smooth=False, binary_arrays=True)
+    
+    assert '"bdata"' not in fig.to_json()
+    np.testing.assert_allclose(fig.to_dict()['data'][0]['y'], data['value'])
+
+def test_facets_per_page():
+    '''Tests that `facets_per_page` returns one plot per page of groups.'''
+    
+    figs = data.groupby('id').plot_timeseries('date', 'value', facets_per_page=1, smooth=False)
+    
+    assert len(figs) == 2
+    assert [len(fig.data) for fig in figs] == [1, 1]
+
+@pytest.mark.parametrize("threads", [1, 2])
+def test_plot_timeseries_batch(tmp_path, threads):
+    '''Tests that `plot_timeseries_batch` writes one image per group (or page of groups).'''
+    
+    files = data.groupby('id').plot_timeseries_batch('date', 'value', path=str(tmp_path), threads=threads, width=300, height=200)
+    
+    assert files == [str(tmp_path / 'A.png'), str(tmp_path / 'B.png')]
+    assert all(open(file, 'rb').read(8) == b'\x89PNG\r\n\x1a\n' for file in files)
+    
+    files = data.groupby('id').plot_timeseries_batch('date', 'value', path=str(tmp_path), facets_per_page=2, threads=threads, smooth=False)
+    
+    assert files == [str(tmp_path / 'page_1.png')]
+
+def test_plot_timeseries_batch_file_names(tmp_path):
+    '''Tests that groups with the same sanitized name are written to different files.'''
+    
+    groups = data.assign(id=data['id'].map({'A': 'x/1', 'B': 'x_1'}))
+    groups = pd.concat([groups, groups[groups['id'] == 'x_1'].assign(id='x 1'), groups[groups['id'] == 'x_1'].assign(id='y')])
+    
+    files = groups.groupby('id').plot_timeseries_batch('date', 'value', path=str(tmp_path), threads=1, smooth=False)
+    
+    assert files == [str(tmp_path / name) for name in ['x_1-1.png', 'x_1-2.png', 'x_1-3.png', 'y.png']]
+    assert len(list(tmp_path.iterdir())) == 4
+
+@pytest.mark.parametrize("engine", ['plotly', 'plotnine'])
+def test_density(engine):
+    '''Tests that `density` draws one heatmap per facet, with the quantile bands.'''
+    
+    n, k = 24, 500
+    many = pd.DataFrame({
+        'date': np.tile(pd.date_range(start='1/1/2020', periods=n, freq='H'), k),
+        'value': np.random.default_rng(123).normal(size=n * k),
+        'sensor': np.repeat(np.arange(k), n),
+        'site': np.repeat(['A', 'B'], n * k // 2),
+    })
+    
+    fig = many.groupby('site').plot_timeseries('date', 'value', color_column='sensor', density=True, density_bins=(n, 10), density_bands=[0.5], engine=engine)
+    
+    if engine == 'plotly':
+        assert [trace.type for trace in fig.data] == ['heatmap', 'scatter'] * 2
+        
+        # The share of the points of each time bin
+        np.testing.assert_allclose(np.nansum(fig.data[0].z, axis=0), 1)
+        
+        medians = many[many['site'] == 'A'].groupby('date')['value'].quantile(0.5, interpolation='lower')
+        np.testing.assert_allclose(fig.data[1].y, medians)
+    else:
+        assert str(type(fig)).endswith("ggplot'>")
+        fig.draw()
 
 
 # Additional tests can be added based on other functionalities or edge cases
@@ -1,3 +1,5 @@
+import warnings
+
 import numpy as np
 import pandas as pd
 import pytest
@@ -147,4 +149,356 @@ def test_summarize_by_time_lambda_functions(summarize_by_time_data_test):
     
     
     
-        
\ No newline at end of file
+        
+@pytest.mark.parametrize("freq", ['H', 'D', 'W', 'MS', 'QS', 'YS'])
+def test_summarize_by_time_grouped_matches_resample(freq):
+    '''Tests that grouped `summarize_by_time` (integer time bins) matches pandas groupby-resample, including the empty bins.'''
+    
+    rng = np.random.default_rng(123)
+    n = 2000
+    
+    data = pd.DataFrame({
+        'groups': rng.choice(['Group_1', 'Group_2', 'Group_3'], n),
+        'date': pd.Timestamp('2020-01-01') + pd.to_timedelta(rng.integers(0, 400 * 24, n), unit='H'),
+        'value': rng.integers(0, 10, n),
+    })
+    
+    agg_func = ['sum', 'mean', 'count', 'max', 'first']
+    
+    result = data.groupby('groups').summarize_by_time(
+        'date', 'value', 
+        freq = freq, 
+        agg_func = agg_func,
+    )
+    
+    expected = data \
+        .set_index('date') \
+        .groupby('groups') \
+        .resample(freq) \
+        .agg({'value': agg_func}) \
+        .fillna(0)
+    
+    expected.columns = ['value_' + func for func in agg_func]
+    
+    pd.testing.assert_frame_equal(result, expected.reset_index())
+
+def test_summarize_by_time_grouped_categorical(summarize_by_time_data_test):
+    '''Tests that grouped `summarize_by_time` returns only the observed categories of a categorical group column, as pandas groupby-resample does.'''
+    
+    data = summarize_by_time_data_test.assign(
+        groups = lambda x: pd.Categorical(x['groups'], categories = ['Group_1', 'Group_2', 'Group_3'])
+    )
+    
+    result = data.groupby('groups', observed = False).summarize_by_time('date', 'value', freq = 'W', agg_func = 'sum')
+    
+    expected = data \
+        .set_index('date') \
+        .groupby('groups', observed = True) \
+        .resample('W') \
+        .agg({'value': 'sum'}) \
+        .reset_index()
+    
+    assert result['groups'].unique().tolist() == ['Group_1', 'Group_2']
+    
+    pd.testing.assert_frame_equal(result, expected, check_categorical = False)
+
+def test_apply_by_time_named_expressions(summarize_by_time_data_test):
+    '''Tests that named expressions in `apply_by_time` match the equivalent lambda functions.'''
+    
+    data = summarize_by_time_data_test.assign(weight = lambda x: x['value'] % 3)
+    
+    expected = data.groupby('groups').apply_by_time(
+        date_column = 'date',
+        freq = 'W',
+        value_weight_sum = lambda df: (df['value'] * df['weight']).sum(),
+        value_max = lambda df: df['value'].max(),
+    )
+    
+    result = data.groupby('groups').apply_by_time(
+        date_column = 'date',
+        freq = 'W',
+        value_weight_sum = ('value * weight', 'sum'),
+        value_max = ('value', 'max'),
+    )
+    
+    pd.testing.assert_frame_equal(result, expected, check_dtype=False)
+    
+    # Named expressions and functions can be mixed
+    result = data.groupby('groups').apply_by_time(
+        date_column = 'date',
+        freq = 'W',
+        value_weight_sum = ('value * weight', 'sum'),
+        value_max = lambda df: df['value'].max(),
+    )
+    
+    pd.testing.assert_frame_equal(result, expected, check_dtype=False)
+
+def test_apply_by_time_threads(summarize_by_time_data_test):
+    '''Tests that `apply_by_time` gives the same result with parallel processing.'''
+    
+    data = summarize_by_time_data_test
+    
+    funcs = dict(value_range = lambda df: df['value'].max() - df['value'].min())
+    
+    expected = data.groupby('groups').apply_by_time(date_column = 'date', freq = 'W', **funcs)
+    
+    result = data.groupby('groups').apply_by_time(date_column = 'date', freq = 'W', threads = 2, **funcs)
+    
+    pd.testing.assert_frame_equal(result, expected)
+
+def test_summarize_by_time_multiple_freqs(summarize_by_time_data_test):
+    '''Tests that a list of frequencies stacks the summaries of each frequency with a `freq` column.'''
+    
+    data = summarize_by_time_data_test
+    
+    freqs = ['D', 'W', 'MS']
+    agg_func = ['sum', 'count', 'max', 'mean', 'std']
+    
+    result = data.groupby('groups').summarize_by_time(
+        'date', 'value', 
+        freq = freqs, 
+        agg_func = agg_func,
+    )
+    
+    expected = pd.concat([
+        data.groupby('groups').summarize_by_time('date', 'value', freq = freq, agg_func = agg_func).assign(freq = freq)
+        for freq in freqs
+    ], ignore_index=True)
+    
+    expected = expected[['freq', *expected.columns[:-1]]]
+    
+    pd.testing.assert_frame_equal(result, expected)
+
+def test_summarize_by_time_multiple_freqs_large_offset():
+    '''Tests that the variance of merged time bins is accurate for values with a large offset and a small variance.'''
+    
+    rng = np.random.default_rng(123)
+    n = 2000
+    
+    data = pd.DataFrame({
+        'groups': rng.choice(['Group_1', 'Group_2'], n),
+        'date': pd.Timestamp('2020-01-01') + pd.to_timedelta(rng.integers(0, 90 * 24, n), unit='H'),
+        'value': 1e6 + 0.01 * rng.standard_normal(n),
+    })
+    
+    agg_func = ['mean', 'var', 'std']
+    
+    result = data.groupby('groups').summarize_by_time('date', 'value', freq = ['D', 'MS'], agg_func = agg_func)
+    
+    for freq in ['D', 'MS']:
+        expected = data.groupby(['groups', pd.Grouper(key = 'date', freq = freq)])['value'].agg(agg_func)
+        
+        summary = result[result['freq'] == freq]
+        
+        assert (summary['value_var'] > 0).all()
+        np.testing.assert_allclose(summary['value_var'], expected['var'], rtol = 1e-6)
+        np.testing.assert_allclose(summary['value_std'], expected['std'], rtol = 1e-6)
+
+def test_summarize_by_time_multiple_freqs_group_start():
+    '''Tests that frequencies whose bins start at the first date of each group ("2D") match the summaries of each frequency when the groups start on different days.'''
+    
+    rng = np.random.default_rng(123)
+    n = 3000
+    
+    data = pd.DataFrame({
+        'groups': rng.choice(['Group_1', 'Group_2', 'Group_3'], n),
+        'date': pd.Timestamp('2020-01-01') + pd.to_timedelta(rng.integers(0, 120 * 24, n), unit='H'),
+        'value': rng.normal(1000, 500, n),
+    })
+    data = data[(data['groups'] == 'Group_1') | (data['date'] >= np.where(data['groups'] == 'Group_2', '2020-01-02', '2020-01-03'))]
+    
+    agg_func = ['sum', 'var', 'std']
+    freqs = ['D', '2D', 'W']
+    
+    result = data.groupby('groups').summarize_by_time('date', 'value', freq = freqs, agg_func = agg_func)
+    
+    assert result['freq'].unique().tolist() == freqs
+    
+    for freq in freqs:
+        expected = data.groupby('groups').summarize_by_time('date', 'value', freq = freq, agg_func = agg_func)
+        
+        summary = result[result['freq'] == freq].drop(columns = 'freq').reset_index(drop = True)
+        
+        pd.testing.assert_frame_equal(summary[['groups', 'date']], expected[['groups', 'date']])
+        np.testing.assert_allclose(summary['value_var'], expected['value_var'], rtol = 1e-9)
+        np.testing.assert_allclose(summary['value_std'], expected['value_std'], rtol = 1e-9)
+
+def test_summarize_by_time_rollup(summarize_by_time_data_test):
+    '''Tests that `rollup` stacks the summaries of each level of the groups with a `grouping_set` column.'''
+    
+    data = summarize_by_time_data_test.assign(subgroups = lambda x: np.where(x['value'] % 3 == 0, 'A', 'B'))
+    
+    agg_func = ['sum', 'mean', 'max']
+    
+    result = data.groupby(['groups', 'subgroups']).summarize_by_time(
+        'date', 'value', 
+        freq = 'W', 
+        agg_func = agg_func,
+        rollup = True,
+    )
+    
+    assert result.columns.tolist() == [
+        'grouping_set', 'groups', 'subgroups', 'date', 
+        'value_sum', 'value_mean', 'value_max'
+    ]
+    
+    # Each level matches summarize_by_time at that level
+    for names in [['groups', 'subgroups'], ['groups'], []]:
+        expected = data.groupby(names) if names else data[['date', 'value']]
+        expected = expected.summarize_by_time('date', 'value', freq = 'W', agg_func = agg_func)
+        
+        level = result[result['grouping_set'] == (', '.join(names) if names else 'all')]
+        level = level[expected.columns].reset_index(drop=True)
+        
+        pd.testing.assert_frame_equal(level, expected, check_dtype=False)
+
+def test_summarize_by_time_rollup_large_offset():
+    '''Tests that the variance of the merged levels of `rollup` is accurate for values with a large offset and a small variance.'''
+    
+    rng = np.random.default_rng(123)
+    n = 2000
+    
+    data = pd.DataFrame({
+        'groups': rng.choice(['Group_1', 'Group_2'], n),
+        'subgroups': rng.choice(['A', 'B', 'C'], n),
+        'date': pd.Timestamp('2020-01-01') + pd.to_timedelta(rng.integers(0, 90 * 24, n), unit='H'),
+        'value': 1e6 + 0.01 * rng.standard_normal(n),
+    })
+    
+    result = data.groupby(['groups', 'subgroups']).summarize_by_time('date', 'value', freq = 'W', agg_func = 'var', rollup = True)
+    
+    for names in [['groups', 'subgroups'], ['groups'], []]:
+        expected = data.groupby([*names, pd.Grouper(key = 'date', freq = 'W')])['value'].var()
+        
+        level = result[result['grouping_set'] == (', '.join(names) if names else 'all')]
+        
+        np.testing.assert_allclose(level['value'], expected, rtol = 1e-6)
+
+def test_time_rollup_append(summarize_by_time_data_test):
+    '''Tests that a `TimeRollup` built from appended chunks matches `summarize_by_time` on all the data.'''
+    
+    data = summarize_by_time_data_test.sample(frac=1, random_state=123)
+    
+    agg_func = ['sum', 'count', 'min', 'mean', 'std']
+    
+    rollup = pytimetk.TimeRollup('date', 'value', freq = 'W', agg_func = agg_func, group_columns = 'groups')
+    
+    # The chunks overlap the time bins of the previous chunks
+    with warnings.catch_warnings():
+        warnings.simplefilter('error', pd.errors.SettingWithCopyWarning)
+        for i in range(0, len(data), 7):
+            rollup.append(data.iloc[i:i + 7])
+    
+    expected = data.groupby('groups').summarize_by_time('date', 'value', freq = 'W', agg_func = agg_func)
+    
+    pd.testing.assert_frame_equal(rollup.to_frame(), expected)
+
+def test_time_rollup_append_large_offset():
+    '''Tests that the variance merged across appends is accurate for values with a large offset and a small variance.'''
+    
+    rng = np.random.default_rng(123)
+    n = 2000
+    
+    data = pd.DataFrame({
+        'groups': rng.choice(['Group_1', 'Group_2'], n),
+        'date': pd.Timestamp('2020-01-01') + pd.to_timedelta(rng.integers(0, 90 * 24, n), unit='H'),
+        'value': 1e6 + 0.01 * rng.standard_normal(n),
+    })
+    
+    rollup = pytimetk.TimeRollup('date', 'value', freq = 'MS', agg_func = ['var', 'std'], group_columns = 'groups')
+    
+    for i in range(0, len(data), 100):
+        rollup.append(data.iloc[i:i + 100])
+    
+    expected = data.groupby(['groups', pd.Grouper(key = 'date', freq = 'MS')])['value'].agg(['var', 'std'])
+    
+    result = rollup.to_frame()
+    
+    np.testing.assert_allclose(result['value_var'], expected['var'], rtol = 1e-6)
+    np.testing.assert_allclose(result['value_std'], expected['std'], rtol = 1e-6)
+
+@pytest.mark.parametrize('freq', ['12H', '3H', 'D', 'W'])
+def test_time_rollup_append_multiple(freq):
+    '''Tests that several appends of groups starting on different days match `summarize_by_time` on all the rows.'''
+    
+    rng = np.random.default_rng(123)
+    n = 3000
+    
+    data = pd.DataFrame({
+        'groups': rng.choice(['Group_1', 'Group_2', 'Group_3'], n),
+        'date': pd.Timestamp('2020-01-01') + pd.to_timedelta(rng.integers(0, 120 * 24, n), unit='H'),
+        'value': rng.normal(1000, 500, n),
+    })
+    data = data[(data['groups'] == 'Group_1') | (data['date'] >= np.where(data['groups'] == 'Group_2', '2020-01-02 05:00', '2020-01-03 17:00'))]
+    
+    agg_func = ['sum', 'mean', 'var']
+    
+    rollup = pytimetk.TimeRollup('date', 'value', freq = freq, agg_func = agg_func, group_columns = 'groups')
+    
+    data = data.sort_values('date')
+    for i in range(0, len(data), 1000):
+        rollup.append(data.iloc[i:i + 1000])
+    
+    expected = data.groupby('groups').summarize_by_time('date', 'value', freq = freq, agg_func = agg_func)
+    
+    pd.testing.assert_frame_equal(rollup.to_frame(), expected, check_exact = False, rtol = 1e-9)
+
+def test_time_rollup_group_start_freq():
+    '''Tests that frequencies whose bins start at the first date of the data ("2D") are rejected.'''
+    
+    with pytest.raises(ValueError, match = '2D'):
+        pytimetk.TimeRollup('date', 'value', freq = '2D')
+
+def test_summarize_by_time_sketches(summarize_by_time_data_test):
+    '''Tests that the sketch aggregations estimate the quantiles and distinct counts, and merge across frequencies.'''
+    
+    data = summarize_by_time_data_test
+    
+    agg_func = ['median', pytimetk.agg.approx_quantile(0.5, accuracy = 0.01), 'nunique', pytimetk.agg.approx_nunique()]
+    
+    result = data.groupby('groups').summarize_by_time('date', 'value', freq = 'MS', agg_func = agg_func)
+    
+    assert result.columns.tolist() == [
+        'groups', 'date', 
+        'value_median', 'value_approx_quantile_0.5', 'value_nunique', 'value_approx_nunique'
+    ]
+    
+    # Within the relative accuracy of the (lower) median of each month
+    expected = data.groupby(['groups', pd.Grouper(key = 'date', freq = 'MS')])['value'].quantile(0.5, interpolation = 'lower').to_numpy()
+    np.testing.assert_allclose(result['value_approx_quantile_0.5'], expected, rtol = 0.01)
+    
+    assert (result['value_approx_nunique'] - result['value_nunique']).abs().max() <= 1
+    
+    # The sketches of the months are merged into quarters
+    freqs = data.groupby('groups').summarize_by_time('date', 'value', freq = ['MS', 'QS'], agg_func = agg_func[1::2])
+    quarters = data.groupby('groups').summarize_by_time('date', 'value', freq = 'QS', agg_func = agg_func[1::2])
+    
+    pd.testing.assert_frame_equal(freqs[freqs['freq'] == 'QS'].drop(columns = 'freq').reset_index(drop = True), quarters)
+
+def test_approx_quantile_zeros(summarize_by_time_data_test):
+    '''Tests that the quantile sketch handles zeros without warnings.'''
+    
+    data = summarize_by_time_data_test.assign(value = lambda x: x['value'] % 3 - 1)
+    
+    with warnings.catch_warnings():
+        warnings.simplefilter('error', RuntimeWarning)
+        result = data.summarize_by_time('date', 'value', freq = 'MS', agg_func = pytimetk.agg.approx_quantile(0.5))
+    
+    assert result['value'].tolist() == [0, 0]
+
+def test_summarize_by_time_wide_sparse(summarize_by_time_data_test):
+    '''Tests that `wide_format = "sparse"` returns sparse columns with the same values as the dense wide format.'''
+    
+    data = summarize_by_time_data_test
+    
+    dense = data.groupby('groups').summarize_by_time('date', 'value', freq = 'D', agg_func = ['sum', 'mean'], wide_format = True)
+    sparse = data.groupby('groups').summarize_by_time('date', 'value', freq = 'D', agg_func = ['sum', 'mean'], wide_format = 'sparse')
+    
+    assert all(isinstance(dtype, pd.SparseDtype) for dtype in sparse.dtypes[1:])
+    
+    # Each group has a value every other day
+    assert sparse['value_sum_Group_1'].sparse.density == 0.5
+    
+    sparse = sparse.astype({col: sparse[col].dtype.subtype for col in sparse.columns[1:]})
+    
+    pd.testing.assert_frame_equal(sparse, dense, check_dtype = False)
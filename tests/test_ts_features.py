@@ -3,7 +3,9 @@ import pandas as pd
 import pytimetk as tk
 
 from tsfeatures import (
-    acf_features, series_length, hurst
+    acf_features, series_length, hurst,
+    crossing_points, flat_spots, entropy,
+    lumpiness, stability
 )
 
 @pytest.fixture
@@ -139,5 +141,143 @@ def test_ts_features_grouped_dataframe_specifying_features(grouped_data_frame_to
     # Assert if was generated four rows
     assert result.shape[0] == 4
 
+def test_ts_features_native_engine_matches_tsfeatures(grouped_data_frame_to_test):
+    # Load data frame with groups
+    df = grouped_data_frame_to_test
+
+    # Native features plus one feature (hurst) that falls back to tsfeatures
+    features = [
+        acf_features, crossing_points, flat_spots, entropy,
+        lumpiness, stability, series_length, hurst
+    ]
+
+    expected = df.groupby('id') \
+        .ts_features(    
+            date_column  = 'date', 
+            value_column = 'value',
+            features     = features,
+            freq         = 7
+        )
+
+    result = df.groupby('id') \
+        .ts_features(    
+            date_column  = 'date', 
+            value_column = 'value',
+            features     = features,
+            freq         = 7,
+            engine       = 'native'
+        )
+
+    # Assert the native engine returns the same columns and values
+    assert result.columns.tolist() == expected.columns.tolist()
+
+    pd.testing.assert_frame_equal(result, expected, check_dtype=False)
+
+def test_ts_features_cache_dir(grouped_data_frame_to_test, tmp_path):
+    # Load data frame with groups
+    df = grouped_data_frame_to_test
+
+    features = [acf_features, series_length]
+
+    expected = df.groupby('id') \
+        .ts_features('date', 'value', features = features)
+
+    # First call computes and caches, second call reads from the cache
+    first = df.groupby('id') \
+        .ts_features('date', 'value', features = features, cache_dir = tmp_path)
+
+    second = df.groupby('id') \
+        .ts_features('date', 'value', features = features, cache_dir = tmp_path)
+
+    # One file per series
+    assert len(list(tmp_path.glob('*/ts_features-*.pkl'))) == 4
+
+    pd.testing.assert_frame_equal(first, expected)
+    pd.testing.assert_frame_equal(second, expected)
+
+    # A changed series is recomputed
+    df.loc[df['id'] == 'D10', 'value'] += 1
+
+    changed = df.groupby('id') \
+        .ts_features('date', 'value', features = features, cache_dir = tmp_path)
+
+    pd.testing.assert_frame_equal(
+        changed, 
+        df.groupby('id').ts_features('date', 'value', features = features)
+    )
+
+def test_ts_features_cache_dir_stream(grouped_data_frame_to_test, tmp_path):
+    # Load data frame with groups
+    df = grouped_data_frame_to_test
+
+    features = [acf_features, series_length]
+
+    expected = df.groupby('id') \
+        .ts_features('date', 'value', features = features)
+
+    # Cache 3 of the 4 series
+    df.query("id != 'D10'").groupby('id') \
+        .ts_features('date', 'value', features = features, cache_dir = tmp_path)
+
+    # The cached series are streamed in chunks too, then the computed ones
+    batches = list(
+        df.groupby('id') \
+            .ts_features('date', 'value', features = features, cache_dir = tmp_path, stream = True, chunk_size = 2)
+    )
+
+    assert [len(batch) for batch in batches] == [2, 1, 1]
+    assert batches[-1]['id'].tolist() == ['D10']
+
+    result = pd.concat(batches).sort_values('id').reset_index(drop=True)
+
+    pd.testing.assert_frame_equal(result, expected)
+
+def test_ts_features_grouped_keys_align_with_results():
+    # Numeric keys sort differently as strings (10 < 9), and rows are shuffled
+    df = pd.concat([
+        pd.DataFrame({
+            'a': a, 'b': b,
+            'date': pd.date_range(start='1/1/2020', periods=n),
+            'value': range(n)
+        })
+        for a, b, n in [(9, 'x', 20), (10, 'x', 30), (10, 'y', 40), (2, 'z', 50)]
+    ]).sample(frac=1, random_state=123)
+
+    result = df.groupby(['a', 'b']) \
+        .ts_features('date', 'value', features = [series_length])
+
+    expected = df.groupby(['a', 'b']).size().rename('series_length').reset_index()
+
+    pd.testing.assert_frame_equal(result, expected, check_dtype=False)
+
+def test_ts_features_stream_and_timeout(grouped_data_frame_to_test):
+    # Load data frame with groups
+    df = grouped_data_frame_to_test
+
+    features = [acf_features, series_length]
+
+    expected = df.groupby('id') \
+        .ts_features('date', 'value', features = features)
+
+    # Stream: one DataFrame per chunk of 3 series
+    batches = list(
+        df.groupby('id') \
+            .ts_features('date', 'value', features = features, stream = True, chunk_size = 3)
+    )
+
+    assert [len(batch) for batch in batches] == [3, 1]
+
+    result = pd.concat(batches).sort_values('id').reset_index(drop=True)
+
+    pd.testing.assert_frame_equal(result, expected)
+
+    # Timeout: NaN features and a status column (hurst runs per series)
+    result = df.groupby('id') \
+        .ts_features('date', 'value', features = [*features, hurst], timeout = 1e-9, engine = 'native')
+
+    assert result.columns[-1] == 'status'
+    assert (result['status'] == 'timeout').all()
+    assert result['series_length'].isna().all()
+
 if __name__ == "__main__":
     pytest.main([__file__])
\ No newline at end of file